@@ -0,0 +1,152 @@
+#
+# encoding: utf-8
+"""Throughput and latency of ``Client.fetch`` against local servers.
+
+A token endpoint and a protected resource (see ``benchmarks.servers``) run
+in a child process; the client issues ``--requests`` requests keeping
+``--concurrency`` of them in flight, and reports the throughput, the p50
+and p99 latencies, the token endpoint calls per 1000 requests and the
+memory used (max RSS, or the allocations peak with ``--trace-memory``)::
+
+    python -m benchmarks.bench_client --implementation curl \\
+        --concurrency 50 --token-ttl 5 --unauthorized-rate 0.01
+
+``--json`` prints the results as JSON; given such a file, ``--baseline``
+compares the results with it and fails when the throughput or the p99
+latency regressed more than ``--tolerance``.
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+import tracemalloc
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornadoalf.client import Client
+from benchmarks import servers
+
+
+async def run(args, base_url):
+    client = Client(
+        token_endpoint=f'{base_url}/token',
+        client_id='client-id', client_secret='secret',
+        http_client_options={'implementation': args.implementation,
+                             'max_clients': args.concurrency})
+    url = f'{base_url}/resource'
+    latencies = []
+    errors = 0
+    remaining = iter(range(args.requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.fetch(url, raise_error=False)
+            latencies.append(time.perf_counter() - started)
+            if response.code != 200:
+                errors += 1
+
+    # warms up the connections and the token
+    await client.fetch(url, raise_error=False)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await gen.multi([worker() for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - started
+    if args.trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    stats = await client.fetch(f'{base_url}/stats')
+    token_calls = json.loads(stats.body)['token_calls']
+    client.close()
+
+    latencies.sort()
+    results = {
+        'implementation': args.implementation,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'errors': errors,
+        'throughput': args.requests / elapsed,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+        'token_calls_per_1k': token_calls * 1000 / (args.requests + 1),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if args.trace_memory:
+        results['peak_traced_memory_kb'] = peak_memory / 1024
+    return results
+
+
+def _percentile(values, percentile):
+    index = min(len(values) - 1, int(len(values) * percentile / 100))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n')[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--implementation', default='simple',
+                        choices=['simple', 'curl'])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--token-latency', type=float, default=0.01,
+                        help='token endpoint latency, in seconds')
+    parser.add_argument('--resource-latency', type=float, default=0.005,
+                        help='resource latency, in seconds')
+    parser.add_argument('--token-ttl', type=int, default=3600,
+                        help='expires_in of the tokens, in seconds')
+    parser.add_argument('--unauthorized-rate', type=float, default=0,
+                        help='probability of a 401 with a valid token')
+    parser.add_argument('--body-size', type=int, default=1024)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='report the peak of allocated memory '
+                             '(tracemalloc slows the requests down)')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--baseline', type=argparse.FileType(),
+                        help='JSON results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args()
+
+    process, base_url = servers.start_in_process(
+        token_latency=args.token_latency,
+        resource_latency=args.resource_latency, token_ttl=args.token_ttl,
+        unauthorized_rate=args.unauthorized_rate, body_size=args.body_size)
+    try:
+        results = IOLoop.current().run_sync(lambda: run(args, base_url))
+    finally:
+        process.terminate()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, value in results.items():
+            if isinstance(value, float):
+                value = f'{value:.2f}'
+            print(f'{name:<24} {value}')
+
+    if args.baseline and not compare(results, json.load(args.baseline),
+                                     args.tolerance):
+        sys.exit(1)
+
+
+def compare(results, baseline, tolerance):
+    regressions = {
+        'throughput': results['throughput'] < (
+            baseline['throughput'] * (1 - tolerance)),
+        'p99_ms': results['p99_ms'] > baseline['p99_ms'] * (1 + tolerance),
+    }
+    for name, regressed in regressions.items():
+        change = results[name] / baseline[name] - 1
+        status = 'REGRESSION' if regressed else 'ok'
+        print(f'{name:<24} {change:+.1%} vs baseline {status}',
+              file=sys.stderr)
+    return not any(regressions.values())
+
+
+if __name__ == '__main__':
+    main()
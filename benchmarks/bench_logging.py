@@ -0,0 +1,66 @@
+#
+# encoding: utf-8
+"""Per-fetch overhead of the request logging.
+
+Runs ``Client.fetch`` against an HTTP client that answers immediately, so
+only the client overhead is measured, with the request log disabled,
+enabled and sampled::
+
+    python -m benchmarks.bench_logging [--requests N]
+"""
+import argparse
+import logging
+import time
+
+from tornado.httpclient import HTTPResponse
+from tornado.ioloop import IOLoop
+from tornadoalf.client import Client
+from tornadoalf.client import logger as client_logger
+
+
+class InstantHTTPClient:
+
+    async def fetch(self, request, raise_error=True):
+        return HTTPResponse(request, 200, start_time=time.time())
+
+
+async def run(requests, log_sampling):
+    client = Client(token_endpoint='http://endpoint/token',
+                    client_id='client-id', client_secret='secret',
+                    log_sampling=log_sampling)
+    client._http_client = InstantHTTPClient()
+    client._token_manager._request_token = _token
+
+    await client.fetch('http://api/resource')
+    started = time.perf_counter()
+    for _ in range(requests):
+        await client.fetch('http://api/resource')
+    return (time.perf_counter() - started) / requests
+
+
+async def _token():
+    return {'access_token': 'access-token', 'expires_in': 3600}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    client_logger.addHandler(logging.NullHandler())
+    client_logger.propagate = False
+
+    scenarios = [
+        ('logging off', logging.WARNING, 1),
+        ('logging on', logging.DEBUG, 1),
+        ('logging on, 1 in 100', logging.DEBUG, 100),
+    ]
+    for name, level, sampling in scenarios:
+        client_logger.setLevel(level)
+        per_fetch = IOLoop.current().run_sync(
+            lambda: run(args.requests, sampling))
+        print(f'{name:<24} {per_fetch * 1e6:8.2f} us/fetch')
+
+
+if __name__ == '__main__':
+    main()
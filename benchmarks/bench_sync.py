@@ -0,0 +1,115 @@
+#
+# encoding: utf-8
+"""Throughput of ``SyncClient`` shared by threads, versus one per thread.
+
+``--threads`` threads issue ``--requests`` blocking requests in total to
+local servers (see ``benchmarks.servers``), either through one
+``SyncClient`` (``shared``: one event loop, one token) or each through its
+own (``per-thread``: a loop and a token per thread), and report the
+throughput and the token endpoint calls::
+
+    python -m benchmarks.bench_sync --threads 16 --token-ttl 5
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+from tornadoalf.sync import SyncClient
+from benchmarks import servers
+
+
+def run(mode, args, base_url):
+    def make_client():
+        return SyncClient(
+            token_endpoint=f'{base_url}/token',
+            client_id='client-id', client_secret='secret',
+            http_client_options={'implementation': args.implementation,
+                                 'max_clients': args.threads})
+
+    url = f'{base_url}/resource'
+    token_calls = _token_calls(base_url)
+    shared = make_client() if mode == 'shared' else None
+    clients = [shared or make_client() for _ in range(args.threads)]
+    for client in set(clients):
+        # warms up the connections and the token
+        client.fetch(url, raise_error=False)
+
+    remaining = iter(range(args.requests))
+    errors = []
+
+    def worker(client):
+        for _ in remaining:
+            response = client.fetch(url, raise_error=False)
+            if response.code != 200:
+                errors.append(response.code)
+
+    threads = [threading.Thread(target=worker, args=(client,))
+               for client in clients]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    token_calls = _token_calls(base_url) - token_calls
+    for client in set(clients):
+        client.close()
+
+    return {
+        'mode': mode,
+        'threads': args.threads,
+        'requests': args.requests,
+        'errors': len(errors),
+        'throughput': args.requests / elapsed,
+        'token_calls': token_calls,
+    }
+
+
+def _token_calls(base_url):
+    with urllib.request.urlopen(f'{base_url}/stats') as response:
+        return json.load(response)['token_calls']
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n')[0],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--implementation', default='simple',
+                        choices=['simple', 'curl'])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--token-latency', type=float, default=0.01,
+                        help='token endpoint latency, in seconds')
+    parser.add_argument('--resource-latency', type=float, default=0.005,
+                        help='resource latency, in seconds')
+    parser.add_argument('--token-ttl', type=int, default=3600,
+                        help='expires_in of the tokens, in seconds')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    process, base_url = servers.start_in_process(
+        token_latency=args.token_latency,
+        resource_latency=args.resource_latency, token_ttl=args.token_ttl)
+    try:
+        results = [run(mode, args, base_url)
+                   for mode in ('shared', 'per-thread')]
+    finally:
+        process.terminate()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for result in results:
+        for name, value in result.items():
+            if isinstance(value, float):
+                value = f'{value:.2f}'
+            print(f'{name:<24} {value}')
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#
+# encoding: utf-8
+"""Cost of the token cache hit path.
+
+Measures ``Token.is_valid``, ``TokenManager.get_token`` and
+``TokenManager.get_authorization`` with a valid token, and the memory of a
+``Token``::
+
+    python -m benchmarks.bench_token [--calls N]
+"""
+import argparse
+import sys
+import time
+
+from tornado.ioloop import IOLoop
+from tornadoalf.manager import TokenManager
+from tornadoalf.token import Token
+
+
+def bench_is_valid(calls):
+    token = Token('access-token', expires_in=3600)
+    is_valid = token.is_valid
+    started = time.perf_counter()
+    for _ in range(calls):
+        is_valid()
+    return (time.perf_counter() - started) / calls
+
+
+async def bench_get_token(calls, method='get_token'):
+    manager = TokenManager('http://endpoint/token', 'client-id', 'secret')
+    manager._token = Token('access-token', expires_in=3600)
+    get_token = getattr(manager, method)
+    started = time.perf_counter()
+    for _ in range(calls):
+        await get_token()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    per_call = bench_is_valid(args.calls)
+    print(f'{"Token.is_valid":<24} {per_call * 1e9:8.1f} ns/call')
+
+    per_call = IOLoop.current().run_sync(
+        lambda: bench_get_token(args.calls))
+    print(f'{"get_token (hit)":<24} {per_call * 1e9:8.1f} ns/call')
+
+    per_call = IOLoop.current().run_sync(
+        lambda: bench_get_token(args.calls, 'get_authorization'))
+    print(f'{"get_authorization (hit)":<24} {per_call * 1e9:8.1f} ns/call')
+
+    token = Token('access-token', expires_in=3600)
+    print(f'{"Token size":<24} {sys.getsizeof(token):8d} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#
+# encoding: utf-8
+"""Local stand-ins for a token endpoint and a protected resource."""
+import multiprocessing
+import random
+import time
+import uuid
+
+from tornado import gen, web
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+from tornado.httpserver import HTTPServer
+
+
+class TokenHandler(web.RequestHandler):
+
+    async def post(self):
+        settings = self.application.settings
+        await gen.sleep(settings['token_latency'])
+
+        access_token = uuid.uuid4().hex
+        self.application.tokens[access_token] = (
+            time.monotonic() + settings['token_ttl'])
+        self.application.token_calls += 1
+        self.write({'access_token': access_token,
+                    'expires_in': settings['token_ttl']})
+
+
+class ResourceHandler(web.RequestHandler):
+
+    async def get(self):
+        settings = self.application.settings
+        await gen.sleep(settings['resource_latency'])
+
+        authorization = self.request.headers.get('Authorization', '')
+        expires_on = self.application.tokens.get(authorization[7:], 0)
+        if expires_on < time.monotonic() or (
+                random.random() < settings['unauthorized_rate']):
+            self.set_status(401)
+            return
+
+        self.write(settings['body'])
+
+
+class StatsHandler(web.RequestHandler):
+
+    def get(self):
+        self.write({'token_calls': self.application.token_calls})
+
+
+def make_app(token_latency=0, resource_latency=0, token_ttl=3600,
+             unauthorized_rate=0, body_size=1024):
+    """``unauthorized_rate`` is the probability of a resource request
+    getting a 401 even with a valid token (e.g. a revoked token)."""
+    app = web.Application([
+        ('/token', TokenHandler),
+        ('/resource', ResourceHandler),
+        ('/stats', StatsHandler),
+    ], token_latency=token_latency, resource_latency=resource_latency,
+        token_ttl=token_ttl, unauthorized_rate=unauthorized_rate,
+        body=b'x' * body_size, log_function=lambda handler: None)
+    app.tokens = {}
+    app.token_calls = 0
+    return app
+
+
+def serve(options, port_pipe):
+    sockets = bind_sockets(0, '127.0.0.1')
+    server = HTTPServer(make_app(**options))
+    server.add_sockets(sockets)
+    port_pipe.send(sockets[0].getsockname()[1])
+    IOLoop.current().start()
+
+
+def start_in_process(**options):
+    """Serves the app in a child process, so it doesn't compete with the
+    measured client for the IOLoop. Returns ``(process, base_url)``."""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=serve, args=(options, sender),
+                                      daemon=True)
+    process.start()
+    port = receiver.recv()
+    return process, f'http://127.0.0.1:{port}'
@@ -37,6 +37,7 @@ setup(
     packages=find_packages(
         exclude=(
             'tests',
+            'benchmarks',
         ),
     ),
     include_package_data=True,
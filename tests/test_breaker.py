@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from mock import Mock, patch
+from . import mkfuture, mkfuture_exception
+
+from tornado.httpclient import HTTPError
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError)
+from tornadoalf.client import Client
+from tornadoalf.manager import TokenManager
+from tornadoalf.token import Token, TokenCircuitOpenError, TokenError
+
+
+@patch('tornadoalf.breaker.time.monotonic', Mock(return_value=100))
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker(failure_ratio=0.5, minimum_calls=4,
+                                      window_size=4, cooldown=10)
+
+    def _fail(self, times):
+        for _ in range(times):
+            self.breaker.record_failure()
+
+    def test_should_start_closed(self):
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_should_wait_the_minimum_calls_to_open(self):
+        self._fail(3)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        self._fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+
+    def test_should_open_on_the_failure_ratio_of_the_window(self):
+        self.breaker.record_success()
+        self.breaker.record_success()
+        self.breaker.record_success()
+        self._fail(1)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+        # the oldest success left the window
+        self._fail(1)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_should_allow_a_single_probe_after_the_cooldown(self):
+        self._fail(4)
+
+        with patch('tornadoalf.breaker.time.monotonic',
+                   Mock(return_value=110)):
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            self.assertTrue(self.breaker.allow())
+            self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_should_close_the_circuit(self):
+        self._fail(4)
+
+        with patch('tornadoalf.breaker.time.monotonic',
+                   Mock(return_value=110)):
+            self.breaker.allow()
+            self.breaker.record_success()
+
+            self.assertEqual(self.breaker.state, CLOSED)
+            self.breaker.record_failure()
+            self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_should_open_the_circuit_again(self):
+        self._fail(4)
+
+        with patch('tornadoalf.breaker.time.monotonic',
+                   Mock(return_value=110)):
+            self.breaker.allow()
+            self.breaker.record_failure()
+
+            self.assertEqual(self.breaker.state, OPEN)
+            self.assertFalse(self.breaker.allow())
+
+    def test_should_replace_a_lost_probe_after_the_cooldown(self):
+        self._fail(4)
+
+        with patch('tornadoalf.breaker.time.monotonic',
+                   Mock(return_value=110)):
+            self.breaker.allow()
+
+        with patch('tornadoalf.breaker.time.monotonic',
+                   Mock(return_value=120)):
+            self.assertTrue(self.breaker.allow())
+
+
+class TestTokenManagerCircuitBreaker(AsyncTestCase):
+
+    def setUp(self):
+        super(TestTokenManagerCircuitBreaker, self).setUp()
+        self.breaker = CircuitBreaker(minimum_calls=1, cooldown=60)
+        self.manager = TokenManager('http://endpoint/token', 'client_id',
+                                    'client_secret',
+                                    circuit_breaker=self.breaker)
+        self.manager._request_token = Mock(
+            side_effect=lambda: mkfuture_exception(TokenError('boom', None)))
+
+    @gen_test
+    def test_should_fail_fast_while_the_circuit_is_open(self):
+        with self.assertRaises(TokenError):
+            yield self.manager.get_token()
+
+        with self.assertRaises(TokenCircuitOpenError):
+            yield self.manager.get_token()
+
+        self.assertEqual(self.manager._request_token.call_count, 1)
+
+    @gen_test
+    def test_should_keep_the_valid_token_while_the_circuit_is_open(self):
+        self.breaker.record_failure()
+        self.manager._token = Token('cached', expires_in=10)
+
+        yield self.manager.reset_token('cached')
+        token = yield self.manager.get_token()
+
+        self.assertEqual(token, 'cached')
+        self.assertFalse(self.manager._request_token.called)
+
+    @gen_test
+    def test_should_close_after_a_successful_request(self):
+        self.manager._request_token.side_effect = lambda: mkfuture({
+            'access_token': 'access', 'expires_in': 10})
+
+        token = yield self.manager.get_token()
+
+        self.assertEqual(token, 'access')
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+class TestClientHostCircuitBreaker(AsyncTestCase):
+
+    def setUp(self):
+        super(TestClientHostCircuitBreaker, self).setUp()
+        self.client = Client(token_endpoint='http://endpoint/token',
+                             client_id='client-id',
+                             client_secret='client_secret',
+                             host_circuit_breaker={'minimum_calls': 2,
+                                                   'cooldown': 60})
+        self.client._token_manager = Mock()
+        self.client._token_manager.get_authorization.side_effect = (
+            lambda: mkfuture('Bearer token'))
+        self.client._http_client = Mock()
+
+    @gen_test
+    def test_should_fail_fast_for_a_failing_host(self):
+        self.client._http_client.fetch.side_effect = (
+            lambda request, **kwargs: mkfuture_exception(HTTPError(503)))
+
+        for _ in range(2):
+            with self.assertRaises(HTTPError):
+                yield self.client.fetch('http://api/resource')
+
+        with self.assertRaises(CircuitOpenError):
+            yield self.client.fetch('http://api/resource')
+
+        self.assertEqual(self.client._http_client.fetch.call_count, 2)
+        self.assertFalse(self.client._token_manager.reset_token.called)
+
+    @gen_test
+    def test_should_keep_the_circuits_of_other_hosts_closed(self):
+        self.client._http_client.fetch.side_effect = (
+            lambda request, **kwargs: mkfuture(Mock(
+                code=200, error=None, time_info={}, start_time=0)))
+        for _ in range(2):
+            self.client._host_breaker('http://api/').record_failure()
+
+        response = yield self.client.fetch('http://other/resource')
+
+        self.assertEqual(response.code, 200)
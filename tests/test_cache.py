@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from io import BytesIO
+
+from tornado import gen
+from tornado.httpclient import HTTPRequest, HTTPResponse
+from tornado.httputil import HTTPHeaders
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.cache import ResponseCache
+
+
+class TestResponseCache(AsyncTestCase):
+
+    url = 'http://api/resource'
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.cache = ResponseCache()
+        self.requests = []
+
+    def fetcher(self, request, code=200, body=b'body', delay=0, **headers):
+        async def fetch():
+            self.requests.append(dict(request.headers))
+            if delay:
+                await gen.sleep(delay)
+            return HTTPResponse(request, code, headers=HTTPHeaders(headers),
+                                buffer=BytesIO(body))
+        return fetch
+
+    async def fetch(self, key='key', request_headers=None, **response):
+        request = HTTPRequest(self.url, headers=request_headers)
+        return await self.cache.fetch(
+            key, request, self.fetcher(request, **response))
+
+    @gen_test
+    async def test_should_reuse_a_fresh_response(self):
+        await self.fetch(**{'Cache-Control': 'max-age=60'})
+        response = await self.fetch(body=b'other')
+
+        self.assertEqual(response.body, b'body')
+        self.assertEqual(len(self.requests), 1)
+
+    @gen_test
+    async def test_should_not_share_responses_between_keys(self):
+        await self.fetch('alice', **{'Cache-Control': 'max-age=60'})
+        response = await self.fetch('bob', body=b'bob')
+
+        self.assertEqual(response.body, b'bob')
+
+    @gen_test
+    async def test_should_revalidate_a_stale_response(self):
+        await self.fetch(**{'Cache-Control': 'no-cache', 'ETag': '"v1"'})
+        response = await self.fetch(code=304, body=b'',
+                                    **{'Cache-Control': 'max-age=60'})
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'body')
+        self.assertEqual(self.requests[1]['If-None-Match'], '"v1"')
+
+        # the 304 made it fresh again
+        await self.fetch(body=b'other')
+        self.assertEqual(len(self.requests), 2)
+
+    @gen_test
+    async def test_should_replace_a_modified_response(self):
+        await self.fetch(**{'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        response = await self.fetch(body=b'new')
+
+        self.assertEqual(response.body, b'new')
+        self.assertEqual(self.requests[1]['If-Modified-Since'],
+                         'Mon, 01 Jan 2024 00:00:00 GMT')
+
+    @gen_test
+    async def test_should_honor_no_store(self):
+        await self.fetch(**{'Cache-Control': 'no-store, max-age=60'})
+        await self.fetch(**{'Cache-Control': 'max-age=60'})
+        await self.fetch(request_headers={'Cache-Control': 'no-cache'})
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertFalse(ResponseCache.is_cacheable(HTTPRequest(
+            self.url, headers={'Cache-Control': 'no-store'})))
+
+    @gen_test
+    async def test_should_use_expires(self):
+        await self.fetch(**{'Date': 'Mon, 01 Jan 2024 00:00:00 GMT',
+                            'Expires': 'Mon, 01 Jan 2024 00:01:00 GMT'})
+        await self.fetch()
+
+        self.assertEqual(len(self.requests), 1)
+
+    @gen_test
+    async def test_should_vary_on_the_request_headers(self):
+        await self.fetch(request_headers={'Accept': 'application/json'},
+                         **{'Cache-Control': 'max-age=60', 'Vary': 'Accept'})
+        response = await self.fetch(request_headers={'Accept': 'text/csv'},
+                                    body=b'csv')
+
+        self.assertEqual(response.body, b'csv')
+
+    @gen_test
+    async def test_should_keep_the_response_not_replaced(self):
+        json = {'Accept': 'application/json'}
+        await self.fetch(request_headers=json,
+                         **{'Cache-Control': 'max-age=60', 'Vary': 'Accept'})
+        await self.fetch(request_headers={'Accept': 'text/csv'}, body=b'csv',
+                         **{'Cache-Control': 'no-store', 'Vary': 'Accept'})
+        response = await self.fetch(request_headers=json)
+
+        self.assertEqual(response.body, b'body')
+        self.assertEqual(len(self.requests), 2)
+
+    @gen_test
+    async def test_should_evict_the_least_recently_used_responses(self):
+        self.cache = ResponseCache(max_entries=2, max_size=10)
+        fresh = {'Cache-Control': 'max-age=60'}
+
+        await self.fetch('first', **fresh)
+        await self.fetch('second', **fresh)
+        await self.fetch('first')
+        await self.fetch('third', **fresh)
+
+        self.assertEqual(list(self.cache._entries), ['first', 'third'])
+        await self.fetch('large', body=b'x' * 11, **fresh)
+        self.assertEqual(len(self.cache), 2)
+
+        await self.fetch('fourth', body=b'x' * 8, **fresh)
+        self.assertEqual(list(self.cache._entries), ['fourth'])
+
+    @gen_test
+    async def test_should_coalesce_concurrent_requests(self):
+        responses = await asyncio.gather(*[
+            self.fetch(delay=0.01) for _ in range(5)])
+
+        self.assertEqual([r.body for r in responses], [b'body'] * 5)
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(self.cache._in_flight, {})
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+
+from asyncio import Future
 from mock import patch, Mock
 from . import mkfuture
 
-from tornado import gen
-from tornado.httpclient import HTTPError
-from tornado.testing import AsyncTestCase, gen_test
+from tornado import gen, web
+from tornado.httpclient import AsyncHTTPClient, HTTPError, HTTPRequest
+from tornado.testing import AsyncHTTPTestCase, AsyncTestCase, gen_test
 from tornadoalf.manager import TokenManager, TokenError
+from tornadoalf.cache import ResponseCache
 from tornadoalf.client import Client
+from tornadoalf.httpclient import Deadline, DeadlineExceededError
+from tornadoalf.retry import ReplayPolicy, RetryPolicy
 
 
 class TestClient(AsyncTestCase):
@@ -26,6 +32,139 @@ class TestClient(AsyncTestCase):
             isinstance(client._token_manager, client.token_manager_class)
         )
 
+    def test_should_pass_token_options_to_the_token_manager(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret',
+                        token_options={'refresh_ratio': 0.8})
+
+        self.assertEqual(client._token_manager._refresh_ratio, 0.8)
+
+    def test_close_should_close_the_token_manager(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret')
+        client._token_manager = Mock()
+
+        client.close()
+
+        self.assertTrue(client._token_manager.close.called)
+
+    def test_should_borrow_the_ioloop_http_client_by_default(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret')
+
+        # resolved when used, so each IOLoop uses its own
+        self.assertIsNone(client._http_client)
+        self.assertIsNone(client._token_manager._http_client)
+
+        client.close()
+        self.assertFalse(AsyncHTTPClient()._closed)
+
+    @gen_test
+    async def test_should_close_the_http_clients_it_created(self):
+        borrowed = Mock()
+        async with Client(token_endpoint=self.end_point,
+                          client_id='client-id', client_secret='secret',
+                          http_client=borrowed,
+                          token_http_client_options={}) as client:
+            token_http_client = client._token_manager._http_client
+
+        self.assertTrue(token_http_client._closed)
+        self.assertFalse(borrowed.close.called)
+        with self.assertRaises(RuntimeError):
+            await client.fetch(self.resource_url)
+
+    @gen_test
+    async def test_aclose_should_cancel_the_token_request_in_flight(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='secret')
+        client._token_manager._request_token = Mock(return_value=Future())
+        fetching = asyncio.ensure_future(client.fetch(self.resource_url))
+        await gen.sleep(0.01)
+
+        await client.aclose()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await fetching
+        self.assertIsNone(client._token_manager._refreshing)
+
+    def test_should_refuse_to_be_used_from_another_event_loop(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='secret')
+
+        async def fetch():
+            with patch.object(client, '_fetch', return_value='response'):
+                return await client.fetch(self.resource_url)
+
+        self.assertEqual(self.io_loop.run_sync(fetch), 'response')
+        other_loop = asyncio.new_event_loop()
+        try:
+            with self.assertRaises(RuntimeError):
+                other_loop.run_until_complete(fetch())
+        finally:
+            other_loop.close()
+
+    def test_should_create_its_own_http_client_from_options(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret',
+                        http_client_options={'max_clients': 50})
+
+        self.assertIsNot(client._http_client, AsyncHTTPClient())
+        self.assertEqual(client._http_client.max_clients, 50)
+        self.assertIs(client._token_manager._http_client,
+                      client._http_client)
+
+    def test_should_separate_the_token_http_client_from_options(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret',
+                        http_client_options={'max_clients': 50},
+                        token_http_client_options={'max_clients': 2})
+
+        token_http_client = client._token_manager._http_client
+        self.assertIsNot(token_http_client, client._http_client)
+        self.assertEqual(token_http_client.max_clients, 2)
+
+    @gen_test
+    def test_should_limit_the_concurrent_requests_per_host(self):
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret',
+                        max_requests_per_host=2)
+        client._token_manager = Mock()
+        client._token_manager.get_authorization.side_effect = (
+            lambda: mkfuture('Bearer token'))
+        running = []
+        peak = []
+
+        async def fetch(request, **kwargs):
+            running.append(request.url)
+            peak.append(len(running))
+            await gen.sleep(0.01)
+            running.remove(request.url)
+            return Mock(code=200, error=None, time_info={}, start_time=0)
+
+        client._http_client = Mock(fetch=fetch)
+
+        yield [client.fetch(self.resource_url) for _ in range(5)] + [
+            client.fetch('http://other/resource')]
+
+        # two requests to the api host plus the one to the other host
+        self.assertEqual(max(peak), 3)
+
+    @gen_test
+    def test_should_work_with_token_managers_without_authorization(self):
+        manager = Mock(spec=['get_token', 'close'])
+        manager.get_token.return_value = mkfuture('token')
+        client = Client(token_endpoint=self.end_point,
+                        client_id='client-id', client_secret='client_secret',
+                        token_manager=manager)
+        client._http_client = Mock()
+        client._http_client.fetch.return_value = mkfuture(
+            Mock(code=200, error=None, time_info={}, start_time=0))
+
+        yield client.fetch(self.resource_url)
+
+        request = client._http_client.fetch.call_args[0][0]
+        self.assertEqual(request.headers['Authorization'], 'Bearer token')
+
     @gen_test
     @patch('tornadoalf.client.TokenManager')
     def test_should_return_a_good_request(self, Manager):
@@ -156,6 +295,8 @@ class TestClient(AsyncTestCase):
         manager = Mock()
         manager._has_token.return_value = has_token
         manager.get_token.return_value = mkfuture(access_token[0])
+        manager.get_authorization.return_value = mkfuture(
+            'Bearer ' + access_token[0])
         manager.reset_token.return_value = mkfuture(None)
         manager.request_token.return_value = mkfuture(Mock(
             code=code,
@@ -165,3 +306,561 @@ class TestClient(AsyncTestCase):
         Manager.return_value = manager
 
         return manager
+
+
+class TestClientFetchMany(AsyncTestCase):
+
+    def setUp(self):
+        super(TestClientFetchMany, self).setUp()
+        self.client = Client(token_endpoint='http://endpoint/token',
+                             client_id='client-id',
+                             client_secret='client_secret')
+        self.manager = TokenManager('http://endpoint/token',
+                                    'client-id', 'client_secret')
+        self.manager._request_token = Mock(side_effect=self._request_token)
+        self.client._token_manager = self.manager
+        self.running = 0
+        self.peak = 0
+        self.client._http_client = Mock(fetch=self._fetch)
+
+    def _request_token(self):
+        count = self.manager._request_token.call_count
+        return mkfuture({'access_token': 'token-%d' % count,
+                         'expires_in': 10})
+
+    async def _fetch(self, request, raise_error=True):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        delay = float(request.url.rsplit('/', 1)[-1])
+        await gen.sleep(delay)
+        self.running -= 1
+
+        if 'fail' in request.url:
+            raise HTTPError(500)
+        if request.headers['Authorization'] == 'Bearer token-1' and (
+                'expire' in request.url):
+            return Mock(code=401, error=HTTPError(401), time_info={},
+                        start_time=0)
+        return Mock(code=200, error=None, url=request.url, time_info={},
+                    start_time=0)
+
+    @gen_test
+    async def test_should_reject_a_concurrency_below_one(self):
+        for concurrency in (0, -1):
+            with self.assertRaises(ValueError):
+                await self.client.fetch_many(['http://api/0'], concurrency)
+
+        self.assertEqual(self.manager._request_token.call_count, 0)
+
+    @gen_test
+    def test_should_return_the_responses_in_order(self):
+        urls = ['http://api/%s' % delay for delay in (0.03, 0.01, 0.02)]
+
+        responses = yield self.client.fetch_many(urls)
+
+        self.assertEqual([r.url for r in responses], urls)
+        self.assertEqual(self.manager._request_token.call_count, 1)
+
+    @gen_test
+    def test_should_bound_the_concurrent_requests(self):
+        urls = ['http://api/0.01'] * 10
+
+        responses = yield self.client.fetch_many(urls, concurrency=3)
+
+        self.assertEqual(len(responses), 10)
+        self.assertEqual(self.peak, 3)
+
+    @gen_test
+    async def test_should_yield_the_responses_as_they_complete(self):
+        urls = ['http://api/%s' % delay for delay in (0.03, 0.01, 0.02)]
+        indexes = []
+
+        async for index, response in self.client.iter_fetch_many(urls):
+            self.assertEqual(response.url, urls[index])
+            indexes.append(index)
+
+        self.assertEqual(indexes, [1, 2, 0])
+
+    @gen_test
+    def test_should_return_exceptions_in_place_of_responses(self):
+        urls = ['http://api/0.01', 'http://api/fail/0.01']
+
+        responses = yield self.client.fetch_many(urls,
+                                                 return_exceptions=True)
+
+        self.assertEqual(responses[0].code, 200)
+        self.assertIsInstance(responses[1], HTTPError)
+
+    @gen_test
+    def test_should_raise_the_first_error(self):
+        urls = ['http://api/fail/0.01', 'http://api/0.05']
+
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch_many(urls)
+
+    @gen_test
+    def test_should_use_the_token_of_the_scope(self):
+        _fetch = Mock(return_value=mkfuture({
+            'access_token': 'scoped', 'expires_in': 10}))
+
+        with patch.object(TokenManager, '_fetch', new=_fetch):
+            response = yield self.client.fetch('http://api/0', scope='read')
+
+        self.assertEqual(response.code, 200)
+        data = _fetch.call_args[1]['data']
+        self.assertEqual(data['scope'], 'read')
+        self.assertFalse(self.manager._request_token.called)
+
+    @gen_test
+    def test_should_refresh_the_token_once_for_a_batch_of_401(self):
+        urls = ['http://api/expire/0.01'] * 5
+
+        responses = yield self.client.fetch_many(urls)
+
+        self.assertEqual([r.code for r in responses], [200] * 5)
+        self.assertEqual(self.manager._request_token.call_count, 2)
+
+
+class TokenHandler(web.RequestHandler):
+
+    def post(self):
+        self.application.tokens += 1
+        self.write({'access_token': 'token-%d' % self.application.tokens,
+                    'expires_in': 10})
+
+
+class ExportHandler(web.RequestHandler):
+
+    async def get(self):
+        if self.request.headers['Authorization'] == 'Bearer token-1':
+            self.set_status(401)
+            self.finish('expired token')
+            return
+
+        for chunk in (b'first,', b'second,', b'third'):
+            self.write(chunk)
+            await self.flush()
+
+
+class FlakyHandler(web.RequestHandler):
+
+    def get(self):
+        self.application.attempts += 1
+        if self.request.headers['Authorization'] == 'Bearer token-1':
+            self.set_status(401)
+        elif self.application.failures:
+            self.application.failures -= 1
+            self.set_status(503)
+            self.write(b'unavailable')
+        else:
+            self.write(b'recovered')
+
+    post = get
+
+
+@web.stream_request_body
+class UploadHandler(web.RequestHandler):
+
+    def prepare(self):
+        self.received = []
+        if self.request.headers['Authorization'] == 'Bearer token-1':
+            # rejected before the body is read
+            self.set_status(401)
+            self.finish()
+
+    def data_received(self, chunk):
+        self.received.append(chunk)
+
+    def put(self):
+        self.write(b''.join(self.received))
+
+
+class ResourceHandler(web.RequestHandler):
+
+    def head(self):
+        self.application.probes += 1
+        if self.request.headers['Authorization'] == 'Bearer token-1':
+            self.set_status(401)
+
+    def post(self):
+        self.application.attempts += 1
+        if self.request.headers['Authorization'] == 'Bearer token-1':
+            self.set_status(401)
+        else:
+            self.write(b'created')
+
+
+class SlowHandler(web.RequestHandler):
+
+    async def get(self):
+        self.application.attempts += 1
+        await gen.sleep(float(self.get_argument('delay')))
+        self.write(self.request.headers.get('X-Request-Timeout', ''))
+
+
+class SlowTokenHandler(web.RequestHandler):
+
+    async def post(self):
+        await gen.sleep(1)
+        self.write({'access_token': 'token', 'expires_in': 10})
+
+
+class CachedHandler(web.RequestHandler):
+
+    def get(self):
+        self.application.attempts += 1
+        self.set_header('Cache-Control', 'no-cache')
+        self.set_header('ETag', '"v1"')
+        if self.request.headers.get('If-None-Match') == '"v1"':
+            self.set_status(304)
+        else:
+            self.write(b'report')
+
+    head = get
+
+
+class TestClientStreaming(AsyncHTTPTestCase):
+
+    def get_app(self):
+        app = web.Application([
+            ('/token', TokenHandler),
+            ('/export', ExportHandler),
+            ('/upload', UploadHandler),
+            ('/flaky', FlakyHandler),
+        ])
+        app.tokens = 0
+        app.attempts = 0
+        app.failures = 1
+        return app
+
+    def setUp(self):
+        super(TestClientStreaming, self).setUp()
+        self.client = Client(token_endpoint=self.get_url('/token'),
+                             client_id='client-id',
+                             client_secret='client_secret')
+
+    @gen_test
+    def test_should_stream_the_body_after_replaying_a_401(self):
+        chunks = []
+
+        response = yield self.client.fetch(
+            self.get_url('/export'), streaming_callback=chunks.append)
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'')
+        self.assertEqual(b''.join(chunks), b'first,second,third')
+        self.assertEqual(self._app.tokens, 2)
+
+    @gen_test
+    def test_should_restore_the_callbacks_of_the_request(self):
+        chunks = []
+        request = HTTPRequest(self.get_url('/export'),
+                              streaming_callback=chunks.append)
+
+        yield self.client.fetch(request)
+
+        self.assertEqual(request.streaming_callback, chunks.append)
+        self.assertIsNone(request.header_callback)
+
+    @gen_test
+    async def test_should_iterate_the_body_chunks(self):
+        chunks = []
+
+        async for chunk in self.client.stream(self.get_url('/export')):
+            chunks.append(chunk)
+
+        self.assertEqual(b''.join(chunks), b'first,second,third')
+
+    @gen_test
+    async def test_should_restore_the_callback_of_a_streamed_request(self):
+        request = HTTPRequest(self.get_url('/export'))
+
+        async for _ in self.client.stream(request):
+            pass
+
+        self.assertIsNone(request.streaming_callback)
+
+    @gen_test
+    def test_should_stream_the_request_body(self):
+        async def body_producer(write):
+            for chunk in (b'large', b'-', b'upload'):
+                await write(chunk)
+
+        self._app.tokens = 1
+        response = yield self.client.fetch(
+            self.get_url('/upload'), method='PUT',
+            body_producer=body_producer)
+
+        self.assertEqual(response.body, b'large-upload')
+
+    @gen_test
+    def test_should_retry_transient_errors_and_replay_a_401(self):
+        self.client._retry_policy = RetryPolicy(backoff=0.001, budget=False)
+        chunks = []
+
+        response = yield self.client.fetch(self.get_url('/flaky'),
+                                           streaming_callback=chunks.append)
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(b''.join(chunks), b'recovered')
+        # 401, replay with 503 and its retry
+        self.assertEqual(self._app.attempts, 3)
+
+    @gen_test
+    async def test_should_stream_the_error_of_a_request_not_retried(self):
+        self.client._retry_policy = RetryPolicy(backoff=0.001, budget=False)
+        self._app.tokens = 1
+        chunks = []
+
+        with self.assertRaises(HTTPError) as context:
+            async for chunk in self.client.stream(
+                    self.get_url('/flaky'), method='POST', body=b'order'):
+                chunks.append(chunk)
+
+        self.assertEqual(context.exception.code, 503)
+        self.assertEqual(chunks, [b'unavailable'])
+        self.assertEqual(self._app.attempts, 1)
+
+    @gen_test
+    def test_should_stream_the_error_of_the_last_attempt(self):
+        self.client._retry_policy = RetryPolicy(
+            max_attempts=2, backoff=0.001, budget=False)
+        self._app.tokens = 1
+        self._app.failures = 2
+        chunks = []
+
+        response = yield self.client.fetch(
+            self.get_url('/flaky'), raise_error=False,
+            streaming_callback=chunks.append)
+
+        self.assertEqual(response.code, 503)
+        self.assertEqual(chunks, [b'unavailable'])
+        self.assertEqual(self._app.attempts, 2)
+
+    @gen_test
+    def test_should_not_retry_non_idempotent_requests(self):
+        self.client._retry_policy = RetryPolicy(backoff=0.001, budget=False)
+        self._app.tokens = 1
+
+        with self.assertRaises(HTTPError) as context:
+            yield self.client.fetch(self.get_url('/flaky'), method='POST',
+                                    body=b'')
+
+        self.assertEqual(context.exception.code, 503)
+        self.assertEqual(self._app.attempts, 1)
+
+    def test_should_share_the_retry_policy_with_the_token_manager(self):
+        policy = RetryPolicy()
+        client = Client(token_endpoint=self.get_url('/token'),
+                        client_id='client-id', client_secret='client_secret',
+                        retry_policy=policy)
+
+        self.assertIs(client._token_manager._retry_policy, policy)
+
+
+class TestClientReplay(AsyncHTTPTestCase):
+
+    def get_app(self):
+        app = web.Application([
+            ('/token', TokenHandler),
+            ('/upload', UploadHandler),
+            ('/resource', ResourceHandler),
+        ])
+        app.tokens = 0
+        app.attempts = 0
+        app.probes = 0
+        return app
+
+    def make_client(self, **policy):
+        return Client(token_endpoint=self.get_url('/token'),
+                      client_id='client-id', client_secret='client_secret',
+                      replay_policy=ReplayPolicy(**policy))
+
+    @gen_test
+    def test_should_not_replay_the_methods_out_of_the_policy(self):
+        client = self.make_client(methods=['GET'])
+
+        with self.assertRaises(HTTPError) as context:
+            yield client.fetch(self.get_url('/resource'), method='POST',
+                               body=b'')
+
+        self.assertEqual(context.exception.code, 401)
+        self.assertEqual(self._app.attempts, 1)
+        # the next requests get a new token
+        self.assertEqual(self._app.tokens, 2)
+
+    @gen_test
+    def test_should_not_replay_when_the_caller_opts_out(self):
+        client = self.make_client()
+
+        response = yield client.fetch(self.get_url('/resource'),
+                                      method='POST', body=b'',
+                                      raise_error=False, replay=False)
+
+        self.assertEqual(response.code, 401)
+        self.assertEqual(self._app.attempts, 1)
+
+    @gen_test
+    def test_should_not_replay_large_bodies(self):
+        client = self.make_client(max_body_size=4)
+
+        response = yield client.fetch(self.get_url('/upload'), method='PUT',
+                                      body=b'large-upload',
+                                      raise_error=False)
+        self.assertEqual(response.code, 401)
+
+        response = yield client.fetch(self.get_url('/upload'), method='PUT',
+                                      body=b'tiny')
+        self.assertEqual(response.body, b'tiny')
+
+    @gen_test
+    def test_should_replay_a_body_rejected_before_being_sent(self):
+        client = self.make_client(max_body_size=0, preflight='expect')
+        produced = []
+
+        async def body_producer(write):
+            produced.append(True)
+            await write(b'large-upload')
+
+        response = yield client.fetch(self.get_url('/upload'), method='PUT',
+                                      body_producer=body_producer)
+
+        self.assertEqual(response.body, b'large-upload')
+        self.assertEqual(produced, [True])
+        self.assertEqual(self._app.tokens, 2)
+
+    @gen_test
+    def test_should_probe_the_token_before_a_request_not_replayed(self):
+        client = self.make_client(methods=['GET'], preflight='head')
+
+        response = yield client.fetch(self.get_url('/resource'),
+                                      method='POST', body=b'')
+        self.assertEqual(response.body, b'created')
+        response = yield client.fetch(self.get_url('/resource'),
+                                      method='POST', body=b'')
+
+        self.assertEqual(response.body, b'created')
+        self.assertEqual(self._app.attempts, 2)
+        # the second request reuses the token accepted by the first one
+        self.assertEqual(self._app.probes, 1)
+
+
+class TestClientDeadline(AsyncHTTPTestCase):
+
+    def get_app(self):
+        app = web.Application([
+            ('/token', TokenHandler),
+            ('/slow-token', SlowTokenHandler),
+            ('/slow', SlowHandler),
+        ])
+        app.tokens = 1
+        app.attempts = 0
+        return app
+
+    def make_client(self, token_path='/token', **options):
+        return Client(token_endpoint=self.get_url(token_path),
+                      client_id='client-id', client_secret='client_secret',
+                      **options)
+
+    @gen_test
+    def test_should_propagate_the_time_left(self):
+        client = self.make_client(deadline_header='X-Request-Timeout')
+
+        response = yield client.fetch(self.get_url('/slow?delay=0'),
+                                      deadline=Deadline(5))
+
+        self.assertTrue(4 < float(response.body) <= 5)
+
+    @gen_test
+    def test_should_bound_the_request(self):
+        client = self.make_client()
+        request = HTTPRequest(self.get_url('/slow?delay=1'),
+                              request_timeout=30)
+
+        with self.assertRaises(HTTPError) as context:
+            yield client.fetch(request, total_timeout=0.2)
+
+        self.assertEqual(context.exception.code, 599)
+        # the timeouts of the request are restored
+        self.assertEqual(request.request_timeout, 30)
+
+    @gen_test
+    def test_should_bound_the_wait_for_the_token(self):
+        client = self.make_client('/slow-token')
+
+        with self.assertRaises(DeadlineExceededError):
+            yield client.fetch(self.get_url('/slow?delay=0'),
+                               total_timeout=0.2)
+
+        self.assertEqual(self._app.attempts, 0)
+
+    @gen_test
+    def test_should_not_retry_past_the_deadline(self):
+        client = self.make_client(retry_policy=RetryPolicy(
+            backoff=0.001, budget=False, status_codes=[599]))
+
+        with self.assertRaises(HTTPError):
+            yield client.fetch(self.get_url('/slow?delay=0.5'),
+                               total_timeout=0.2)
+
+        self.assertEqual(self._app.attempts, 1)
+
+    @gen_test
+    async def test_should_bound_the_wait_for_a_cached_request(self):
+        client = self.make_client(response_cache=ResponseCache())
+        url = self.get_url('/slow?delay=0.5')
+        first = asyncio.ensure_future(client.fetch(url))
+        await asyncio.sleep(0.05)
+
+        with self.assertRaises(DeadlineExceededError):
+            await client.fetch(url, total_timeout=0.1)
+
+        # the shared request still completes for the first caller
+        response = await first
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self._app.attempts, 1)
+
+
+class TestClientResponseCache(AsyncHTTPTestCase):
+
+    def get_app(self):
+        app = web.Application([
+            ('/token', TokenHandler),
+            ('/cached', CachedHandler),
+        ])
+        app.tokens = 1
+        app.attempts = 0
+        return app
+
+    def setUp(self):
+        super(TestClientResponseCache, self).setUp()
+        self.client = Client(token_endpoint=self.get_url('/token'),
+                             client_id='client-id',
+                             client_secret='client_secret',
+                             response_cache=ResponseCache())
+
+    @gen_test
+    def test_should_revalidate_the_cached_response(self):
+        first = yield self.client.fetch(self.get_url('/cached'))
+        second = yield self.client.fetch(self.get_url('/cached'))
+
+        self.assertEqual(first.body, b'report')
+        self.assertEqual(second.code, 200)
+        self.assertEqual(second.body, b'report')
+        self.assertEqual(self._app.attempts, 2)
+        self.assertEqual(len(self.client._response_cache), 1)
+
+    @gen_test
+    def test_should_cache_apart_for_each_scope(self):
+        yield self.client.fetch(self.get_url('/cached'))
+        yield self.client.fetch(self.get_url('/cached'), scope='other')
+
+        self.assertEqual(len(self.client._response_cache), 2)
+
+    @gen_test
+    def test_should_not_cache_other_methods(self):
+        response = yield self.client.fetch(self.get_url('/cached'),
+                                           method='HEAD')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(len(self.client._response_cache), 0)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from mock import Mock, patch
+from . import mkfuture
+
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.endpoints import EndpointPool
+from tornadoalf.manager import TokenManager
+from tornadoalf.token import TokenCircuitOpenError, TokenHTTPError
+
+
+class TestEndpointPool(AsyncTestCase):
+
+    def setUp(self):
+        super(TestEndpointPool, self).setUp()
+        self.pool = EndpointPool(['http://a/token', 'http://b/token'],
+                                 hedge_delay=0.05,
+                                 circuit_breaker={'minimum_calls': 1})
+        self.calls = []
+        # url -> (delay, result or exception)
+        self.endpoints = {}
+
+    async def _fetch(self, url):
+        self.calls.append(url)
+        delay, result = self.endpoints[url]
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    @gen_test
+    async def test_should_prefer_the_fastest_endpoint(self):
+        self.pool._endpoints[0].ewma = 0.5
+        self.pool._endpoints[1].ewma = 0.1
+        self.endpoints['http://b/token'] = (0, 'b')
+
+        result = await self.pool.fetch(self._fetch)
+
+        self.assertEqual(result, 'b')
+        self.assertEqual(self.calls, ['http://b/token'])
+
+    @gen_test
+    async def test_should_fail_over_to_the_next_endpoint(self):
+        self.endpoints['http://a/token'] = (
+            0, TokenHTTPError('Failed', Mock(code=503)))
+        self.endpoints['http://b/token'] = (0, 'b')
+
+        result = await self.pool.fetch(self._fetch)
+
+        self.assertEqual(result, 'b')
+        self.assertEqual(self.calls, ['http://a/token', 'http://b/token'])
+
+    @gen_test
+    async def test_should_not_prefer_an_endpoint_failing_fast(self):
+        self.pool = EndpointPool(['http://a/token', 'http://b/token'],
+                                 hedge_delay=5)
+        self.endpoints['http://a/token'] = (0, TokenHTTPError('Failed', None))
+        self.endpoints['http://b/token'] = (0.05, 'b')
+
+        for _ in range(3):
+            await self.pool.fetch(self._fetch)
+
+        self.assertEqual(self.calls, ['http://a/token', 'http://b/token',
+                                      'http://b/token', 'http://b/token'])
+        failing = self.pool._endpoints[0]
+        self.assertIsNone(failing.ewma)
+        self.assertTrue(failing.failed)
+
+    @gen_test
+    async def test_should_not_fail_over_client_errors(self):
+        self.endpoints['http://a/token'] = (
+            0, TokenHTTPError('Failed', Mock(code=401)))
+
+        with self.assertRaises(TokenHTTPError):
+            await self.pool.fetch(self._fetch)
+
+        self.assertEqual(self.calls, ['http://a/token'])
+
+    @gen_test
+    async def test_should_raise_the_last_error_when_every_endpoint_fails(self):
+        self.endpoints['http://a/token'] = (0, TokenHTTPError('a', None))
+        self.endpoints['http://b/token'] = (0, TokenHTTPError('b', None))
+
+        with self.assertRaises(TokenHTTPError) as context:
+            await self.pool.fetch(self._fetch)
+
+        self.assertEqual(str(context.exception), 'b')
+
+    @gen_test
+    async def test_should_hedge_a_slow_request(self):
+        self.endpoints['http://a/token'] = (1, 'a')
+        self.endpoints['http://b/token'] = (0, 'b')
+
+        result = await self.pool.fetch(self._fetch)
+
+        self.assertEqual(result, 'b')
+        # lets the slow request handle its cancellation
+        await asyncio.sleep(0)
+        slow, fast = self.pool._endpoints
+        # the lost hedge still counts as slow
+        self.assertTrue(slow.ewma > fast.ewma)
+
+    @gen_test
+    async def test_should_skip_the_open_circuits(self):
+        self.pool._endpoints[0].breaker.record_failure()
+        self.endpoints['http://b/token'] = (0, 'b')
+
+        result = await self.pool.fetch(self._fetch)
+
+        self.assertEqual(result, 'b')
+        self.assertEqual(self.calls, ['http://b/token'])
+
+    @gen_test
+    async def test_should_fail_fast_when_every_circuit_is_open(self):
+        for endpoint in self.pool._endpoints:
+            endpoint.breaker.record_failure()
+
+        with self.assertRaises(TokenCircuitOpenError):
+            await self.pool.fetch(self._fetch)
+
+        self.assertEqual(self.calls, [])
+
+    def test_should_hedge_after_the_latency_percentile(self):
+        self.pool._latencies.extend([0.01] * 19 + [0.5])
+
+        self.assertEqual(self.pool._hedge_after(), 0.5)
+
+        self.pool._latencies.extend([0.01] * 20)
+        self.assertEqual(self.pool._hedge_after(), 0.01)
+
+    def test_should_not_hedge_when_disabled(self):
+        pool = EndpointPool(['http://a/token'], hedge_percentile=None)
+
+        self.assertIsNone(pool._hedge_after())
+
+
+class TestTokenManagerEndpoints(AsyncTestCase):
+
+    def setUp(self):
+        super(TestTokenManagerEndpoints, self).setUp()
+        self.manager = TokenManager(
+            ['http://a/token', 'http://b/token'], 'client_id',
+            'client_secret', token_endpoint_options={'hedge_delay': 5})
+
+    @gen_test
+    async def test_should_request_the_token_from_the_pool(self):
+        _fetch = Mock(return_value=mkfuture(
+            {'access_token': 'token', 'expires_in': 10}))
+        with patch.object(TokenManager, '_fetch', new=_fetch):
+            token = await self.manager.get_token()
+
+        self.assertEqual(token, 'token')
+        self.assertEqual(_fetch.call_args[1]['url'], 'http://a/token')
+
+    def test_should_store_the_tokens_by_the_first_endpoint(self):
+        self.assertEqual(self.manager._store_key(),
+                         'http://a/token:client_id')
+
+    def test_scoped_managers_should_share_the_pool(self):
+        scoped = self.manager._scoped_manager('read', None)
+
+        self.assertIs(scoped._endpoint_pool, self.manager._endpoint_pool)
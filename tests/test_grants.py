@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from tornadoalf.grants import (
+    JWT_BEARER, ClientCredentialsGrant, JWTBearerGrant, PasswordGrant)
+
+
+class TestGrants(TestCase):
+
+    def test_client_credentials_grant(self):
+        self.assertEqual(ClientCredentialsGrant().data(),
+                         {'grant_type': 'client_credentials'})
+
+    def test_password_grant(self):
+        grant = PasswordGrant('user', 'secret')
+
+        self.assertEqual(grant.data(), {'grant_type': 'password',
+                                        'username': 'user',
+                                        'password': 'secret'})
+        self.assertNotIn('secret', repr(grant))
+
+    def test_jwt_bearer_grant_should_sign_an_assertion_per_request(self):
+        assertions = iter(['first.jwt', 'second.jwt'])
+        grant = JWTBearerGrant(lambda: next(assertions))
+
+        self.assertEqual(grant.data(), {'grant_type': JWT_BEARER,
+                                        'assertion': 'first.jwt'})
+        self.assertEqual(grant.data()['assertion'], 'second.jwt')
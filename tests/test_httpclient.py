@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from unittest import TestCase
+
+from mock import Mock
+from . import mkfuture, mkfuture_exception
+
+from tornado.httpclient import AsyncHTTPClient, HTTPError, HTTPRequest
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.httpclient import (
+    Deadline, DeadlineExceededError, RequestLogger, make_http_client,
+    redacted_headers, timed_fetch)
+
+
+class TestMakeHTTPClient(AsyncTestCase):
+
+    def test_should_create_a_dedicated_simple_client(self):
+        http_client = make_http_client({'max_clients': 50})
+
+        self.assertIsInstance(http_client, SimpleAsyncHTTPClient)
+        self.assertIsNot(http_client, AsyncHTTPClient())
+        self.assertIsNot(http_client, make_http_client())
+        self.assertEqual(http_client.max_clients, 50)
+
+    def test_should_accept_an_import_path_or_a_class(self):
+        by_path = make_http_client({
+            'implementation':
+                'tornado.simple_httpclient.SimpleAsyncHTTPClient'})
+        by_class = make_http_client({
+            'implementation': SimpleAsyncHTTPClient})
+
+        self.assertIsInstance(by_path, SimpleAsyncHTTPClient)
+        self.assertIsInstance(by_class, SimpleAsyncHTTPClient)
+
+    def test_should_fail_for_an_unknown_implementation(self):
+        with self.assertRaises(ImportError):
+            make_http_client({'implementation': 'nowhere.HTTPClient'})
+
+
+class TestTimedFetch(AsyncTestCase):
+
+    @gen_test
+    def test_should_record_the_queue_time(self):
+        queued_since = time.time()
+        response = Mock(time_info={}, start_time=queued_since + 0.5)
+        http_client = Mock()
+        http_client.fetch.return_value = mkfuture(response)
+
+        result = yield timed_fetch(http_client, 'request', queued_since,
+                                   raise_error=False)
+
+        self.assertIs(result, response)
+        self.assertAlmostEqual(result.time_info['queue'], 0.5)
+        http_client.fetch.assert_called_with('request', raise_error=False)
+
+    @gen_test
+    def test_should_record_the_queue_time_of_errors(self):
+        queued_since = time.time()
+        response = Mock(time_info={}, start_time=queued_since + 0.2)
+        http_client = Mock()
+        http_client.fetch.return_value = mkfuture_exception(
+            HTTPError(500, response=response))
+
+        with self.assertRaises(HTTPError):
+            yield timed_fetch(http_client, 'request', queued_since)
+
+        self.assertAlmostEqual(response.time_info['queue'], 0.2)
+
+
+class TestDeadline(TestCase):
+
+    def test_should_reduce_the_timeouts_to_the_time_left(self):
+        request = HTTPRequest('http://api/', request_timeout=60,
+                              connect_timeout=0.5)
+
+        Deadline(2).apply(request, 'X-Request-Timeout')
+
+        self.assertTrue(1.9 < request.request_timeout <= 2)
+        self.assertEqual(request.connect_timeout, 0.5)
+        self.assertTrue(
+            1.9 < float(request.headers['X-Request-Timeout']) <= 2)
+
+    def test_should_raise_when_expired(self):
+        deadline = Deadline(0)
+
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceededError) as context:
+            deadline.apply(HTTPRequest('http://api/'))
+        self.assertEqual(context.exception.code, 599)
+
+    def test_should_read_the_time_left_from_headers(self):
+        deadline = Deadline.from_headers(
+            {'X-Request-Timeout': '2.5'}, 'X-Request-Timeout')
+        self.assertTrue(2.4 < deadline.remaining() <= 2.5)
+
+        for headers in ({}, {'X-Request-Timeout': 'soon'},
+                        {'X-Request-Timeout': 'inf'}):
+            self.assertIsNone(
+                Deadline.from_headers(headers, 'X-Request-Timeout'))
+            deadline = Deadline.from_headers(
+                headers, 'X-Request-Timeout', default=1)
+            self.assertTrue(0.9 < deadline.remaining() <= 1)
+
+
+class TestRequestLogger(TestCase):
+
+    def setUp(self):
+        self.logger = Mock()
+        self.logger.isEnabledFor.return_value = True
+        self.request = HTTPRequest('http://api/resource', headers={
+            'Authorization': 'Bearer secret-token', 'Accept': 'text/plain'})
+
+    def test_should_log_a_single_redacted_record(self):
+        RequestLogger(self.logger).log(self.request)
+
+        self.assertEqual(self.logger.debug.call_count, 1)
+        extra = self.logger.debug.call_args[1]['extra']
+        self.assertEqual(extra['http_method'], 'GET')
+        self.assertEqual(extra['http_url'], 'http://api/resource')
+        self.assertEqual(extra['http_headers'], {
+            'Authorization': 'Bearer ***', 'Accept': 'text/plain'})
+        self.assertNotIn('secret-token', str(self.logger.debug.call_args))
+
+    def test_should_do_nothing_unless_debug_is_enabled(self):
+        self.logger.isEnabledFor.return_value = False
+        self.request.headers = Mock()
+
+        RequestLogger(self.logger).log(self.request)
+
+        self.assertFalse(self.logger.debug.called)
+        self.assertFalse(self.request.headers.items.called)
+
+    def test_should_sample_one_in_n_requests(self):
+        request_logger = RequestLogger(self.logger, sampling=3)
+
+        for _ in range(7):
+            request_logger.log(self.request)
+
+        self.assertEqual(self.logger.debug.call_count, 3)
+
+    def test_should_redact_credentials_without_scheme(self):
+        headers = redacted_headers({'proxy-authorization': 'secret'})
+
+        self.assertEqual(headers, {'proxy-authorization': '***'})
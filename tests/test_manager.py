@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
+import time
+
 from mock import patch, Mock
 from . import mkfuture, mkfuture_exception
-from tornadoalf.manager import TokenManager, Token, TokenError
+from .test_token import make_jwt
+from tornadoalf.grants import PasswordGrant
+from tornadoalf.manager import (
+    TokenManager, Token, TokenError, basic_authorization)
+from tornado import gen
+from tornado.concurrent import Future
 from tornado.testing import AsyncTestCase, gen_test
 
 
@@ -30,6 +38,19 @@ class TestTokenManager(AsyncTestCase):
         self.manager._token = Token('', expires_in=10)
         self.assertTrue(self.manager._has_token())
 
+    @gen_test
+    def test_should_apply_the_expiry_skew_to_new_tokens(self):
+        self.manager._expiry_skew = 30
+        self._fake_fetch.return_value = mkfuture({
+            'access_token': 'accesstoken',
+            'expires_in': 20,
+        })
+
+        yield self.manager.reset_token()
+
+        self.assertEqual(self.manager._token.skew, 30)
+        self.assertFalse(self.manager._has_token())
+
     @gen_test
     def test_should_reset_token(self):
         self._fake_fetch.return_value = mkfuture({
@@ -57,6 +78,19 @@ class TestTokenManager(AsyncTestCase):
             data={'grant_type': 'client_credentials'},
         )
 
+    @gen_test
+    def test_should_request_the_scope(self):
+        self.manager._scope = 'read write'
+        self._fake_fetch.return_value = mkfuture({
+            'access_token': 'accesstoken',
+            'expires_in': 10,
+        })
+
+        yield self.manager._request_token()
+
+        self.assertEqual(self._fake_fetch.call_args[1]['data'], {
+            'grant_type': 'client_credentials', 'scope': 'read write'})
+
     @gen_test
     def test_should_raise_token_error_for_bad_token(self):
         fake_response = Mock(error=Exception('fail'), status_code=500)
@@ -117,6 +151,528 @@ class TestTokenManager(AsyncTestCase):
         self.assertTrue(_update_token.called)
 
 
+class TestTokenManagerSingleFlight(AsyncTestCase):
+
+    def setUp(self):
+        super(TestTokenManagerSingleFlight, self).setUp()
+        self.manager = TokenManager('http://endpoint/token',
+                                    'client_id', 'client_secret')
+        self.pending = Future()
+        self._request_token = Mock(return_value=self.pending)
+        self.manager._request_token = self._request_token
+
+    @gen_test
+    def test_concurrent_get_token_should_request_a_single_token(self):
+        waiters = [self.manager.get_token() for _ in range(10)]
+        self.io_loop.add_callback(self.pending.set_result, {
+            'access_token': 'shared', 'expires_in': 10})
+
+        tokens = yield gen.multi(waiters)
+
+        self.assertEqual(tokens, ['shared'] * 10)
+        self.assertEqual(self._request_token.call_count, 1)
+        self.assertIsNone(self.manager._refreshing)
+
+    @gen_test
+    def test_concurrent_waiters_should_share_the_token_error(self):
+        waiters = [gen.convert_yielded(self.manager.get_token())
+                   for _ in range(3)]
+        self.io_loop.add_callback(
+            self.pending.set_exception, TokenError('boom', None))
+
+        for waiter in waiters:
+            with self.assertRaises(TokenError):
+                yield waiter
+
+        self.assertEqual(self._request_token.call_count, 1)
+
+    @gen_test
+    def test_should_request_again_after_a_failed_refresh(self):
+        self.pending.set_exception(TokenError('boom', None))
+        with self.assertRaises(TokenError):
+            yield self.manager.get_token()
+
+        self._request_token.return_value = mkfuture({
+            'access_token': 'second', 'expires_in': 10})
+        token = yield self.manager.get_token()
+
+        self.assertEqual(token, 'second')
+        self.assertEqual(self._request_token.call_count, 2)
+
+    @gen_test
+    def test_reset_should_keep_a_token_renewed_by_another_coroutine(self):
+        self.manager._token = Token('renewed', expires_in=10)
+
+        yield self.manager.reset_token('rejected')
+
+        self.assertEqual(self.manager._token.access_token, 'renewed')
+        self.assertFalse(self._request_token.called)
+
+    @gen_test
+    def test_reset_should_renew_the_rejected_token(self):
+        self.manager._token = Token('rejected', expires_in=10)
+        self.pending.set_result({'access_token': 'new', 'expires_in': 10})
+
+        yield self.manager.reset_token('rejected')
+
+        self.assertEqual(self.manager._token.access_token, 'new')
+        self.assertEqual(self._request_token.call_count, 1)
+
+
+class TestTokenManagerBackgroundRefresh(AsyncTestCase):
+
+    def setUp(self):
+        super(TestTokenManagerBackgroundRefresh, self).setUp()
+        self.manager = TokenManager('http://endpoint/token',
+                                    'client_id', 'client_secret',
+                                    refresh_ratio=0.5, refresh_jitter=0,
+                                    refresh_skew=0, refresh_retry_delay=0.05,
+                                    min_refresh_interval=0)
+        self._request_token = Mock()
+        self.manager._request_token = self._request_token
+
+    def tearDown(self):
+        self.manager.close()
+        super(TestTokenManagerBackgroundRefresh, self).tearDown()
+
+    def _token_data(self, access_token, expires_in=0.2):
+        return mkfuture({'access_token': access_token,
+                         'expires_in': expires_in})
+
+    def test_refresh_delay_should_respect_ratio_and_skew(self):
+        self.manager._refresh_skew = 30
+        self.assertEqual(self.manager._refresh_delay(100), 50)
+        self.assertEqual(self.manager._refresh_delay(40), 10)
+        self.assertEqual(self.manager._refresh_delay(10), 0)
+
+    def test_refresh_delay_should_apply_jitter_below_the_ratio(self):
+        self.manager._refresh_jitter = 0.5
+        for _ in range(20):
+            delay = self.manager._refresh_delay(100)
+            self.assertTrue(25 <= delay <= 50)
+
+    @gen_test
+    def test_should_renew_the_token_before_it_expires(self):
+        self._request_token.side_effect = [
+            self._token_data('first'), self._token_data('second')]
+
+        token = yield self.manager.get_token()
+        self.assertEqual(token, 'first')
+
+        yield gen.sleep(0.15)
+
+        token = yield self.manager.get_token()
+        self.assertEqual(token, 'second')
+        self.assertEqual(self._request_token.call_count, 2)
+
+    @gen_test
+    def test_should_retry_a_failed_renewal_while_the_token_is_valid(self):
+        self._request_token.side_effect = [
+            self._token_data('first', expires_in=10),
+            mkfuture_exception(TokenError('boom', None)),
+            self._token_data('second', expires_in=10)]
+        self.manager._refresh_ratio = 0.01
+
+        yield self.manager.get_token()
+        yield gen.sleep(0.2)
+
+        self.assertEqual(self._request_token.call_count, 3)
+        self.assertEqual(self.manager._token.access_token, 'second')
+        self.assertEqual(self.manager._refresh_failures, 0)
+
+    @gen_test
+    def test_should_not_retry_a_failed_renewal_of_an_expired_token(self):
+        self._request_token.side_effect = [
+            self._token_data('first', expires_in=0),
+            mkfuture_exception(TokenError('boom', None))]
+
+        yield self.manager.get_token()
+        yield gen.sleep(0.1)
+
+        self.assertEqual(self._request_token.call_count, 2)
+        self.assertIsNone(self.manager._refresh_timeout)
+
+    @gen_test
+    def test_should_stop_renewing_a_token_nobody_requests(self):
+        self._request_token.side_effect = [
+            self._token_data('first'), self._token_data('second'),
+            self._token_data('third')]
+
+        yield self.manager.get_token()
+        yield gen.sleep(0.35)
+
+        self.assertEqual(self._request_token.call_count, 2)
+        self.assertIsNone(self.manager._refresh_timeout)
+
+    @gen_test
+    def test_close_should_stop_the_renewal(self):
+        self._request_token.return_value = self._token_data('first')
+
+        yield self.manager.get_token()
+        self.manager.close()
+        yield gen.sleep(0.15)
+
+        self.assertEqual(self._request_token.call_count, 1)
+        self.assertIsNone(self.manager._refresh_timeout)
+
+    @gen_test
+    def test_should_not_schedule_without_refresh_ratio(self):
+        self.manager._refresh_ratio = None
+        self._request_token.return_value = self._token_data('first')
+
+        yield self.manager.get_token()
+
+        self.assertIsNone(self.manager._refresh_timeout)
+
+
+class TestTokenManagerScopes(AsyncTestCase):
+
+    def setUp(self):
+        super(TestTokenManagerScopes, self).setUp()
+        self.manager = TokenManager('http://endpoint/token', 'client_id',
+                                    'client_secret', max_scoped_tokens=2)
+        self.requests = []
+        # patched in the class, so the managers of each scope get it too
+        fetch = patch.object(TokenManager, '_fetch', new=self._fetch)
+        fetch.start()
+        self.addCleanup(fetch.stop)
+
+    def _fetch(self, url, method, auth, data):
+        self.requests.append(data)
+        return mkfuture({'access_token': 'token %s' % data.get('scope'),
+                         'expires_in': 10})
+
+    @gen_test
+    def test_should_cache_a_token_per_scope(self):
+        default = yield self.manager.get_token()
+        read = yield self.manager.get_token(scope='read')
+        read_again = yield self.manager.get_token(scope=['read'])
+
+        self.assertEqual(default, 'token None')
+        self.assertEqual(read, 'token read')
+        self.assertEqual(read_again, 'token read')
+        self.assertEqual(len(self.requests), 2)
+
+    @gen_test
+    def test_scopes_should_be_order_independent(self):
+        first = yield self.manager.get_token(scope='write read')
+        second = yield self.manager.get_token(scope=['read', 'write'])
+
+        self.assertEqual(first, 'token read write')
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.requests), 1)
+
+    @gen_test
+    def test_should_request_the_audience(self):
+        yield self.manager.get_token(scope='read', audience='api')
+
+        self.assertEqual(self.requests, [{
+            'grant_type': 'client_credentials', 'scope': 'read',
+            'audience': 'api'}])
+
+    @gen_test
+    def test_should_request_a_single_token_per_scope(self):
+        tokens = yield [self.manager.get_token(scope='read')
+                        for _ in range(5)]
+
+        self.assertEqual(tokens, ['token read'] * 5)
+        self.assertEqual(len(self.requests), 1)
+
+    @gen_test
+    def test_should_reset_only_the_token_of_the_scope(self):
+        yield self.manager.get_token()
+        yield self.manager.get_token(scope='read')
+
+        yield self.manager.reset_token('token read', scope='read')
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.requests[-1]['scope'], 'read')
+
+    @gen_test
+    def test_should_evict_expired_tokens_first(self):
+        yield self.manager.get_token(scope='read')
+        yield self.manager.get_token(scope='write')
+        self.manager._scoped_managers[('write', None)]._token = Token(
+            'expired', expires_in=0)
+        yield self.manager.get_token(scope='read')
+
+        yield self.manager.get_token(scope='admin')
+
+        self.assertEqual(list(self.manager._scoped_managers),
+                         [('read', None), ('admin', None)])
+
+    @gen_test
+    def test_should_evict_the_least_recently_used_token(self):
+        yield self.manager.get_token(scope='read')
+        yield self.manager.get_token(scope='write')
+        evicted = self.manager._scoped_managers[('read', None)]
+
+        yield self.manager.get_token(scope='admin')
+
+        self.assertEqual(list(self.manager._scoped_managers),
+                         [('write', None), ('admin', None)])
+        self.assertTrue(evicted._closed)
+
+    @gen_test
+    def test_should_not_evict_a_token_being_requested(self):
+        self.manager._max_scoped_tokens = 1
+
+        tokens = yield [self.manager.get_token(scope='read'),
+                        self.manager.get_token(scope='write')]
+
+        self.assertEqual(tokens, ['token read', 'token write'])
+
+    @gen_test
+    async def test_should_delete_the_evicted_tokens_from_the_store(self):
+        store = self.manager._token_store
+
+        for scope in range(50):
+            await self.manager.get_token(scope=f'scope-{scope}')
+        await asyncio.sleep(0)
+
+        self.assertEqual(len(self.manager._scoped_managers), 2)
+        self.assertEqual(len(store._tokens), 2)
+        self.assertEqual(len(store._locks), 2)
+
+    @gen_test
+    def test_close_should_close_the_scoped_managers(self):
+        yield self.manager.get_token(scope='read')
+        scoped = self.manager._scoped_managers[('read', None)]
+
+        self.manager.close()
+
+        self.assertTrue(scoped._closed)
+        self.assertEqual(len(self.manager._scoped_managers), 0)
+
+
+class FakeTokenEndpointTestCase(AsyncTestCase):
+
+    def setUp(self):
+        super(FakeTokenEndpointTestCase, self).setUp()
+        self.responses = {'http://endpoint/token': [],
+                          'http://endpoint/introspect': []}
+        self.requests = []
+        fetch = patch.object(TokenManager, '_fetch', new=self._fetch)
+        fetch.start()
+        self.addCleanup(fetch.stop)
+
+    def _fetch(self, url, method, auth, data):
+        self.requests.append((url, data))
+        response = self.responses[url].pop(0)
+        if isinstance(response, Exception):
+            return mkfuture_exception(response)
+        return mkfuture(response)
+
+    def make_manager(self, **options):
+        return TokenManager('http://endpoint/token', 'client_id',
+                            'client_secret', **options)
+
+
+class TestTokenManagerValidation(FakeTokenEndpointTestCase):
+
+    @gen_test
+    def test_should_trust_the_jwt_expiration(self):
+        manager = self.make_manager(jwt_expiry=True)
+        access_token = make_jwt({'exp': time.time() + 30})
+        self.responses['http://endpoint/token'].append(
+            {'access_token': access_token, 'expires_in': 3600})
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, access_token)
+        self.assertTrue(29 < manager._token.ttl() <= 30)
+
+    @gen_test
+    def test_should_keep_expires_in_of_opaque_tokens(self):
+        manager = self.make_manager(jwt_expiry=True)
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'opaque', 'expires_in': 3600})
+
+        yield manager.get_token()
+
+        self.assertTrue(3599 < manager._token.ttl() <= 3600)
+
+    @gen_test
+    def test_should_replace_a_token_no_longer_active(self):
+        manager = self.make_manager(
+            introspection_endpoint='http://endpoint/introspect',
+            introspection_interval=0)
+        manager._token = Token('revoked', expires_in=10)
+        self.responses['http://endpoint/introspect'].append(
+            {'active': False})
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'expires_in': 10})
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'new')
+        self.assertEqual(self.requests[0], (
+            'http://endpoint/introspect',
+            {'token': 'revoked', 'token_type_hint': 'access_token'}))
+
+    @gen_test
+    def test_should_cache_the_introspection(self):
+        manager = self.make_manager(
+            introspection_endpoint='http://endpoint/introspect')
+        manager._token = Token('stored', expires_in=10)
+        self.responses['http://endpoint/introspect'].append({'active': True})
+
+        for _ in range(3):
+            token = yield manager.get_token()
+
+        self.assertEqual(token, 'stored')
+        self.assertEqual(len(self.requests), 1)
+
+    @gen_test
+    def test_should_not_introspect_a_token_just_issued(self):
+        manager = self.make_manager(
+            introspection_endpoint='http://endpoint/introspect')
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'expires_in': 10})
+
+        yield manager.get_token()
+        yield manager.get_token()
+
+        self.assertEqual([url for url, _ in self.requests],
+                         ['http://endpoint/token'])
+
+    @gen_test
+    def test_should_keep_the_token_when_introspection_fails(self):
+        manager = self.make_manager(
+            introspection_endpoint='http://endpoint/introspect')
+        manager._token = Token('stored', expires_in=10)
+        self.responses['http://endpoint/introspect'].append(
+            TokenError('Failed to introspect', None))
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'stored')
+
+    @gen_test
+    def test_should_reject_a_response_without_access_token(self):
+        manager = self.make_manager()
+        self.responses['http://endpoint/token'].append({'expires_in': 10})
+
+        with self.assertRaises(TokenError):
+            yield manager.get_token()
+
+        self.assertIsNone(manager._token)
+
+    @gen_test
+    def test_should_keep_the_token_type_and_refresh_token(self):
+        manager = self.make_manager()
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'token_type': 'bearer',
+             'refresh_token': 'refresh'})
+
+        yield manager.get_token()
+
+        self.assertEqual(manager._token.refresh_token, 'refresh')
+        self.assertTrue(3599 < manager._token.ttl() <= 3600)
+
+    @gen_test
+    def test_should_space_repeated_token_requests(self):
+        manager = self.make_manager(min_refresh_interval=0.1)
+        self.responses['http://endpoint/token'].extend(
+            {'access_token': 'token-%d' % n, 'expires_in': 0}
+            for n in range(3))
+
+        started = time.monotonic()
+        for _ in range(3):
+            yield manager.get_token()
+
+        # the first renewal is let through, the second one waits
+        self.assertTrue(0.1 <= time.monotonic() - started < 0.2)
+
+
+class TestTokenManagerGrants(FakeTokenEndpointTestCase):
+
+    @gen_test
+    def test_should_request_tokens_with_the_grant(self):
+        manager = self.make_manager(grant=PasswordGrant('user', 'secret'),
+                                    scope='read')
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'expires_in': 10})
+
+        yield manager.get_token()
+
+        self.assertEqual(self.requests[0][1], {
+            'grant_type': 'password', 'username': 'user',
+            'password': 'secret', 'scope': 'read'})
+
+    @gen_test
+    def test_should_renew_the_token_with_its_refresh_token(self):
+        manager = self.make_manager(grant=PasswordGrant('user', 'secret'))
+        manager._token = Token('expired', 0, refresh_token='refresh')
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'expires_in': 10})
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'new')
+        self.assertEqual(self.requests[0][1], {
+            'grant_type': 'refresh_token', 'refresh_token': 'refresh'})
+        # no new refresh token was issued, the current one is kept
+        self.assertEqual(manager._token.refresh_token, 'refresh')
+
+    @gen_test
+    def test_should_fall_back_to_the_grant_when_refresh_fails(self):
+        manager = self.make_manager(grant=PasswordGrant('user', 'secret'))
+        manager._token = Token('expired', 0, refresh_token='revoked')
+        self.responses['http://endpoint/token'].extend([
+            TokenError('invalid_grant', None),
+            {'access_token': 'new', 'expires_in': 10,
+             'refresh_token': 'refresh'}])
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'new')
+        self.assertEqual([data['grant_type'] for _, data in self.requests],
+                         ['refresh_token', 'password'])
+        self.assertEqual(manager._token.refresh_token, 'refresh')
+
+    @gen_test
+    def test_should_not_use_the_refresh_token_when_disabled(self):
+        manager = self.make_manager(use_refresh_token=False)
+        manager._token = Token('expired', 0, refresh_token='refresh')
+        self.responses['http://endpoint/token'].append(
+            {'access_token': 'new', 'expires_in': 10})
+
+        yield manager.get_token()
+
+        self.assertEqual(self.requests[0][1],
+                         {'grant_type': 'client_credentials'})
+
+
+class TestTokenManagerCredentials(FakeTokenEndpointTestCase):
+
+    def test_should_reject_missing_credentials_when_created(self):
+        with self.assertRaises(TokenError):
+            TokenManager('http://endpoint/token', 'client_id', None)
+
+    def test_should_reject_credentials_not_in_ascii_when_created(self):
+        with self.assertRaises(TokenError):
+            TokenManager('http://endpoint/token', 'client_id', 'señha')
+
+    def test_should_reject_unhashable_credentials_when_created(self):
+        with self.assertRaises(TokenError):
+            TokenManager('http://endpoint/token', 'client_id', ['secret'])
+
+    @gen_test
+    def test_should_return_the_authorization_header(self):
+        manager = self.make_manager()
+        self.responses['http://endpoint/token'].extend([
+            {'access_token': 'token', 'expires_in': 10},
+            {'access_token': 'read', 'expires_in': 10}])
+
+        authorization = yield manager.get_authorization()
+        scoped = yield manager.get_authorization(scope='read')
+
+        self.assertEqual(authorization, 'Bearer token')
+        self.assertEqual(scoped, 'Bearer read')
+        self.assertIs((yield manager.get_authorization()), authorization)
+
+
 class TestTokenManagerHTTP(AsyncTestCase):
 
     def setUp(self):
@@ -132,7 +688,7 @@ class TestTokenManagerHTTP(AsyncTestCase):
                                     self.client_id,
                                     self.client_secret)
         self._fake_fetch = Mock()
-        self.manager._http_client.fetch = self._fake_fetch
+        self.manager._http_client = Mock(fetch=self._fake_fetch)
 
         fake_response = Mock(body=b'{"access_token":"access","expires_in":10}')
         self._fake_fetch.return_value = mkfuture(fake_response)
@@ -148,7 +704,7 @@ class TestTokenManagerHTTP(AsyncTestCase):
                                     self.client_secret,
                                     self.http_options)
         self._fake_fetch = Mock()
-        self.manager._http_client.fetch = self._fake_fetch
+        self.manager._http_client = Mock(fetch=self._fake_fetch)
 
         fake_response = Mock(
             body=b'{"access_token":"access","expires_in":10}')
@@ -159,3 +715,32 @@ class TestTokenManagerHTTP(AsyncTestCase):
         self.assertEqual(request.request_timeout, 2)
         self.assertEqual(request.headers['Authorization'],
                          'Basic Y2xpZW50X2lkOmNsaWVudF9zZWNyZXQ=')
+
+    @gen_test
+    def test_should_encode_the_credentials_once(self):
+        manager = TokenManager(self.end_point, self.client_id,
+                               self.client_secret)
+        manager._http_client = Mock()
+        manager._http_client.fetch.return_value = mkfuture(
+            Mock(body=b'{"access_token":"access","expires_in":10}'))
+
+        with patch('tornadoalf.manager.basic_authorization') as encode:
+            yield manager._request_token()
+
+        encode.assert_not_called()
+        request = manager._http_client.fetch.call_args[0][0]
+        self.assertEqual(request.headers['Authorization'],
+                         basic_authorization('client_id', 'client_secret'))
+
+    @gen_test
+    def test_should_raise_token_error_for_a_response_not_in_json(self):
+        manager = TokenManager(self.end_point, self.client_id,
+                               self.client_secret)
+        manager._http_client = Mock()
+        manager._http_client.fetch.return_value = mkfuture(
+            Mock(code=200, body=b'<html>Maintenance</html>'))
+
+        with self.assertRaises(TokenError) as context:
+            yield manager._request_token()
+
+        self.assertEqual(context.exception.response.code, 200)
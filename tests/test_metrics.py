@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from mock import Mock
+from . import mkfuture, mkfuture_exception
+
+from tornado.httpclient import HTTPError
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.client import Client
+from tornadoalf.manager import TokenManager
+from tornadoalf.metrics import (
+    Counter, Histogram, MetricsObserver, Observer)
+from tornadoalf.token import TokenError
+
+
+class TestMetrics(TestCase):
+
+    def test_counter_should_count_by_labels(self):
+        counter = Counter('hits_total', 'Hits', ['result'])
+
+        counter.inc('hit')
+        counter.inc('hit', amount=2)
+        counter.inc('miss')
+
+        self.assertEqual(counter.value('hit'), 3)
+        self.assertEqual(counter.value('miss'), 1)
+
+    def test_histogram_should_count_cumulative_buckets(self):
+        histogram = Histogram('latency_seconds', 'Latency',
+                              buckets=(0.1, 1))
+
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        samples = list(histogram.samples())
+        self.assertEqual([value for _, _, value in samples],
+                         [1, 2, 3, 5.55, 3])
+        self.assertEqual(histogram.count(), 3)
+
+    def test_should_render_the_text_exposition_format(self):
+        observer = MetricsObserver(buckets=(1,))
+        observer.token_acquired(True, 0)
+        observer.token_acquired(False, 0.5)
+
+        rendered = observer.render()
+
+        self.assertIn('# TYPE alf_token_cache_total counter\n', rendered)
+        self.assertIn('alf_token_cache_total{result="hit"} 1\n', rendered)
+        self.assertIn('alf_get_token_seconds_bucket{le="1.0"} 1\n',
+                      rendered)
+        self.assertIn('alf_get_token_seconds_sum 0.5\n', rendered)
+
+    def test_should_record_finished_requests_by_code(self):
+        observer = MetricsObserver()
+        response = Mock(code=200, time_info={'queue': 0.2})
+        observer.request_started(None)
+        observer.request_started(None)
+
+        observer.request_finished(None, response, 0.1)
+        observer.request_finished(None, None, 0.3, HTTPError(599))
+
+        self.assertEqual(observer.request_seconds.count('200'), 1)
+        self.assertEqual(observer.request_seconds.count('599'), 1)
+        self.assertEqual(observer.request_queue_seconds.count(), 1)
+        self.assertEqual(observer.requests_in_flight.value(), 0)
+
+
+class TestObserverEvents(AsyncTestCase):
+
+    def setUp(self):
+        super(TestObserverEvents, self).setUp()
+        self.observer = Mock(spec=Observer)
+        self.client = Client(token_endpoint='http://endpoint/token',
+                             client_id='client-id',
+                             client_secret='client_secret',
+                             observer=self.observer)
+        self.manager = self.client._token_manager
+        self.manager._request_token = Mock()
+        self.client._http_client = Mock()
+
+    def _token(self, access_token):
+        return mkfuture({'access_token': access_token, 'expires_in': 10})
+
+    def test_should_share_the_observer_with_the_token_manager(self):
+        self.assertIs(self.manager._observer, self.observer)
+
+    @gen_test
+    def test_should_report_token_cache_misses_and_hits(self):
+        self.manager._request_token.return_value = self._token('access')
+
+        yield self.manager.get_token()
+        yield self.manager.get_token()
+
+        calls = self.observer.token_acquired.call_args_list
+        self.assertEqual([call[0][0] for call in calls], [False, True])
+        self.assertEqual(self.observer.token_requested.call_count, 1)
+
+    @gen_test
+    def test_should_report_token_request_failures(self):
+        error = TokenError('boom', None)
+        self.manager._request_token.return_value = mkfuture_exception(error)
+
+        with self.assertRaises(TokenError):
+            yield self.manager.get_token()
+
+        duration, failure = self.observer.token_requested.call_args[0]
+        self.assertIs(failure, error)
+        self.observer.token_refresh_failed.assert_called_once_with(error)
+
+    @gen_test
+    def test_should_report_requests_and_replays(self):
+        self.manager._request_token.side_effect = [
+            self._token('old'), self._token('new')]
+        self.client._http_client.fetch.side_effect = [
+            mkfuture(Mock(code=401, time_info={}, start_time=0)),
+            mkfuture(Mock(code=200, error=None, time_info={},
+                          start_time=0))]
+
+        response = yield self.client.fetch('http://api/resource')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self.observer.request_started.call_count, 2)
+        self.assertEqual(self.observer.request_finished.call_count, 2)
+        self.assertEqual(self.observer.request_replayed.call_count, 1)
+
+    @gen_test
+    def test_should_report_failed_requests(self):
+        self.manager._request_token.return_value = self._token('access')
+        error = ConnectionResetError()
+        self.client._http_client.fetch.return_value = mkfuture_exception(
+            error)
+
+        with self.assertRaises(ConnectionResetError):
+            yield self.client.fetch('http://api/resource')
+
+        request, response, duration, failure = (
+            self.observer.request_finished.call_args[0])
+        self.assertIsNone(response)
+        self.assertIs(failure, error)
+
+
+class TestWithoutObserver(AsyncTestCase):
+
+    @gen_test
+    def test_should_work_without_observer(self):
+        manager = TokenManager('http://endpoint/token', 'client_id',
+                               'client_secret')
+        manager._request_token = Mock(return_value=mkfuture({
+            'access_token': 'access', 'expires_in': 10}))
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'access')
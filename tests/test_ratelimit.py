@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from unittest import TestCase
+
+from mock import Mock, patch
+from . import mkfuture, mkfuture_exception
+
+from tornado.httpclient import HTTPError
+from tornado.httputil import HTTPHeaders
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.client import Client
+from tornadoalf.ratelimit import RateLimiter, RateLimitError
+
+
+def make_response(code=200, **headers):
+    return Mock(code=code, error=None, time_info={}, start_time=0,
+                headers=HTTPHeaders(headers))
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self):
+        self.now = 100
+        monotonic = patch('tornadoalf.ratelimit.time.monotonic',
+                          lambda: self.now)
+        monotonic.start()
+        self.addCleanup(monotonic.stop)
+        self.limiter = RateLimiter(rate=10, burst=2)
+
+    def test_should_admit_a_burst_without_waiting(self):
+        self.assertEqual(self.limiter._reserve(None), 0)
+        self.assertEqual(self.limiter._reserve(None), 0)
+
+    def test_should_space_the_requests_beyond_the_burst(self):
+        for _ in range(2):
+            self.limiter._reserve(None)
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 0.1)
+        self.assertAlmostEqual(self.limiter._reserve(None), 0.2)
+
+    def test_should_refill_with_time(self):
+        for _ in range(2):
+            self.limiter._reserve(None)
+
+        self.now += 0.1
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 0)
+
+    def test_should_fail_fast_beyond_the_max_wait(self):
+        for _ in range(3):
+            self.limiter._reserve(0.15)
+
+        with self.assertRaises(RateLimitError):
+            self.limiter._reserve(0.15)
+        # the failed request took no turn
+        self.assertAlmostEqual(self.limiter._reserve(None), 0.2)
+
+    def test_should_pause_on_a_429(self):
+        self.limiter.update(make_response(429, **{'Retry-After': '3'}))
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 3.1)
+
+    def test_should_pause_for_the_backoff_without_retry_after(self):
+        self.limiter.update(make_response(429))
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 1.1)
+
+    def test_should_pause_until_the_quota_resets(self):
+        self.limiter.update(make_response(**{
+            'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '5'}))
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 5.1)
+
+    @patch('tornadoalf.ratelimit.time.time', Mock(return_value=1700000000))
+    def test_should_read_epoch_resets(self):
+        self.limiter.update(make_response(**{
+            'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1700000002'}))
+
+        self.assertAlmostEqual(self.limiter._reserve(None), 2.1)
+
+    def test_should_spread_the_remaining_quota(self):
+        self.limiter.update(make_response(**{
+            'RateLimit-Remaining': '1', 'RateLimit-Reset': '10'}))
+
+        self.assertEqual(self.limiter._reserve(None), 0)
+        # one request per 10s until the reset
+        self.assertAlmostEqual(self.limiter._reserve(None), 10)
+
+    def test_should_ignore_invalid_headers(self):
+        self.limiter.update(make_response(**{
+            'X-RateLimit-Remaining': 'many', 'X-RateLimit-Reset': '5'}))
+
+        self.assertEqual(self.limiter._reserve(None), 0)
+
+
+class TestRateLimiterAcquire(AsyncTestCase):
+
+    @gen_test
+    def test_should_wait_for_the_turn(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        yield limiter.acquire()
+
+        with patch('tornadoalf.ratelimit.gen.sleep',
+                   Mock(return_value=mkfuture(None))) as sleep:
+            yield limiter.acquire()
+
+        self.assertTrue(0 < sleep.call_args[0][0] <= 0.01)
+
+    @gen_test
+    async def test_should_give_the_turn_back_when_cancelled(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        await limiter.acquire()
+        waiting = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+
+        self.assertAlmostEqual(limiter._tokens, 0, places=1)
+
+
+class TestClientRateLimit(AsyncTestCase):
+
+    def setUp(self):
+        super(TestClientRateLimit, self).setUp()
+        self.client = Client(token_endpoint='http://endpoint/token',
+                             client_id='client-id',
+                             client_secret='client_secret',
+                             rate_limit=RateLimiter(rate=1, burst=1,
+                                                    max_wait=0.5),
+                             host_rate_limit={'rate': 100})
+        self.client._token_manager = Mock()
+        self.client._token_manager.get_authorization.side_effect = (
+            lambda: mkfuture('Bearer token'))
+        self.client._http_client = Mock()
+        self.client._http_client.fetch.side_effect = (
+            lambda request, **kwargs: mkfuture(make_response()))
+
+    @gen_test
+    def test_should_fail_fast_over_the_rate(self):
+        yield self.client.fetch('http://api/resource')
+
+        with self.assertRaises(RateLimitError):
+            yield self.client.fetch('http://api/resource')
+
+        self.assertEqual(self.client._http_client.fetch.call_count, 1)
+
+    @gen_test
+    def test_should_give_the_host_turn_back_over_the_rate(self):
+        yield self.client.fetch('http://api/resource')
+
+        with self.assertRaises(RateLimitError):
+            yield self.client.fetch('http://api/resource')
+
+        # only the request sent took a turn
+        self.assertAlmostEqual(
+            self.client._host_rate_limiters['api']._tokens, 99, places=1)
+
+    @gen_test
+    def test_should_limit_each_host(self):
+        yield self.client.fetch('http://api/resource')
+
+        self.assertEqual(list(self.client._host_rate_limiters), ['api'])
+        self.assertEqual(self.client._host_rate_limiters['api'].rate, 100)
+
+    @gen_test
+    def test_should_adapt_to_429_errors(self):
+        self.client._http_client.fetch.side_effect = (
+            lambda request, **kwargs: mkfuture_exception(HTTPError(
+                429, response=make_response(429, **{'Retry-After': '60'}))))
+
+        with self.assertRaises(HTTPError):
+            yield self.client.fetch('http://api/resource')
+
+        self.assertTrue(
+            self.client._host_rate_limiters['api']._reserve(None) > 59)
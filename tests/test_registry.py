@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from asyncio import Future
+from mock import Mock, patch
+
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.registry import ClientRegistry
+from . import mkfuture
+
+
+class TestClientRegistry(AsyncTestCase):
+
+    def setUp(self):
+        super(TestClientRegistry, self).setUp()
+        self.registry = ClientRegistry(http_client_options={},
+                                       max_managers=2, idle_ttl=60)
+
+    def _client(self, client_id='client-id', secret='secret', **kwargs):
+        return self.registry.client('http://endpoint/token', client_id,
+                                    secret, **kwargs)
+
+    def test_should_share_the_token_manager_of_the_same_credentials(self):
+        first, second = self._client(), self._client()
+
+        self.assertIsNot(first, second)
+        self.assertIs(first._token_manager, second._token_manager)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_should_separate_other_credentials_and_scopes(self):
+        client = self._client()
+
+        self.assertIsNot(self._client('other')._token_manager,
+                         client._token_manager)
+        self.assertIsNot(self._client(secret='other')._token_manager,
+                         client._token_manager)
+        self.assertIsNot(self._client(scope='read')._token_manager,
+                         client._token_manager)
+
+    def test_should_normalize_the_scope(self):
+        first = self._client(scope='write read')
+        second = self._client(scope=['read', 'write'])
+
+        self.assertIs(first._token_manager, second._token_manager)
+        self.assertEqual(first._token_manager._scope, 'read write')
+
+    def test_should_share_one_http_client(self):
+        first, second = self._client(), self._client('other')
+
+        self.assertIs(first._http_client, second._http_client)
+        self.assertIs(first._token_manager._http_client,
+                      first._http_client)
+        self.assertIs(second._token_manager._http_client,
+                      first._http_client)
+
+    def test_should_evict_the_least_recently_used_manager(self):
+        first = self._client('first')._token_manager
+        second = self._client('second')._token_manager
+        self._client('first')
+
+        self._client('third')
+
+        self.assertEqual(len(self.registry), 2)
+        self.assertIs(self._client('first')._token_manager, first)
+        self.assertIsNot(self._client('second')._token_manager, second)
+        # its clients may still use it
+        self.assertFalse(second._closed)
+
+    def test_should_evict_idle_managers(self):
+        with patch('tornadoalf.registry.time.monotonic',
+                   Mock(return_value=100)):
+            idle = self._client('idle')._token_manager
+
+        with patch('tornadoalf.registry.time.monotonic',
+                   Mock(return_value=200)):
+            self._client('other')
+
+        self.assertEqual(len(self.registry), 1)
+        self.assertFalse(idle._closed)
+
+    def test_should_not_evict_managers_used_by_their_clients(self):
+        with patch('tornadoalf.registry.time.monotonic',
+                   Mock(return_value=100)):
+            manager = self._client()._token_manager
+
+        # a token requested by a client created earlier
+        manager._last_used = 150
+        with patch('tornadoalf.registry.time.monotonic',
+                   Mock(return_value=200)):
+            self._client('other')
+
+            self.assertIs(self._client()._token_manager, manager)
+
+    @gen_test
+    async def test_evicted_managers_should_keep_serving_their_clients(self):
+        self.registry._max_managers = 1
+        client = self._client()
+        requested = Future()
+        client._token_manager._request_token = Mock(return_value=requested)
+        getting = asyncio.ensure_future(client._token_manager.get_token())
+        await asyncio.sleep(0)
+
+        self._client('other')
+        requested.set_result({'access_token': 'token', 'expires_in': 10})
+
+        self.assertEqual(await getting, 'token')
+        self.assertEqual(await client._token_manager.get_token(), 'token')
+
+    def test_closing_a_client_should_keep_the_shared_manager(self):
+        client = self._client()
+
+        client.close()
+
+        self.assertFalse(client._token_manager._closed)
+
+    def test_close_should_close_every_manager(self):
+        manager = self._client()._token_manager
+
+        self.registry.close()
+
+        self.assertEqual(len(self.registry), 0)
+        self.assertTrue(manager._closed)
+
+    @gen_test
+    async def test_aclose_should_close_the_connection_pool(self):
+        http_client = self._client()._http_client
+
+        async with self.registry:
+            pass
+
+        self.assertTrue(http_client._closed)
+        self.assertEqual(len(self.registry), 0)
+
+    @gen_test
+    def test_clients_of_the_same_credentials_should_share_the_token(self):
+        first, second = self._client(), self._client()
+        _request_token = Mock(return_value=mkfuture({
+            'access_token': 'shared', 'expires_in': 10}))
+        first._token_manager._request_token = _request_token
+
+        tokens = yield [first._token_manager.get_token(),
+                        second._token_manager.get_token()]
+
+        self.assertEqual(tokens, ['shared', 'shared'])
+        self.assertEqual(_request_token.call_count, 1)
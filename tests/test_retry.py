@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+from unittest import TestCase
+
+from mock import Mock, patch
+from . import mkfuture, mkfuture_exception
+
+from tornado.httpclient import HTTPError, HTTPRequest
+from tornado.iostream import StreamClosedError
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.manager import TokenManager
+from tornadoalf.retry import ReplayPolicy, RetryBudget, RetryPolicy
+
+
+class TestRetryBudget(TestCase):
+
+    def test_should_allow_the_minimum_retries(self):
+        budget = RetryBudget(ratio=0.1, min_retries=2)
+
+        self.assertTrue(budget.try_retry())
+        self.assertTrue(budget.try_retry())
+        self.assertFalse(budget.try_retry())
+
+    def test_should_allow_a_ratio_of_the_requests(self):
+        budget = RetryBudget(ratio=0.1, min_retries=0)
+        for _ in range(30):
+            budget.record_request()
+
+        allowed = [budget.try_retry() for _ in range(5)]
+
+        self.assertEqual(allowed, [True, True, True, False, False])
+
+    @patch('tornadoalf.retry.time.monotonic')
+    def test_should_forget_the_requests_out_of_the_window(self, monotonic):
+        budget = RetryBudget(ratio=1, window=10, min_retries=0)
+        monotonic.return_value = 100
+        budget.record_request()
+        self.assertTrue(budget.try_retry())
+        budget.record_request()
+
+        monotonic.return_value = 111
+        self.assertFalse(budget.try_retry())
+
+
+class TestReplayPolicy(TestCase):
+
+    def test_should_replay_every_request_by_default(self):
+        policy = ReplayPolicy()
+
+        self.assertTrue(policy.can_replay(
+            HTTPRequest('http://api/', method='POST', body=b'x' * 10000)))
+
+    def test_should_only_replay_the_given_methods(self):
+        policy = ReplayPolicy(methods=['get', 'PUT'])
+
+        self.assertTrue(policy.can_replay(HTTPRequest('http://api/')))
+        self.assertFalse(policy.can_replay(
+            HTTPRequest('http://api/', method='POST', body=b'')))
+
+    def test_should_not_replay_bodies_over_the_max_size(self):
+        policy = ReplayPolicy(max_body_size=4)
+
+        self.assertTrue(policy.can_replay(
+            HTTPRequest('http://api/', method='PUT', body=b'tiny')))
+        self.assertFalse(policy.can_replay(
+            HTTPRequest('http://api/', method='PUT', body=b'large')))
+        self.assertFalse(policy.can_replay(
+            HTTPRequest('http://api/', method='PUT',
+                        body_producer=lambda write: None)))
+
+    def test_should_reject_an_unknown_preflight(self):
+        with self.assertRaises(ValueError):
+            ReplayPolicy(preflight='options')
+
+
+class TestRetryPolicy(AsyncTestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.policy = RetryPolicy(max_attempts=3, backoff=0.001,
+                                  jitter=False, budget=False)
+        self.fetch = Mock()
+
+    @gen_test
+    def test_should_retry_a_transient_status(self):
+        self.fetch.side_effect = [mkfuture(Mock(code=503, headers={})),
+                                  mkfuture(Mock(code=200))]
+
+        response = yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(self.fetch.call_count, 2)
+
+    @gen_test
+    def test_should_give_up_after_the_max_attempts(self):
+        self.fetch.side_effect = lambda: mkfuture(
+            Mock(code=502, headers={}))
+
+        response = yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(response.code, 502)
+        self.assertEqual(self.fetch.call_count, 3)
+
+    @gen_test
+    def test_should_retry_connection_errors_and_timeouts(self):
+        self.fetch.side_effect = [
+            mkfuture_exception(StreamClosedError()),
+            mkfuture_exception(HTTPError(599, 'Timeout')),
+            mkfuture(Mock(code=200))]
+
+        response = yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(response.code, 200)
+
+    @gen_test
+    def test_should_raise_the_last_error(self):
+        self.fetch.side_effect = lambda: mkfuture_exception(
+            ConnectionResetError())
+
+        with self.assertRaises(ConnectionResetError):
+            yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(self.fetch.call_count, 3)
+
+    @gen_test
+    def test_should_not_retry_other_errors(self):
+        self.fetch.side_effect = [mkfuture(Mock(code=500, headers={}))]
+
+        response = yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(response.code, 500)
+        self.assertEqual(self.fetch.call_count, 1)
+
+    @gen_test
+    def test_should_not_retry_non_idempotent_methods(self):
+        self.fetch.side_effect = [mkfuture(Mock(code=503, headers={}))]
+
+        response = yield self.policy.execute(self.fetch, 'POST')
+
+        self.assertEqual(response.code, 503)
+        self.assertEqual(self.fetch.call_count, 1)
+
+    @gen_test
+    def test_should_retry_any_method_without_a_method(self):
+        self.fetch.side_effect = [mkfuture(Mock(code=503, headers={})),
+                                  mkfuture(Mock(code=200))]
+
+        response = yield self.policy.execute(self.fetch)
+
+        self.assertEqual(response.code, 200)
+
+    @gen_test
+    def test_should_respect_the_veto(self):
+        self.fetch.side_effect = [mkfuture(Mock(code=503, headers={}))]
+
+        response = yield self.policy.execute(self.fetch, 'GET',
+                                             can_retry=lambda: False)
+
+        self.assertEqual(response.code, 503)
+
+    @gen_test
+    def test_should_respect_the_budget(self):
+        self.policy.budget = RetryBudget(min_retries=1, ratio=0)
+        self.fetch.side_effect = lambda: mkfuture(
+            Mock(code=503, headers={}))
+
+        yield self.policy.execute(self.fetch, 'GET')
+
+        self.assertEqual(self.fetch.call_count, 2)
+
+    @gen_test
+    def test_replays_should_not_be_counted_as_requests(self):
+        budget = Mock()
+        budget.try_retry.return_value = True
+        self.policy.budget = budget
+        self.fetch.side_effect = lambda: mkfuture(Mock(code=200))
+
+        yield self.policy.execute(self.fetch, 'GET')
+        yield self.policy.execute(self.fetch, 'GET', replay=True)
+
+        self.assertEqual(budget.record_request.call_count, 1)
+
+    def test_delay_should_grow_exponentially_up_to_the_max(self):
+        self.policy.backoff = 1
+        self.policy.max_backoff = 5
+        self.policy.max_attempts = 10
+        response = Mock(code=503, headers={})
+
+        delays = [self.policy._retry_delay(attempt, 'GET', response, None)
+                  for attempt in range(1, 5)]
+
+        self.assertEqual(delays, [1, 2, 4, 5])
+
+    def test_delay_should_apply_full_jitter(self):
+        self.policy.backoff = 1
+        self.policy.jitter = True
+        response = Mock(code=503, headers={})
+
+        for _ in range(20):
+            delay = self.policy._retry_delay(2, 'GET', response, None)
+            self.assertTrue(0 <= delay <= 2)
+
+    def test_delay_should_honor_retry_after(self):
+        seconds = Mock(code=503, headers={'Retry-After': '2'})
+        date = Mock(code=503, headers={
+            'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        too_long = Mock(code=503, headers={'Retry-After': '60'})
+
+        self.assertEqual(
+            self.policy._retry_delay(1, 'GET', seconds, None), 2)
+        self.assertEqual(self.policy._retry_delay(1, 'GET', date, None),
+                         0.001)
+        self.assertIsNone(
+            self.policy._retry_delay(1, 'GET', too_long, None))
+
+
+class TestTokenManagerRetry(AsyncTestCase):
+
+    @gen_test
+    def test_should_retry_the_token_request(self):
+        manager = TokenManager(
+            'http://endpoint/token', 'client_id', 'client_secret',
+            retry_policy=RetryPolicy(backoff=0.001, budget=False))
+        manager._http_client = Mock()
+        manager._http_client.fetch.side_effect = [
+            mkfuture_exception(HTTPError(503)),
+            mkfuture(Mock(body=b'{"access_token":"access","expires_in":10}'))]
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'access')
+        self.assertEqual(manager._http_client.fetch.call_count, 2)
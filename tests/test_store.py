@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from mock import Mock
+from . import mkfuture
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+from tornadoalf.manager import TokenManager
+from tornadoalf.store import FileTokenStore, MemoryTokenStore
+from tornadoalf.token import Token
+
+
+class TestMemoryTokenStore(AsyncTestCase):
+
+    @gen_test
+    def test_should_keep_tokens_by_key(self):
+        store = MemoryTokenStore()
+        token = Token('access', expires_in=10)
+
+        yield store.set('key', token)
+
+        stored = yield store.get('key')
+        missing = yield store.get('other')
+        self.assertIs(stored, token)
+        self.assertIsNone(missing)
+
+    @gen_test
+    def test_should_delete_tokens(self):
+        store = MemoryTokenStore()
+        yield store.set('key', Token('access', expires_in=10))
+
+        yield store.delete('key')
+
+        stored = yield store.get('key')
+        self.assertIsNone(stored)
+        self.assertEqual(store._locks, {})
+
+    @gen_test
+    async def test_should_keep_the_lock_of_a_deleted_token_while_held(self):
+        store = MemoryTokenStore()
+        await store.set('key', Token('access', expires_in=10))
+
+        async with store.lock('key'):
+            await store.delete('key')
+            self.assertIn('key', store._locks)
+
+        self.assertEqual(store._locks, {})
+
+
+class TestFileTokenStore(AsyncTestCase):
+
+    def setUp(self):
+        super(TestFileTokenStore, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'tokens.json')
+        self.store = FileTokenStore(self.path, lock_poll_interval=0.01,
+                                    lock_timeout=0.1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestFileTokenStore, self).tearDown()
+
+    @gen_test
+    def test_should_share_tokens_between_instances(self):
+        token = Token('access', expires_in=10)
+
+        yield self.store.set('key', token)
+        stored = yield FileTokenStore(self.path).get('key')
+
+        self.assertEqual(stored.access_token, 'access')
+        self.assertEqual(stored.expires_on, token.expires_on)
+        self.assertTrue(stored.is_valid())
+
+    @gen_test
+    def test_should_keep_the_expiration_of_stored_tokens(self):
+        yield self.store.set('key', Token('access', expires_in=0))
+
+        stored = yield self.store.get('key')
+
+        self.assertFalse(stored.is_valid())
+
+    @gen_test
+    def test_should_ignore_a_missing_or_corrupted_file(self):
+        stored = yield self.store.get('key')
+        self.assertIsNone(stored)
+
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+
+        stored = yield self.store.get('key')
+        self.assertIsNone(stored)
+
+    @gen_test
+    def test_should_delete_tokens(self):
+        yield self.store.set('key', Token('access', expires_in=10))
+        yield self.store.set('other', Token('other', expires_in=10))
+
+        yield self.store.delete('key')
+
+        stored = yield self.store.get('key')
+        other = yield self.store.get('other')
+        self.assertIsNone(stored)
+        self.assertEqual(other.access_token, 'other')
+
+    @gen_test
+    def test_lock_should_exclude_other_instances(self):
+        other = FileTokenStore(self.path, lock_poll_interval=0.01,
+                               lock_timeout=1)
+        events = []
+
+        async def hold():
+            async with self.store.lock('key'):
+                events.append('first')
+                await gen.sleep(0.05)
+                events.append('first done')
+
+        async def wait():
+            await gen.sleep(0.01)
+            async with other.lock('key'):
+                events.append('second')
+
+        start = self.io_loop.time()
+        yield [hold(), wait()]
+
+        self.assertEqual(events, ['first', 'first done', 'second'])
+        self.assertLess(self.io_loop.time() - start, 0.5)
+
+    @gen_test
+    def test_lock_should_give_up_after_the_timeout(self):
+        events = []
+
+        async def hold():
+            async with self.store.lock('key'):
+                await gen.sleep(0.3)
+                events.append('first done')
+
+        async def wait():
+            await gen.sleep(0.01)
+            async with FileTokenStore(self.path, lock_poll_interval=0.01,
+                                      lock_timeout=0.05).lock('key'):
+                events.append('second')
+
+        yield [hold(), wait()]
+
+        self.assertEqual(events, ['second', 'first done'])
+
+
+class TestTokenManagerWithStore(AsyncTestCase):
+
+    def _manager(self, store):
+        manager = TokenManager('http://endpoint/token', 'client_id',
+                               'client_secret', token_store=store)
+        manager._request_token = Mock(return_value=mkfuture({
+            'access_token': 'shared', 'expires_in': 10}))
+        return manager
+
+    @gen_test
+    def test_managers_sharing_a_store_should_request_a_single_token(self):
+        store = MemoryTokenStore()
+        first, second = self._manager(store), self._manager(store)
+
+        tokens = yield [first.get_token(), second.get_token()]
+
+        self.assertEqual(tokens, ['shared', 'shared'])
+        calls = (first._request_token.call_count +
+                 second._request_token.call_count)
+        self.assertEqual(calls, 1)
+
+    @gen_test
+    def test_should_load_a_valid_stored_token_without_requesting(self):
+        store = MemoryTokenStore()
+        manager = self._manager(store)
+        yield store.set(manager._store_key(), Token('stored', expires_in=10))
+
+        token = yield manager.get_token()
+
+        self.assertEqual(token, 'stored')
+        self.assertFalse(manager._request_token.called)
+
+    @gen_test
+    def test_should_not_reload_the_rejected_token_from_the_store(self):
+        store = MemoryTokenStore()
+        manager = self._manager(store)
+        yield store.set(manager._store_key(), Token('stored', expires_in=10))
+        yield manager.get_token()
+
+        yield manager.reset_token('stored')
+
+        self.assertEqual(manager._token.access_token, 'shared')
+        stored = yield store.get(manager._store_key())
+        self.assertEqual(stored.access_token, 'shared')
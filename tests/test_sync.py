@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from tornado import gen, web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornadoalf.client import Client
+from tornadoalf.sync import SyncClient
+
+
+class TokenHandler(web.RequestHandler):
+
+    async def post(self):
+        await gen.sleep(0.05)
+        self.application.tokens += 1
+        self.write({'access_token': 'token-%d' % self.application.tokens,
+                    'expires_in': 10})
+
+
+class ResourceHandler(web.RequestHandler):
+
+    def get(self):
+        self.write(self.request.headers['Authorization'])
+
+
+class TestSyncClient(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # the server runs in its own thread, as the callers block theirs
+        cls.app = web.Application([
+            ('/token', TokenHandler),
+            ('/resource', ResourceHandler),
+        ])
+        cls.loop = asyncio.new_event_loop()
+        sockets = bind_sockets(0, '127.0.0.1')
+        port = sockets[0].getsockname()[1]
+        cls.base_url = f'http://127.0.0.1:{port}'
+
+        async def serve():
+            cls.server = HTTPServer(cls.app)
+            cls.server.add_sockets(sockets)
+
+        cls.loop.run_until_complete(serve())
+        cls.thread = threading.Thread(target=cls.loop.run_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loop.call_soon_threadsafe(cls.server.stop)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def setUp(self):
+        self.app.tokens = 0
+        self.client = SyncClient(
+            token_endpoint=f'{self.base_url}/token',
+            client_id='client-id', client_secret='client_secret')
+        self.addCleanup(self.client.close)
+
+    def test_should_fetch_blocking(self):
+        response = self.client.fetch(f'{self.base_url}/resource')
+
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'Bearer token-1')
+
+    def test_should_share_the_token_between_threads(self):
+        url = f'{self.base_url}/resource'
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(
+                lambda _: self.client.fetch(url), range(32)))
+
+        self.assertEqual({response.body for response in responses},
+                         {b'Bearer token-1'})
+        self.assertEqual(self.app.tokens, 1)
+
+    def test_should_fetch_many(self):
+        responses = self.client.fetch_many(
+            [f'{self.base_url}/resource'] * 3)
+
+        self.assertEqual([response.code for response in responses],
+                         [200] * 3)
+
+    def test_should_get_the_token(self):
+        self.assertEqual(self.client.get_token(), 'token-1')
+
+    def test_should_run_the_client_in_the_background_thread(self):
+        self.assertIsInstance(self.client.client, Client)
+        self.client.fetch(f'{self.base_url}/resource')
+
+        self.assertIs(self.client.client._loop, self.client._loop)
+
+    def test_close_should_stop_the_background_thread(self):
+        self.client.close()
+        self.client.close()
+
+        self.assertFalse(self.client._thread.is_alive())
+        self.assertTrue(self.client.client._closed)
+        with self.assertRaises(RuntimeError):
+            self.client.fetch(f'{self.base_url}/resource')
+
+    def test_should_close_on_exit(self):
+        with SyncClient(token_endpoint=f'{self.base_url}/token',
+                        client_id='client-id',
+                        client_secret='client_secret') as client:
+            client.fetch(f'{self.base_url}/resource')
+
+        self.assertFalse(client._thread.is_alive())
+
+    def test_should_not_block_its_own_loop(self):
+        async def fetch():
+            self.client.fetch(f'{self.base_url}/resource')
+
+        future = asyncio.run_coroutine_threadsafe(fetch(), self.client._loop)
+        with self.assertRaises(RuntimeError):
+            future.result()
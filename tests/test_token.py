@@ -1,11 +1,14 @@
 #
 # encoding: utf-8
 
+import base64
 import datetime
+import json
 
 from unittest import TestCase
-from mock import MagicMock
-from tornadoalf.token import Token, TokenHTTPError
+from mock import MagicMock, patch
+from tornadoalf.token import (
+    Token, TokenError, TokenHTTPError, jwt_claims, parse_token_data)
 from tornado.httpclient import HTTPResponse
 
 
@@ -30,6 +33,102 @@ class TestToken(TestCase):
             token.expires_on <
             datetime.datetime.utcnow() + datetime.timedelta(seconds=15))
 
+    def test_ttl_should_return_the_seconds_until_it_expires(self):
+        token = Token(access_token='access_token', expires_in=10)
+        self.assertTrue(9 < token.ttl() <= 10)
+
+    def test_should_keep_the_expiration_when_serialized(self):
+        token = Token(access_token='access_token', expires_in=10)
+
+        restored = Token.from_dict(token.to_dict())
+
+        self.assertEqual(restored.access_token, 'access_token')
+        self.assertEqual(restored._expires_in, 10)
+        self.assertEqual(restored.expires_on, token.expires_on)
+
+    def test_should_not_be_affected_by_wall_clock_jumps(self):
+        token = Token(access_token='access_token', expires_in=10)
+
+        with patch('tornadoalf.token.time.time', return_value=0):
+            self.assertTrue(token.is_valid())
+        with patch('tornadoalf.token.time.time', return_value=2 ** 40):
+            self.assertTrue(token.is_valid())
+
+    def test_should_expire_skew_seconds_earlier(self):
+        token = Token(access_token='access_token', expires_in=10, skew=11)
+        self.assertFalse(token.is_valid())
+
+        token.skew = 5
+        self.assertTrue(token.is_valid())
+
+    def test_should_restore_an_expired_token(self):
+        token = Token(access_token='access_token', expires_in=10)
+        data = token.to_dict()
+        data['expires_on'] -= 11
+
+        restored = Token.from_dict(data)
+
+        self.assertFalse(restored.is_valid())
+        self.assertTrue(-2 < restored.ttl() < 0)
+
+    def test_should_format_the_authorization_header_once(self):
+        token = Token(access_token='access_token', expires_in=10)
+
+        self.assertEqual(token.authorization, 'Bearer access_token')
+
+    def test_should_not_have_an_instance_dict(self):
+        token = Token(access_token='access_token', expires_in=10)
+
+        with self.assertRaises(AttributeError):
+            token.other = 'value'
+
+
+def make_jwt(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode('utf-8'))
+    return 'eyJhbGciOiJIUzI1NiJ9.%s.signature' % (
+        payload.decode('ascii').rstrip('='))
+
+
+class TestJWTClaims(TestCase):
+
+    def test_should_decode_the_claims_of_a_jwt(self):
+        claims = jwt_claims(make_jwt({'exp': 1700000000, 'sub': 'client'}))
+        self.assertEqual(claims, {'exp': 1700000000, 'sub': 'client'})
+
+    def test_should_ignore_opaque_tokens(self):
+        self.assertIsNone(jwt_claims('opaque-token'))
+        self.assertIsNone(jwt_claims('not.a.jwt'))
+        self.assertIsNone(jwt_claims(make_jwt(['exp'])))
+
+
+class TestParseTokenData(TestCase):
+
+    def test_should_return_the_token_fields(self):
+        data = parse_token_data({'access_token': 'access', 'expires_in': '60',
+                                 'token_type': 'Bearer',
+                                 'refresh_token': 'refresh'}, 3600)
+
+        self.assertEqual(data, {'access_token': 'access', 'expires_in': 60,
+                                'token_type': 'Bearer',
+                                'refresh_token': 'refresh'})
+
+    def test_should_default_and_clamp_expires_in(self):
+        self.assertEqual(parse_token_data(
+            {'access_token': 'access'}, 3600)['expires_in'], 3600)
+        self.assertEqual(parse_token_data(
+            {'access_token': 'access', 'expires_in': -5}, 3600
+        )['expires_in'], 0)
+
+    def test_should_reject_invalid_responses(self):
+        for token_data in (
+                ['access'],
+                {'access_token': ''},
+                {'access_token': 'access', 'token_type': 'mac'},
+                {'access_token': 'access', 'expires_in': 'soon'},
+                {'access_token': 'access', 'expires_in': float('inf')}):
+            with self.assertRaises(TokenError):
+                parse_token_data(token_data, 3600)
+
 
 class TestTokenHTTPError(TestCase):
 
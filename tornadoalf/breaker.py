@@ -0,0 +1,91 @@
+#
+# encoding: utf-8
+import logging
+import time
+
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while.
+
+    The circuit opens when at least ``failure_ratio`` of the last
+    ``window_size`` calls failed (once ``minimum_calls`` were made). While
+    open, calls are refused for ``cooldown`` seconds; then it is half-open
+    and a single probe call is allowed: its success closes the circuit and
+    its failure opens it again. A probe not recorded after ``cooldown``
+    seconds (e.g. cancelled) is replaced by another one.
+
+    Callers ask ``allow()`` before each call and report its outcome with
+    ``record_success()`` or ``record_failure()``.
+    """
+
+    def __init__(self, failure_ratio=0.5, minimum_calls=5, window_size=20,
+                 cooldown=30, name=''):
+        self.failure_ratio = failure_ratio
+        self.minimum_calls = minimum_calls
+        self.cooldown = cooldown
+        self.name = name
+        self._calls = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = None
+        self._probe_started_at = None
+
+    @property
+    def state(self):
+        if self._state == OPEN and self._cooldown_elapsed(self._opened_at):
+            return HALF_OPEN
+        return self._state
+
+    def allow(self):
+        if self._state == CLOSED:
+            return True
+
+        if self._state == OPEN:
+            if not self._cooldown_elapsed(self._opened_at):
+                return False
+            self._state = HALF_OPEN
+        elif not self._cooldown_elapsed(self._probe_started_at):
+            # half-open with a probe in flight
+            return False
+
+        self._probe_started_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        if self._state == HALF_OPEN:
+            logger.info('Circuit %s closed', self.name)
+            self._state = CLOSED
+            self._calls.clear()
+        self._calls.append(True)
+
+    def record_failure(self):
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+
+        self._calls.append(False)
+        failures = self._calls.count(False)
+        if (self._state == CLOSED and len(self._calls) >= self.minimum_calls
+                and failures >= self.failure_ratio * len(self._calls)):
+            self._open()
+
+    def _open(self):
+        logger.warning('Circuit %s opened for %ss', self.name, self.cooldown)
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_started_at = None
+
+    def _cooldown_elapsed(self, since):
+        return since is None or time.monotonic() - since >= self.cooldown
@@ -0,0 +1,240 @@
+#
+# encoding: utf-8
+import asyncio
+import time
+
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+
+from tornado.httpclient import HTTPResponse
+from tornado.httputil import HTTPHeaders
+
+
+CACHEABLE_STATUSES = frozenset([200, 203])
+NOT_MODIFIED = 304
+# cached apart by credentials, not by the authorization itself
+IGNORED_VARY = frozenset(['authorization'])
+CONDITIONAL_HEADERS = ('If-None-Match', 'If-Modified-Since')
+
+
+class ResponseCache:
+    """Caches the responses of GET requests, following their
+    ``Cache-Control``, ``Expires`` and ``Vary`` headers.
+
+    A fresh response is returned without any request. A stale response
+    with an ``ETag`` or ``Last-Modified`` is revalidated with a conditional
+    request, and reused when the server answers 304. Concurrent identical
+    requests share a single upstream request.
+
+    At most ``max_entries`` responses, with bodies of ``max_size`` bytes
+    in total, are kept, evicting the least recently used ones. Requests
+    with ``Cache-Control: no-store`` skip the cache, and with
+    ``Cache-Control: no-cache`` are always revalidated.
+    """
+
+    def __init__(self, max_entries=1000, max_size=64 * 1024 * 1024):
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._size = 0
+        # key -> _Entry, least recently used first
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def is_cacheable(request):
+        return (request.method == 'GET' and request.body is None and
+                request.body_producer is None and
+                request.streaming_callback is None and
+                'no-store' not in _cache_control(request.headers))
+
+    async def fetch(self, key, request, fetch):
+        """Returns the response to ``request`` from the cache, or from the
+        coroutine function ``fetch`` sending it. ``key`` identifies the
+        credentials and URL of the request."""
+        if not isinstance(request.headers, HTTPHeaders):
+            request.headers = HTTPHeaders(request.headers)
+
+        entry = self._lookup(key, request)
+        if (entry is not None and entry.is_fresh() and
+                'no-cache' not in _cache_control(request.headers)):
+            return entry.response(request)
+
+        # only requests with the same headers share a response
+        in_flight_key = (key, _request_headers(request))
+        in_flight = self._in_flight.get(in_flight_key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(
+                self._revalidate(key, request, entry, fetch))
+            self._in_flight[in_flight_key] = in_flight
+            in_flight.add_done_callback(
+                lambda _: self._in_flight.pop(in_flight_key, None))
+
+        entry = await asyncio.shield(in_flight)
+        return entry.response(request)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    async def _revalidate(self, key, request, entry, fetch):
+        conditional = []
+        if entry is not None:
+            for header, value in zip(CONDITIONAL_HEADERS,
+                                     (entry.etag, entry.last_modified)):
+                if value is not None and header not in request.headers:
+                    request.headers[header] = value
+                    conditional.append(header)
+
+        try:
+            response = await fetch()
+        finally:
+            for header in conditional:
+                del request.headers[header]
+
+        if response.code == NOT_MODIFIED and conditional:
+            entry.update(response.headers)
+            return entry
+
+        entry = _Entry.of(request, response)
+        self._store(key, entry)
+        return entry
+
+    def _lookup(self, key, request):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not entry.matches(request):
+            return None
+
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, entry):
+        # one not stored leaves the previous response of the key cached
+        if not entry.is_storable() or len(entry.body) > self._max_size:
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous.body)
+
+        self._entries[key] = entry
+        self._size += len(entry.body)
+        while (len(self._entries) > self._max_entries or
+               self._size > self._max_size):
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+
+
+class _Entry:
+    """A response as cached, with its freshness and validators."""
+
+    __slots__ = ('code', 'reason', 'headers', 'body', 'effective_url',
+                 'vary', 'etag', 'last_modified', 'fresh_until',
+                 'no_store')
+
+    def __init__(self, code, reason, headers, body, effective_url, vary):
+        self.code = code
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.effective_url = effective_url
+        self.vary = vary
+        self.update(headers)
+
+    @classmethod
+    def of(cls, request, response):
+        varying = [name.strip().lower() for name in
+                   response.headers.get('Vary', '').split(',')
+                   if name.strip()]
+        vary = None
+        if '*' not in varying:
+            vary = {name: request.headers.get(name) for name in varying
+                    if name not in IGNORED_VARY}
+
+        return cls(response.code, response.reason,
+                   HTTPHeaders(response.headers), response.body or b'',
+                   response.effective_url, vary)
+
+    def update(self, headers):
+        """Takes the validators and freshness of a response (e.g. a 304
+        revalidating the entry)."""
+        if headers is not self.headers:
+            for name in ('Cache-Control', 'Expires', 'Date', 'Age', 'ETag',
+                         'Last-Modified'):
+                if name in headers:
+                    self.headers[name] = headers[name]
+
+        cache_control = _cache_control(self.headers)
+        self.no_store = 'no-store' in cache_control
+        self.etag = self.headers.get('ETag')
+        self.last_modified = self.headers.get('Last-Modified')
+        self.fresh_until = time.monotonic() + _freshness(
+            self.headers, cache_control)
+
+    def is_storable(self):
+        return (self.code in CACHEABLE_STATUSES and not self.no_store and
+                self.vary is not None and
+                (self.is_fresh() or self.etag is not None or
+                 self.last_modified is not None))
+
+    def is_fresh(self):
+        return time.monotonic() < self.fresh_until
+
+    def matches(self, request):
+        return all(request.headers.get(name) == value
+                   for name, value in self.vary.items())
+
+    def response(self, request):
+        return HTTPResponse(request, self.code, reason=self.reason,
+                            headers=HTTPHeaders(self.headers),
+                            buffer=BytesIO(self.body),
+                            effective_url=self.effective_url)
+
+
+def _cache_control(headers):
+    directives = {}
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+    return directives
+
+
+def _freshness(headers, cache_control):
+    """Seconds the response stays fresh (RFC 9111, section 4.2.1)."""
+    if 'no-cache' in cache_control:
+        return 0
+
+    try:
+        age = max(0, int(headers.get('Age', 0)))
+    except ValueError:
+        age = 0
+
+    if 'max-age' in cache_control:
+        try:
+            return int(cache_control['max-age']) - age
+        except ValueError:
+            return 0
+
+    if 'Expires' not in headers:
+        return 0
+    try:
+        expires = parsedate_to_datetime(headers['Expires'])
+        date = parsedate_to_datetime(headers['Date']) if (
+            'Date' in headers) else None
+    except (TypeError, ValueError):
+        return 0
+    if date is None:
+        return expires.timestamp() - time.time() - age
+    return (expires - date).total_seconds() - age
+
+
+def _request_headers(request):
+    return tuple(sorted(
+        (name.lower(), value) for name, value in request.headers.items()
+        if name.lower() != 'authorization'))
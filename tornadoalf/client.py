@@ -1,9 +1,21 @@
 #
 # encoding: utf-8
+import asyncio
 import logging
+import time
 
-from tornado.httpclient import AsyncHTTPClient, HTTPRequest
-from tornadoalf.manager import TokenManager, TokenError
+from urllib.parse import urlsplit
+
+from tornado.httpclient import AsyncHTTPClient, HTTPError, HTTPRequest
+from tornado.httputil import HTTPInputError, parse_response_start_line
+from tornadoalf.breaker import CircuitBreaker, CircuitOpenError
+from tornadoalf.httpclient import (
+    Deadline, DeadlineExceededError, RequestLogger, make_http_client,
+    timed_fetch)
+from tornadoalf.manager import TokenManager, TokenError, normalize_scope
+from tornadoalf.ratelimit import RateLimiter, acquire_all
+from tornadoalf.retry import ReplayPolicy
+from tornadoalf.token import BEARER_PREFIX
 
 BAD_TOKEN = 401
 
@@ -15,16 +27,144 @@ class Client:
     token_manager_class = TokenManager
 
     def __init__(self, client_id, client_secret,
-                 token_endpoint, http_options=None):
+                 token_endpoint, http_options=None, token_options=None,
+                 http_client_options=None, token_http_client_options=None,
+                 max_requests_per_host=None, retry_policy=None,
+                 host_circuit_breaker=None, observer=None, log_sampling=1,
+                 http_client=None, token_manager=None, replay_policy=None,
+                 deadline_header=None, response_cache=None, rate_limit=None,
+                 host_rate_limit=None):
+        """``token_options`` are extra keyword arguments for the
+        ``token_manager_class``, e.g. ``{'refresh_ratio': 0.8}`` to renew
+        the token in background before it expires.
+
+        Without ``http_client_options`` requests go through the
+        ``AsyncHTTPClient`` of the IOLoop running them; with them (see
+        ``make_http_client``) the client gets its own pool, e.g.
+        ``{'implementation': 'curl', 'max_clients': 100}``. Tokens are
+        requested through the same pool unless ``token_http_client_options``
+        are given (``{}`` is enough), so a burst of requests can't delay a
+        token refresh.
+        ``max_requests_per_host`` bounds the concurrent requests to each
+        host. The time a response waited for a connection is in
+        ``response.time_info['queue']``.
+
+        ``retry_policy`` (a ``tornadoalf.retry.RetryPolicy``) retries the
+        requests, and the token requests unless ``token_options`` has its
+        own, sharing the policy retry budget.
+
+        ``host_circuit_breaker`` are the ``CircuitBreaker`` arguments of a
+        circuit per host: while a host fails (5xx responses and connection
+        errors) requests to it raise ``CircuitOpenError`` without being
+        sent. The token endpoint circuit is the ``circuit_breaker`` of
+        ``token_options``.
+
+        An ``observer`` (a ``tornadoalf.metrics.Observer``, e.g. a
+        ``MetricsObserver``) receives the events of the requests and of the
+        token manager.
+
+        Requests are logged at DEBUG level, one in ``log_sampling``.
+
+        ``replay_policy`` (a ``tornadoalf.retry.ReplayPolicy``) decides
+        which requests are replayed after a 401; by default all of them.
+
+        With a ``deadline_header`` (e.g. ``'X-Request-Timeout'``) requests
+        with a deadline tell the server the seconds left in that header.
+
+        With a ``response_cache`` (a ``tornadoalf.cache.ResponseCache``)
+        GET responses are cached according to their HTTP cache headers,
+        apart for each token manager, scope and audience, so a response is
+        never served to other credentials.
+
+        A ``rate_limit`` (a ``tornadoalf.ratelimit.RateLimiter``) bounds
+        the rate of all the requests of the client, e.g. to the quota of
+        its client id; ``host_rate_limit`` are the ``RateLimiter``
+        arguments of a limiter per host. Requests wait for their turn, or
+        raise ``RateLimitError`` when they would wait too long; 429
+        responses and ``X-RateLimit-*`` headers slow them down.
+
+        An existing ``http_client`` or ``token_manager`` can be shared with
+        other clients (see ``tornadoalf.registry.ClientRegistry``). Those,
+        like the IOLoop ``AsyncHTTPClient``, are borrowed: ``close`` only
+        closes what the client created.
+        """
         http_options = {} if http_options is None else http_options
-        self._http_client = AsyncHTTPClient()
-        self._token_manager = self.token_manager_class(
-            token_endpoint=token_endpoint,
-            client_id=client_id,
-            client_secret=client_secret,
-            http_options=http_options)
-
-    async def fetch(self, request, raise_error=True, **kwargs):
+        token_options = dict(token_options or {})
+        if retry_policy is not None:
+            token_options.setdefault('retry_policy', retry_policy)
+        if observer is not None:
+            token_options.setdefault('observer', observer)
+
+        # the http clients created here, closed with the client
+        self._owned_http_clients = []
+        if http_client is None and http_client_options is not None:
+            http_client = make_http_client(http_client_options)
+            self._owned_http_clients.append(http_client)
+        # None: the AsyncHTTPClient of the running IOLoop
+        self._http_client = http_client
+
+        if token_http_client_options is None:
+            token_http_client = self._http_client
+        else:
+            token_http_client = make_http_client(token_http_client_options)
+            self._owned_http_clients.append(token_http_client)
+
+        self._max_requests_per_host = max_requests_per_host
+        self._retry_policy = retry_policy
+        self._host_semaphores = {}
+        self._host_circuit_breaker = host_circuit_breaker
+        self._host_breakers = {}
+        self._rate_limit = rate_limit
+        self._host_rate_limit = host_rate_limit
+        self._host_rate_limiters = {}
+        self._observer = observer
+        self._request_logger = RequestLogger(logger, log_sampling)
+        self._replay_policy = (
+            ReplayPolicy() if replay_policy is None else replay_policy)
+        self._accepted_tokens = {}
+        self._deadline_header = deadline_header
+        self._response_cache = response_cache
+        self._loop = None
+        self._closed = False
+        self._owns_token_manager = token_manager is None
+        if token_manager is None:
+            token_manager = self.token_manager_class(
+                token_endpoint=token_endpoint,
+                client_id=client_id,
+                client_secret=client_secret,
+                http_options=http_options,
+                http_client=token_http_client,
+                **token_options)
+        self._token_manager = token_manager
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self):
+        """Stops the token manager background work and closes the http
+        clients created by the client. It can't be used afterwards."""
+        self._closed = True
+        if self._owns_token_manager:
+            self._token_manager.close()
+        self._close_http_clients()
+
+    async def aclose(self):
+        """Like ``close``, waiting for the cancelled work to finish."""
+        self._closed = True
+        if self._owns_token_manager:
+            await self._token_manager.aclose()
+        self._close_http_clients()
+
+    def _close_http_clients(self):
+        while self._owned_http_clients:
+            self._owned_http_clients.pop().close()
+
+    async def fetch(self, request, raise_error=True, scope=None,
+                    audience=None, replay=None, deadline=None,
+                    total_timeout=None, **kwargs):
         """Executes a request by AsyncHTTPClient,
         asynchronously returning an `tornado.HTTPResponse`.
 
@@ -33,42 +173,552 @@ class Client:
            following the tornado http-client standard
 
             The ``callback`` argument was removed. Use the await.
+
+           With a ``streaming_callback`` the body of a 401 response is
+           not delivered to it, and the request is only replayed if no
+           body chunk was delivered. A ``body_producer`` is called again
+           when the request is replayed, so it must be able to produce
+           the body twice.
+
+           With a ``retry_policy`` a request is also retried after
+           transient errors; the replay after a 401 has its own attempts
+           and isn't counted as a new request by the retry budget.
+
+           ``scope`` and ``audience`` select a token other than the one
+           of the client, cached apart by the token manager.
+
+           ``replay=False`` returns (or raises) the 401 response instead
+           of replaying the request, ``replay=True`` always replays it;
+           by default the ``replay_policy`` of the client decides.
+
+           A ``deadline`` (a ``tornadoalf.httpclient.Deadline``) or a
+           ``total_timeout`` in seconds bounds the whole call: waiting for
+           the token, the request, its retries and its replay. Each attempt
+           is sent with its timeouts reduced to the time left, and
+           ``DeadlineExceededError`` (an HTTP 599 error) is raised when it
+           runs out.
         """
         # accepts request as string then convert it to HTTPRequest
         if isinstance(request, str):
             request = HTTPRequest(request, **kwargs)
+            kwargs = {}
+
+        self._check_loop()
+        token_key = _token_key(scope, audience)
+        if replay is None:
+            replay = self._replay_policy.can_replay(request)
+
+        if deadline is None and total_timeout is not None:
+            deadline = Deadline(total_timeout)
+
+        cache = self._response_cache
+        if cache is None or not cache.is_cacheable(request):
+            return await self._deadline_fetch(
+                request, raise_error, token_key, replay, deadline, kwargs)
+
+        cached = cache.fetch(
+            (self._token_manager, normalize_scope(scope), audience,
+             request.url),
+            request,
+            lambda: self._deadline_fetch(
+                request, False, token_key, replay, deadline, kwargs))
+        if deadline is None:
+            response = await cached
+        else:
+            # a request in flight joined runs with the deadline of its
+            # first caller, the shared fetch keeps going for the others
+            try:
+                response = await asyncio.wait_for(cached,
+                                                  deadline.remaining())
+            except asyncio.TimeoutError:
+                raise DeadlineExceededError() from None
+        if response.error and raise_error:
+            raise response.error
+        return response
+
+    async def _deadline_fetch(self, request, raise_error, token_key, replay,
+                              deadline, kwargs):
+        if deadline is None:
+            return await self._fetch(request, raise_error, token_key, replay,
+                                     None, kwargs)
+
+        timeouts = request.connect_timeout, request.request_timeout
+        try:
+            return await asyncio.wait_for(
+                self._fetch(request, raise_error, token_key, replay,
+                            deadline, kwargs),
+                deadline.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError() from None
+        finally:
+            request.connect_timeout, request.request_timeout = timeouts
+
+    async def _fetch(self, request, raise_error, token_key, replay, deadline,
+                     kwargs):
+        body_guard = None
+        if not replay:
+            body_guard = await self._preflight(request, token_key, deadline)
 
+        stream_guard = _StreamGuard.install(
+            request, self._held_statuses(request))
         try:
             # The first request calls tornado-client ignoring the
             # possible exception, in case of 401 response,
             # renews the access token and replay it
-            response = await self._authorized_fetch(request,
-                                                    raise_error=False,
-                                                    **kwargs)
+            response = await self._send(request, stream_guard, token_key,
+                                        raise_error=False, deadline=deadline,
+                                        **kwargs)
 
-            if response.code == BAD_TOKEN:
-                await self._token_manager.reset_token()
-            elif response.error and raise_error:
-                raise response.error
-            else:
-                return response
+            if response.code != BAD_TOKEN or (
+                    stream_guard and stream_guard.delivered):
+                if self._replay_policy.preflight == 'head':
+                    self._accept_token(request, response, token_key)
+                return _final_response(response, stream_guard, raise_error)
+
+            # only renews if nobody else renewed the rejected token
+            await self._token_manager.reset_token(
+                _bearer_token(request), **token_key)
+
+            if not (replay or body_guard and not body_guard.started):
+                return _final_response(response, stream_guard, raise_error)
+
+            if self._observer is not None:
+                self._observer.request_replayed(request)
 
             # The request with renewed token
-            response = await self._authorized_fetch(request,
-                                                    raise_error=raise_error,
-                                                    **kwargs)
-            return response
+            response = await self._send(request, stream_guard, token_key,
+                                        replay=True, raise_error=False,
+                                        deadline=deadline, **kwargs)
+            return _final_response(response, stream_guard, raise_error)
 
         except TokenError as err:
-            await self._token_manager.reset_token()
+            if not isinstance(err, CircuitOpenError):
+                await self._token_manager.reset_token(**token_key)
             raise err
+        finally:
+            if stream_guard:
+                stream_guard.uninstall()
+            if body_guard:
+                body_guard.uninstall()
+
+    async def stream(self, request, scope=None, audience=None, **kwargs):
+        """Executes a request yielding the chunks of its body as they are
+        received, instead of buffering it in the response.
+
+        Errors are raised after the chunks of the error body, as with
+        ``fetch(raise_error=True)``. A 401 is replayed like in ``fetch``.
+
+        The chunks are read as fast as the server sends them, whether or not
+        they are consumed: Tornado can't pause a response, so the chunks
+        waiting for a slow consumer are buffered without bound. Only a
+        ``streaming_callback`` handling them as they arrive (e.g. writing
+        them to a file) bounds the memory of a large body.
+        """
+        if isinstance(request, str):
+            request = HTTPRequest(request, **kwargs)
+            kwargs = {}
+
+        streaming_callback = request.streaming_callback
+        chunks = asyncio.Queue()
+        request.streaming_callback = chunks.put_nowait
+        fetching = asyncio.ensure_future(self.fetch(
+            request, scope=scope, audience=audience, **kwargs))
+        fetching.add_done_callback(lambda _: chunks.put_nowait(None))
+
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+
+            fetching.result()
+        finally:
+            fetching.cancel()
+            request.streaming_callback = streaming_callback
+
+    async def fetch_many(self, requests, concurrency=10,
+                         return_exceptions=False, **kwargs):
+        """Executes ``requests`` with at most ``concurrency`` of them at a
+        time, returning their responses in the same order.
+
+        With ``return_exceptions=True`` a failed request has its exception
+        in place of the response, otherwise the first error is raised and
+        the remaining requests are cancelled. ``kwargs`` are passed to
+        ``fetch`` for every request.
+        """
+        results = {}
+        async for index, result in self.iter_fetch_many(
+                requests, concurrency, return_exceptions, **kwargs):
+            results[index] = result
+
+        return [results[index] for index in range(len(results))]
+
+    async def iter_fetch_many(self, requests, concurrency=10,
+                              return_exceptions=False, **kwargs):
+        """Like ``fetch_many``, but yields ``(index, response)`` pairs as
+        the requests complete.
+
+        The token is obtained once before the first request, and a 401 in
+        the middle of the batch results in a single token refresh shared
+        by every request that got it.
+        """
+        if concurrency < 1:
+            raise ValueError(
+                f'concurrency must be at least 1, got {concurrency!r}')
+
+        await self._token_manager.get_token(**_token_key(
+            kwargs.get('scope'), kwargs.get('audience')))
+
+        requests = enumerate(requests)
+        pending = set()
+
+        def start_next():
+            for index, request in requests:
+                pending.add(asyncio.ensure_future(
+                    self._indexed_fetch(index, request, kwargs)))
+                return
+
+        for _ in range(concurrency):
+            start_next()
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    start_next()
+
+                    index, response, error = task.result()
+                    if error is None:
+                        yield index, response
+                    elif return_exceptions:
+                        yield index, error
+                    else:
+                        raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _indexed_fetch(self, index, request, kwargs):
+        try:
+            return index, await self.fetch(request, **kwargs), None
+        except Exception as err:
+            return index, None, err
+
+    def _check_loop(self):
+        if self._closed:
+            raise RuntimeError('Client is closed')
+
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError(
+                'Client is bound to another event loop, create one per loop')
+
+    async def _preflight(self, request, token_key, deadline=None):
+        """Validates the token of a request that won't be replayed,
+        according to the ``preflight`` of the replay policy."""
+        preflight = self._replay_policy.preflight
+        if preflight == 'expect':
+            if request.body is None and request.body_producer is None:
+                return None
+            request.expect_100_continue = True
+            # the curl implementation only honors the header
+            request.headers['Expect'] = '100-continue'
+            return _BodyGuard.install(request)
+
+        if preflight == 'head':
+            access_token = await self._token_manager.get_token(**token_key)
+            if self._accepted_tokens.get(_key(token_key)) == access_token:
+                return None
+
+            probe = HTTPRequest(request.url, method='HEAD',
+                                connect_timeout=request.connect_timeout,
+                                request_timeout=request.request_timeout)
+            response = await self._authorized_fetch(
+                probe, token_key, deadline, raise_error=False)
+            if response.code == BAD_TOKEN:
+                await self._token_manager.reset_token(
+                    _bearer_token(probe), **token_key)
+            else:
+                self._accept_token(probe, response, token_key)
+
+        return None
+
+    def _accept_token(self, request, response, token_key):
+        if response.code != BAD_TOKEN and response.code < 500:
+            self._accepted_tokens[_key(token_key)] = _bearer_token(request)
+
+    async def _send(self, request, stream_guard, token_key, replay=False,
+                    raise_error=True, deadline=None, **kwargs):
+        """``_authorized_fetch`` applying the retry policy."""
+        if self._retry_policy is None:
+            return await self._authorized_fetch(
+                request, token_key, deadline, raise_error=raise_error,
+                **kwargs)
+
+        def can_retry():
+            # a streamed body can't be taken back
+            return not (stream_guard and stream_guard.delivered) and not (
+                deadline and deadline.expired())
+
+        response = await self._retry_policy.execute(
+            lambda: self._authorized_fetch(
+                request, token_key, deadline, raise_error=False, **kwargs),
+            method=request.method, replay=replay, can_retry=can_retry)
+
+        if raise_error and response.error:
+            raise response.error
+        return response
+
+    def _held_statuses(self, request):
+        # only the responses of requests that may be retried
+        if self._retry_policy is None or (
+                request.method.upper() not in self._retry_policy.methods):
+            return frozenset([BAD_TOKEN])
+        return self._retry_policy.status_codes | frozenset([BAD_TOKEN])
+
+    async def _authorized_fetch(self, request, token_key=None, deadline=None,
+                                **kwargs):
+        get_authorization = getattr(
+            self._token_manager, 'get_authorization', None)
+        if get_authorization is None:
+            # a token manager of its own, without the cached header
+            request.headers['Authorization'] = BEARER_PREFIX + (
+                await self._token_manager.get_token(**(token_key or {})))
+        else:
+            request.headers['Authorization'] = (
+                await get_authorization(**(token_key or {})))
+        limiters = self._rate_limiters(request.url)
+        if limiters:
+            await acquire_all(
+                limiters, None if deadline is None else deadline.remaining())
+        if deadline is not None:
+            deadline.apply(request, self._deadline_header)
+
+        self._request_logger.log(request)
+
+        if not limiters:
+            return await self._guarded_fetch(request, **kwargs)
+
+        try:
+            response = await self._guarded_fetch(request, **kwargs)
+        except HTTPError as err:
+            for limiter in limiters:
+                limiter.update(err.response)
+            raise
+
+        for limiter in limiters:
+            limiter.update(response)
+        return response
+
+    async def _guarded_fetch(self, request, **kwargs):
+        breaker = self._host_breaker(request.url)
+        if breaker is None:
+            return await self._timed_fetch(request, **kwargs)
+
+        if not breaker.allow():
+            raise CircuitOpenError(f'Circuit of {breaker.name} is open')
+
+        try:
+            response = await self._timed_fetch(request, **kwargs)
+        except HTTPError as err:
+            _record_call(breaker, err.code)
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+
+        _record_call(breaker, response.code)
+        return response
+
+    async def _timed_fetch(self, request, **kwargs):
+        if self._observer is None:
+            return await self._queued_fetch(request, **kwargs)
+
+        self._observer.request_started(request)
+        started = time.monotonic()
+        try:
+            response = await self._queued_fetch(request, **kwargs)
+        except Exception as err:
+            self._observer.request_finished(
+                request, None, time.monotonic() - started, err)
+            raise
+
+        self._observer.request_finished(
+            request, response, time.monotonic() - started)
+        return response
+
+    async def _queued_fetch(self, request, **kwargs):
+        queued_since = time.time()
+        http_client = self._http_client or AsyncHTTPClient()
+        semaphore = self._host_semaphore(request.url)
+        if semaphore is None:
+            return await timed_fetch(http_client, request,
+                                     queued_since, **kwargs)
+
+        async with semaphore:
+            return await timed_fetch(http_client, request,
+                                     queued_since, **kwargs)
+
+    def _host_breaker(self, url):
+        if self._host_circuit_breaker is None:
+            return None
+
+        host = urlsplit(url).netloc
+        if host not in self._host_breakers:
+            self._host_breakers[host] = CircuitBreaker(
+                name=host, **self._host_circuit_breaker)
+        return self._host_breakers[host]
+
+    def _rate_limiters(self, url):
+        if self._rate_limit is None and self._host_rate_limit is None:
+            return ()
+
+        limiters = []
+        if self._host_rate_limit is not None:
+            host = urlsplit(url).netloc
+            if host not in self._host_rate_limiters:
+                self._host_rate_limiters[host] = RateLimiter(
+                    name=host, **self._host_rate_limit)
+            limiters.append(self._host_rate_limiters[host])
+        if self._rate_limit is not None:
+            limiters.append(self._rate_limit)
+        return limiters
+
+    def _host_semaphore(self, url):
+        if not self._max_requests_per_host:
+            return None
+
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(
+                self._max_requests_per_host)
+        return self._host_semaphores[host]
+
+
+def _record_call(breaker, code):
+    if code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _token_key(scope, audience):
+    # only passed when given, so custom token managers keep working
+    token_key = {}
+    if scope is not None:
+        token_key['scope'] = scope
+    if audience is not None:
+        token_key['audience'] = audience
+    return token_key
+
+
+def _key(token_key):
+    return normalize_scope(token_key.get('scope')), token_key.get('audience')
+
+
+def _bearer_token(request):
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith(BEARER_PREFIX):
+        return authorization[len(BEARER_PREFIX):]
+    return None
+
+
+def _final_response(response, stream_guard, raise_error):
+    if stream_guard:
+        stream_guard.release()
+    if response.error and raise_error:
+        raise response.error
+    return response
+
+
+class _StreamGuard:
+    """Wraps the streaming callbacks of a request, holding back the body
+    and headers of responses that may be replayed (401) or retried until
+    ``release`` tells they are the final ones."""
+
+    def __init__(self, request, held_statuses):
+        self._request = request
+        self._held_statuses = held_statuses
+        self._streaming_callback = request.streaming_callback
+        self._header_callback = request.header_callback
+        self._status = None
+        # (callback, header line or chunk) of the held response
+        self._held = []
+        self.delivered = False
+
+    @classmethod
+    def install(cls, request, held_statuses):
+        if request.streaming_callback is None:
+            return None
+
+        guard = cls(request, held_statuses)
+        request.streaming_callback = guard._on_chunk
+        request.header_callback = guard._on_header
+        return guard
+
+    def uninstall(self):
+        self._request.streaming_callback = self._streaming_callback
+        self._request.header_callback = self._header_callback
+
+    def release(self):
+        """Delivers the held response, the final one."""
+        held, self._held = self._held, []
+        for callback, data in held:
+            if callback is self._streaming_callback:
+                self.delivered = True
+            callback(data)
+
+    def _on_header(self, line):
+        if line.startswith('HTTP/'):
+            # another attempt, the held response won't be the final one
+            self._held = []
+            try:
+                self._status = parse_response_start_line(line.strip()).code
+            except HTTPInputError:
+                self._status = None
+
+        if self._header_callback is None:
+            return
+        if self._status in self._held_statuses:
+            self._held.append((self._header_callback, line))
+        else:
+            self._header_callback(line)
+
+    def _on_chunk(self, chunk):
+        if self._status in self._held_statuses:
+            self._held.append((self._streaming_callback, chunk))
+            return
+
+        self.delivered = True
+        self._streaming_callback(chunk)
+
+
+class _BodyGuard:
+    """Wraps the ``body_producer`` of a request, recording whether the body
+    started to be sent."""
+
+    def __init__(self, request):
+        self._request = request
+        self._body_producer = request.body_producer
+        self.started = False
+
+    @classmethod
+    def install(cls, request):
+        if request.body_producer is None:
+            return None
 
-    async def _authorized_fetch(self, request, **kwargs):
-        access_token = await self._token_manager.get_token()
-        request.headers['Authorization'] = f'Bearer {access_token}'
+        guard = cls(request)
+        request.body_producer = guard._produce
+        return guard
 
-        logger.debug('Request: %s %s', request.method, request.url)
-        for header in request.headers:
-            logger.debug('Header %s: %s', header, request.headers[header])
+    def uninstall(self):
+        self._request.body_producer = self._body_producer
 
-        return await self._http_client.fetch(request, **kwargs)
+    def _produce(self, write):
+        self.started = True
+        return self._body_producer(write)
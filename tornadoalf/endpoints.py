@@ -0,0 +1,181 @@
+#
+# encoding: utf-8
+import asyncio
+import logging
+import time
+
+from collections import deque
+
+from tornadoalf.breaker import CLOSED, OPEN, CircuitBreaker
+from tornadoalf.token import TokenCircuitOpenError
+
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointPool:
+    """Token endpoints of the same authorization server, any of them able to
+    issue the tokens.
+
+    Each token request goes to the fastest healthy endpoint, by the moving
+    average (EWMA, weighted by ``ewma_alpha``) of its answered round-trips;
+    endpoints not measured yet come first, and those whose last request
+    failed or whose circuit isn't closed come last. When it fails (a
+    connection error, a 5xx or an invalid response) the request fails over
+    to the next one; a 4xx (e.g. invalid credentials) is returned as is,
+    another endpoint would give the same answer.
+
+    A request still running after the ``hedge_percentile`` of the last
+    ``window_size`` round-trips (``hedge_delay`` seconds until
+    ``min_samples`` are measured) is hedged: the next endpoint is asked too
+    and the first response wins. ``hedge_percentile=None`` disables it.
+
+    Each endpoint has a circuit breaker, created with the
+    ``circuit_breaker`` arguments: while open, the endpoint is skipped.
+    ``TokenCircuitOpenError`` is raised when all of them are open.
+    """
+
+    def __init__(self, urls, hedge_percentile=95, hedge_delay=1,
+                 min_samples=20, window_size=100, ewma_alpha=0.3,
+                 circuit_breaker=None):
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            raise ValueError('No token endpoint')
+
+        self.urls = tuple(urls)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.min_samples = min_samples
+        self.ewma_alpha = ewma_alpha
+        self._latencies = deque(maxlen=window_size)
+        breaker_options = circuit_breaker or {}
+        self._endpoints = [
+            _Endpoint(url, CircuitBreaker(name=url, **breaker_options))
+            for url in self.urls]
+
+    def __repr__(self):
+        return f'EndpointPool({list(self.urls)!r})'
+
+    async def fetch(self, fetch):
+        """Calls the coroutine function ``fetch`` with the URL of an
+        endpoint, hedging and failing over as needed, and returns the first
+        successful result."""
+        candidates = iter(self._candidates())
+        pending = {}
+        error = None
+
+        def start_next():
+            for endpoint in candidates:
+                if endpoint.breaker.allow():
+                    pending[asyncio.ensure_future(
+                        self._timed_fetch(endpoint, fetch))] = endpoint
+                    return True
+            return False
+
+        if not start_next():
+            raise TokenCircuitOpenError(
+                'Every token endpoint circuit is open', None)
+
+        exhausted = False
+        try:
+            while pending:
+                hedge_after = None if exhausted else self._hedge_after()
+                done, _ = await asyncio.wait(
+                    pending, timeout=hedge_after,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    slow = next(iter(pending.values()))
+                    exhausted = not start_next()
+                    if not exhausted:
+                        logger.info('Token endpoint %s is slow, hedging',
+                                    slow.url)
+                    continue
+
+                for task in done:
+                    endpoint = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+
+                    error = task.exception()
+                    if not _is_endpoint_failure(error):
+                        raise error
+                    logger.warning('Token endpoint %s failed: %s',
+                                   endpoint.url, error)
+
+                if not pending:
+                    exhausted = not start_next()
+
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _candidates(self):
+        # the open ones aren't worth a request
+        endpoints = [endpoint for endpoint in self._endpoints
+                     if endpoint.breaker.state != OPEN]
+        return sorted(endpoints, key=lambda endpoint: (
+            endpoint.failed, endpoint.breaker.state != CLOSED,
+            endpoint.ewma or 0))
+
+    def _hedge_after(self):
+        if self.hedge_percentile is None:
+            return None
+        if len(self._latencies) < self.min_samples:
+            return self.hedge_delay
+
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1,
+                    int(len(latencies) * self.hedge_percentile / 100))
+        return latencies[index]
+
+    async def _timed_fetch(self, endpoint, fetch):
+        started = time.monotonic()
+        try:
+            result = await fetch(endpoint.url)
+        except asyncio.CancelledError:
+            # lost a hedge: not a failure, but at least that slow
+            endpoint.record(time.monotonic() - started, self.ewma_alpha)
+            raise
+        except Exception as err:
+            if _is_endpoint_failure(err):
+                # however fast, e.g. a refused connection, not a latency
+                endpoint.failed = True
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.failed = False
+                endpoint.record(time.monotonic() - started, self.ewma_alpha)
+                endpoint.breaker.record_success()
+            raise
+
+        duration = time.monotonic() - started
+        endpoint.failed = False
+        endpoint.record(duration, self.ewma_alpha)
+        endpoint.breaker.record_success()
+        self._latencies.append(duration)
+        return result
+
+
+class _Endpoint:
+
+    __slots__ = ('url', 'breaker', 'ewma', 'failed')
+
+    def __init__(self, url, breaker):
+        self.url = url
+        self.breaker = breaker
+        self.ewma = None
+        # whether the last request failed
+        self.failed = False
+
+    def record(self, duration, alpha):
+        if self.ewma is None:
+            self.ewma = duration
+        else:
+            self.ewma += alpha * (duration - self.ewma)
+
+
+def _is_endpoint_failure(error):
+    """Whether another endpoint could succeed where ``error`` was raised."""
+    code = getattr(getattr(error, 'response', None), 'code', None)
+    return not (code is not None and 400 <= code < 500)
@@ -0,0 +1,54 @@
+#
+# encoding: utf-8
+
+JWT_BEARER = 'urn:ietf:params:oauth:grant-type:jwt-bearer'
+
+
+class Grant:
+    """The authorization grant a ``TokenManager`` exchanges for a token.
+
+    ``data()`` returns the parameters of the token request; the client
+    credentials, ``scope`` and ``audience`` are added by the manager.
+    """
+
+    def data(self):
+        raise NotImplementedError
+
+
+class ClientCredentialsGrant(Grant):
+    """Tokens of the client itself (the default)."""
+
+    def data(self):
+        return {'grant_type': 'client_credentials'}
+
+
+class PasswordGrant(Grant):
+    """Tokens of a user, from their ``username`` and ``password``."""
+
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+
+    def data(self):
+        return {'grant_type': 'password', 'username': self.username,
+                'password': self.password}
+
+    def __repr__(self):
+        return f'PasswordGrant({self.username!r})'
+
+
+class JWTBearerGrant(Grant):
+    """Tokens obtained with a JWT ``assertion`` (RFC 7523).
+
+    ``assertion`` is the JWT or a function returning a new one for each
+    token request, as assertions are short-lived.
+    """
+
+    def __init__(self, assertion):
+        self.assertion = assertion
+
+    def data(self):
+        assertion = self.assertion
+        if callable(assertion):
+            assertion = assertion()
+        return {'grant_type': JWT_BEARER, 'assertion': assertion}
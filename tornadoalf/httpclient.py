@@ -0,0 +1,162 @@
+#
+# encoding: utf-8
+import itertools
+import logging
+import math
+import time
+
+from tornado.httpclient import HTTPClientError, HTTPError
+from tornado.util import import_object
+
+
+REDACTED_HEADERS = frozenset(['authorization', 'proxy-authorization'])
+
+# tornado reports timeouts as HTTP 599
+TIMEOUT = 599
+
+IMPLEMENTATIONS = {
+    'simple': 'tornado.simple_httpclient.SimpleAsyncHTTPClient',
+    'curl': 'tornado.curl_httpclient.CurlAsyncHTTPClient',
+}
+
+
+def make_http_client(options=None):
+    """Creates a dedicated ``AsyncHTTPClient`` (never the IOLoop singleton).
+
+    ``options`` may hold an ``implementation`` (``'simple'``, ``'curl'``,
+    an import path or an ``AsyncHTTPClient`` subclass) and any argument of
+    that implementation's ``initialize``, e.g. ``max_clients`` (the size of
+    its connection pool) or ``defaults``. The curl implementation requires
+    ``pycurl`` and reuses (keeps alive) the connections of its pool.
+    """
+    options = dict(options or {})
+    implementation = options.pop('implementation', 'simple')
+
+    if isinstance(implementation, str):
+        implementation = import_object(
+            IMPLEMENTATIONS.get(implementation, implementation))
+
+    return implementation(force_instance=True, **options)
+
+
+async def timed_fetch(http_client, request, queued_since=None, **kwargs):
+    """Fetches ``request`` recording how long it waited for a connection.
+
+    The wait is stored in ``response.time_info['queue']`` (seconds), as the
+    curl implementation does; ``queued_since`` is the wall time the caller
+    started waiting, to include waits before the http client queue.
+    """
+    queued_since = time.time() if queued_since is None else queued_since
+    try:
+        response = await http_client.fetch(request, **kwargs)
+    except HTTPError as err:
+        _set_queue_time(err.response, queued_since)
+        raise
+
+    _set_queue_time(response, queued_since)
+    return response
+
+
+def _set_queue_time(response, queued_since):
+    time_info = getattr(response, 'time_info', None)
+    start_time = getattr(response, 'start_time', None)
+    if isinstance(time_info, dict) and start_time is not None:
+        time_info['queue'] = max(0, start_time - queued_since)
+
+
+class DeadlineExceededError(HTTPClientError):
+    """A call ran out of the time of its ``Deadline``."""
+
+    def __init__(self, message='Deadline exceeded', response=None):
+        super(DeadlineExceededError, self).__init__(
+            TIMEOUT, message, response)
+
+
+class Deadline:
+    """The time left to complete a call, shared by the token request, the
+    request, its retries and its replay.
+
+    It is measured on the monotonic clock. Between services it travels as
+    the seconds left (e.g. ``X-Request-Timeout: 2.5``), as the clocks of
+    the hosts may differ: ``from_headers`` reads it from an incoming
+    request.
+    """
+
+    def __init__(self, timeout):
+        self._expires_at = time.monotonic() + timeout
+
+    @classmethod
+    def from_headers(cls, headers, header, default=None):
+        """Returns the deadline of a request from its ``header``, or with
+        the ``default`` timeout (``None`` for no deadline) when it has no
+        valid value."""
+        try:
+            timeout = float(headers.get(header, ''))
+        except ValueError:
+            timeout = math.nan
+
+        if not math.isfinite(timeout):
+            return None if default is None else cls(default)
+        return cls(max(0, timeout))
+
+    def remaining(self):
+        return max(0, self._expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self._expires_at
+
+    def apply(self, request, header=None):
+        """Reduces the timeouts of ``request`` to the time left, and puts
+        it in its ``header`` when given."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError()
+
+        if request.connect_timeout is None or (
+                request.connect_timeout > remaining):
+            request.connect_timeout = remaining
+        if request.request_timeout is None or (
+                request.request_timeout > remaining):
+            request.request_timeout = remaining
+        if header is not None:
+            request.headers[header] = f'{remaining:.3f}'
+
+
+class RequestLogger:
+    """Logs a single DEBUG record per request, with its credentials
+    redacted.
+
+    Nothing is done unless ``logger`` is enabled for DEBUG. With
+    ``sampling=N`` only one in N requests is logged. The record carries
+    ``http_method``, ``http_url`` and ``http_headers`` attributes for
+    structured log handlers.
+    """
+
+    def __init__(self, logger, sampling=1):
+        self._logger = logger
+        self._sampling = sampling
+        self._counter = itertools.count()
+
+    def log(self, request):
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        if self._sampling > 1 and next(self._counter) % self._sampling:
+            return
+
+        headers = redacted_headers(request.headers)
+        self._logger.debug(
+            'Request: %s %s %s', request.method, request.url, headers,
+            extra={'http_method': request.method, 'http_url': request.url,
+                   'http_headers': headers})
+
+
+def redacted_headers(headers):
+    """Returns ``headers`` as a dict hiding the credentials, keeping only
+    the authorization scheme (e.g. ``Bearer ***``)."""
+    redacted = {}
+    for name, value in headers.items():
+        if name.lower() in REDACTED_HEADERS:
+            scheme, _, credentials = value.partition(' ')
+            value = f'{scheme} ***' if credentials else '***'
+        redacted[name] = value
+    return redacted
@@ -1,63 +1,622 @@
+import asyncio
 import json
 import logging
+import random
+import time
 
 from base64 import b64encode
-from tornadoalf.token import Token, TokenError, TokenHTTPError
+from collections import OrderedDict
+from tornadoalf.endpoints import EndpointPool
+from tornadoalf.grants import ClientCredentialsGrant
+from tornadoalf.store import MemoryTokenStore
+from tornadoalf.token import (
+    Token, TokenCircuitOpenError, TokenError, TokenHTTPError, jwt_claims,
+    parse_token_data)
+from tornado import gen
 from tornado.httpclient import AsyncHTTPClient, HTTPRequest, HTTPError
+from tornadoalf.httpclient import RequestLogger
+from tornado.ioloop import IOLoop
 
 from urllib.parse import urlencode
 
 
 logger = logging.getLogger(__name__)
+request_logger = RequestLogger(logger)
+
+MAX_REFRESH_RETRY_DELAY = 60
+DEFAULT_EXPIRES_IN = 3600
 
 
 class TokenManager:
+    """Requests, caches and renews the access token of a client.
+
+    With ``refresh_ratio`` set (e.g. ``0.8``), the token is renewed in
+    background once that fraction of its ``expires_in`` has elapsed,
+    minus a random ``refresh_jitter`` fraction and never later than
+    ``refresh_skew`` seconds before it expires. The current token keeps
+    being served while the new one is requested; failed renewals are
+    retried with exponential backoff starting at ``refresh_retry_delay``
+    seconds while the current token is still valid. A token not requested
+    since its last background renewal is then only renewed on demand.
+
+    Tokens are kept in ``token_store`` (a ``MemoryTokenStore`` by default);
+    a shared store such as ``FileTokenStore`` lets several processes reuse
+    one token and one refresh. Tokens are requested through ``http_client``,
+    by default the ``AsyncHTTPClient`` of the IOLoop running the request,
+    which is borrowed and never closed by the manager, retried according to
+    ``retry_policy`` (a ``tornadoalf.retry.RetryPolicy``). With a
+    ``circuit_breaker`` (a ``tornadoalf.breaker.CircuitBreaker``), token
+    requests fail fast with ``TokenCircuitOpenError`` while the endpoint is
+    failing, and a still valid token keeps being used. An ``observer``
+    (a ``tornadoalf.metrics.Observer``) receives the token events.
+
+    ``scope`` (a space separated string or a list) and ``audience`` are
+    requested with the token. Tokens of other scopes and audiences, asked
+    by ``get_token(scope=..., audience=...)``, are cached too, up to
+    ``max_scoped_tokens`` of them, evicting expired tokens first and then
+    the least recently used, from the ``token_store`` as well.
+
+    Tokens are considered expired ``expiry_skew`` seconds before they
+    actually expire, so they aren't sent about to expire.
+
+    With ``jwt_expiry``, the expiration of JWT access tokens is read from
+    their ``exp`` claim rather than from ``expires_in``. With an
+    ``introspection_endpoint`` (RFC 7662), the token is checked at most
+    every ``introspection_interval`` seconds before being returned, and
+    replaced when it is no longer active (e.g. revoked).
+
+    Token responses are validated: one without an ``access_token`` raises
+    ``TokenError``, and a missing ``expires_in`` means
+    ``default_expires_in`` seconds. Once a token was requested again
+    within ``min_refresh_interval`` seconds (e.g. after a 401), the next
+    requests are spaced by that interval, so tokens rejected or expiring
+    right away can't flood the token endpoint.
+
+    Invalid ``client_id`` or ``client_secret`` (e.g. ``None``) raise
+    ``TokenError`` when the manager is created.
+
+    Tokens are obtained with ``grant`` (a ``tornadoalf.grants.Grant``),
+    ``ClientCredentialsGrant`` by default. When the token has a
+    ``refresh_token`` it is renewed with the ``refresh_token`` grant, unless
+    ``use_refresh_token=False``, falling back to ``grant`` if that fails.
+
+    ``token_endpoint`` may be a list of URLs of the same authorization
+    server (or an ``EndpointPool``), created with the
+    ``token_endpoint_options`` arguments: tokens are requested from the
+    fastest healthy one, failing over to the others and hedging slow
+    requests. The managers of other scopes share its health and latencies.
+
+    A manager is bound to the event loop it is first used on; each loop
+    (e.g. one per thread) needs its own manager. ``aclose()``, or leaving
+    an ``async with`` block, stops the background renewal and cancels the
+    token requests in flight.
+    """
 
     def __init__(self, token_endpoint, client_id,
-                 client_secret, http_options=None):
+                 client_secret, http_options=None,
+                 refresh_ratio=None, refresh_jitter=0.1,
+                 refresh_skew=5, refresh_retry_delay=1, token_store=None,
+                 http_client=None, retry_policy=None, circuit_breaker=None,
+                 observer=None, scope=None, audience=None,
+                 max_scoped_tokens=100, expiry_skew=0, jwt_expiry=False,
+                 introspection_endpoint=None, introspection_interval=60,
+                 default_expires_in=DEFAULT_EXPIRES_IN,
+                 min_refresh_interval=1, grant=None, use_refresh_token=True,
+                 token_endpoint_options=None):
 
+        # fails on bad credentials now rather than on the first request
+        self._basic_authorization = basic_authorization(
+            client_id, client_secret)
+        self._endpoint_pool = None
+        if isinstance(token_endpoint, (list, tuple)):
+            token_endpoint = EndpointPool(
+                token_endpoint, **(token_endpoint_options or {}))
+        if isinstance(token_endpoint, EndpointPool):
+            self._endpoint_pool = token_endpoint
+            # names the tokens in the store
+            token_endpoint = token_endpoint.urls[0]
         self._token_endpoint = token_endpoint
         self._client_id = client_id
         self._client_secret = client_secret
+        self._scope = normalize_scope(scope)
+        self._audience = audience
+        self._max_scoped_tokens = max_scoped_tokens
+        self._expiry_skew = expiry_skew
+        self._jwt_expiry = jwt_expiry
+        self._introspection_endpoint = introspection_endpoint
+        self._introspection_interval = introspection_interval
+        # (access token, monotonic time) of the last introspection
+        self._introspected = None
+        self._introspecting = None
+        self._default_expires_in = default_expires_in
+        self._min_refresh_interval = min_refresh_interval
+        self._last_token_request = None
+        self._rapid_token_request = False
+        self._grant = grant or ClientCredentialsGrant()
+        self._use_refresh_token = use_refresh_token
+        # (scope, audience) -> TokenManager, least recently used first
+        self._scoped_managers = OrderedDict()
+        # deletions from the store of the evicted scoped tokens
+        self._deleting = set()
         self._token = None
+        self._token_store = token_store or MemoryTokenStore()
+        self._refreshing = None
+        self._refresh_ratio = refresh_ratio
+        self._refresh_jitter = refresh_jitter
+        self._refresh_skew = refresh_skew
+        self._refresh_retry_delay = refresh_retry_delay
+        self._refresh_failures = 0
+        self._refresh_timeout = None
+        self._background_refresh = None
+        self._closed = False
+        # monotonic times of the last get_token and background renewal
+        self._last_used = 0
+        self._renewed_at = 0
+        self._loop = None
+        self._io_loop = None
         self._http_options = http_options if http_options else {}
-        self._http_client = AsyncHTTPClient()
+        self._http_client = http_client
+        self._retry_policy = retry_policy
+        self._circuit_breaker = circuit_breaker
+        self._observer = observer
+
+    @property
+    def last_used(self):
+        """The monotonic time ``get_token`` last returned, 0 if never."""
+        return self._last_used
 
     def _has_token(self):
         return self._token and self._token.is_valid()
 
-    async def get_token(self):
+    async def get_token(self, scope=None, audience=None):
+        if scope is not None or audience is not None:
+            manager = self._scoped_manager(scope, audience)
+            if manager is not self:
+                return await manager.get_token()
+
         if not self._has_token():
-            await self._update_token()
+            if self._observer is None:
+                await self._update_token()
+            else:
+                started = time.monotonic()
+                await self._update_token()
+                self._observer.token_acquired(
+                    False, time.monotonic() - started)
+        elif self._observer is not None:
+            self._observer.token_acquired(True, 0)
+
+        if (self._introspection_endpoint is not None and
+                not self._is_introspected()):
+            await self._introspect_token()
+
+        self._last_used = time.monotonic()
         return self._token.access_token
 
-    def reset_token(self):
+    async def get_authorization(self, scope=None, audience=None):
+        """Like ``get_token``, but returns the ``Authorization`` header
+        sending the token (``Bearer <token>``)."""
+        manager = self
+        if scope is not None or audience is not None:
+            manager = self._scoped_manager(scope, audience)
+
+        # a cache hit needing neither events nor introspection
+        token = manager._token
+        if (token is not None and token.is_valid() and
+                manager._observer is None and
+                manager._introspection_endpoint is None):
+            manager._last_used = time.monotonic()
+            return token.authorization
+
+        await manager.get_token()
+        return manager._token.authorization
+
+    async def reset_token(self, rejected_token=None, scope=None,
+                          audience=None):
+        """Renews the token after the resource server refused it.
+
+        When ``rejected_token`` is given and the current token is a
+        different, still valid one, another coroutine has already renewed
+        it and no new request is made.
+        """
+        if scope is not None or audience is not None:
+            manager = self._scoped_manager(scope, audience)
+            if manager is not self:
+                return await manager.reset_token(rejected_token)
+
+        if (rejected_token is not None and self._has_token() and
+                self._token.access_token != rejected_token):
+            return
+
         logger.info(
             'Token for client id: %s was expired, requesting another token',
             self._client_id,
         )
-        return self._update_token()
+        try:
+            await self._update_token()
+        except TokenCircuitOpenError:
+            if not self._has_token():
+                raise
+            # keeps using the current token until the endpoint recovers
+
+    def _scoped_manager(self, scope, audience):
+        scope = self._scope if scope is None else normalize_scope(scope)
+        audience = self._audience if audience is None else audience
+        if scope == self._scope and audience == self._audience:
+            return self
+
+        key = (scope, audience)
+        manager = self._scoped_managers.pop(key, None)
+        if manager is None:
+            self._evict_scoped_managers()
+            manager = self._scoped_copy(scope, audience)
+
+        self._scoped_managers[key] = manager
+        return manager
+
+    def _scoped_copy(self, scope, audience):
+        return type(self)(
+            self._endpoint_pool or self._token_endpoint, self._client_id,
+            self._client_secret,
+            http_options=self._http_options,
+            refresh_ratio=self._refresh_ratio,
+            refresh_jitter=self._refresh_jitter,
+            refresh_skew=self._refresh_skew,
+            refresh_retry_delay=self._refresh_retry_delay,
+            token_store=self._token_store, http_client=self._http_client,
+            retry_policy=self._retry_policy,
+            circuit_breaker=self._circuit_breaker, observer=self._observer,
+            scope=scope, audience=audience, max_scoped_tokens=0,
+            expiry_skew=self._expiry_skew, jwt_expiry=self._jwt_expiry,
+            introspection_endpoint=self._introspection_endpoint,
+            introspection_interval=self._introspection_interval,
+            default_expires_in=self._default_expires_in,
+            min_refresh_interval=self._min_refresh_interval,
+            grant=self._grant, use_refresh_token=self._use_refresh_token)
+
+    def _evict_scoped_managers(self):
+        managers = self._scoped_managers
+        if len(managers) < self._max_scoped_tokens:
+            return
+
+        # never one requesting a token, its callers are waiting for it
+        idle = [key for key, manager in managers.items()
+                if manager._refreshing is None and
+                manager._introspecting is None]
+        # expired tokens first, then the least recently used
+        expired = [key for key in idle if not managers[key]._has_token()]
+        for key in expired or idle[:1]:
+            manager = managers.pop(key)
+            manager.close()
+            # the store would keep every scope ever requested otherwise
+            deleting = asyncio.ensure_future(manager._delete_stored_token())
+            self._deleting.add(deleting)
+            deleting.add_done_callback(self._deleting.discard)
+            if len(managers) < self._max_scoped_tokens:
+                return
+
+    async def _delete_stored_token(self):
+        key = self._store_key()
+        try:
+            await self._token_store.delete(key)
+        except Exception as err:
+            logger.warning('Could not delete the stored token %s: %s',
+                           key, err)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
     async def _update_token(self):
-        token_data = await self._get_token_data()
-        self._token = Token(token_data.get('access_token', ''),
-                            token_data.get('expires_in', 0))
+        self._check_loop()
 
-    async def _get_token_data(self):
-        token_data = await self._request_token()
+        # Single-flight: every coroutine that needs a new token while a
+        # request is already in flight waits for that same request
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh_token())
+            self._refreshing.add_done_callback(self._refresh_done)
+
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh_token(self):
+        key = self._store_key()
+        async with self._token_store.lock(key):
+            # another manager sharing the store may have renewed it
+            token = await self._token_store.get(key)
+            if token is not None:
+                token.skew = self._expiry_skew
+
+            if not self._is_renewed(token):
+                await self._throttle_token_requests()
+                token_data = await self._guarded_token_data(
+                    token if token is not None else self._token)
+                token = self._make_token(token_data)
+                # a token just issued needs no introspection
+                self._introspected = (token.access_token, time.monotonic())
+                await self._token_store.set(key, token)
+
+        self._token = token
+
+        if self._refresh_ratio:
+            self._refresh_failures = 0
+            self._schedule_refresh(self._refresh_delay(
+                token._expires_in, token._expires_in - token.ttl()))
+
+    async def _throttle_token_requests(self):
+        last_request = self._last_token_request
+        wait = 0
+        if last_request is not None:
+            wait = (last_request + self._min_refresh_interval -
+                    time.monotonic())
+
+        # a single early request is let through, e.g. after a 401
+        rapid, self._rapid_token_request = (
+            self._rapid_token_request, wait > 0)
+        if wait > 0 and rapid:
+            logger.warning(
+                'Token for client id: %s requested again too soon, '
+                'waiting %.3fs', self._client_id, wait)
+            await gen.sleep(wait)
+
+        self._last_token_request = time.monotonic()
+
+    def _make_token(self, token_data):
+        access_token = token_data['access_token']
+        expires_in = token_data['expires_in']
+        if self._jwt_expiry:
+            expires_in = self._jwt_expires_in(access_token, expires_in)
+        return Token(access_token, expires_in, self._expiry_skew,
+                     token_data['token_type'], token_data['refresh_token'])
+
+    def _jwt_expires_in(self, access_token, expires_in):
+        claims = jwt_claims(access_token)
+        if claims is None:
+            return expires_in
+
+        now = time.time()
+        not_before = claims.get('nbf')
+        if _is_timestamp(not_before) and not_before > now:
+            logger.warning(
+                'Token for client id: %s is not valid before %ss, '
+                'the clocks may be out of sync', self._client_id,
+                not_before - now)
+
+        expires_on = claims.get('exp')
+        if not _is_timestamp(expires_on):
+            return expires_in
+        return expires_on - now
+
+    def _is_introspected(self):
+        return (self._introspected is not None and
+                self._introspected[0] == self._token.access_token and
+                time.monotonic() - self._introspected[1] <
+                self._introspection_interval)
+
+    async def _introspect_token(self):
+        # coalesced like the token requests
+        if self._introspecting is None:
+            self._introspecting = asyncio.ensure_future(
+                self._check_token(self._token))
+            self._introspecting.add_done_callback(self._introspection_done)
+
+        await asyncio.shield(self._introspecting)
+
+    def _introspection_done(self, future):
+        self._introspecting = None
+        if not future.cancelled():
+            # marks the exception as retrieved when every waiter is gone
+            future.exception()
+
+    async def _check_token(self, token):
+        try:
+            token_info = await self._fetch(
+                url=self._introspection_endpoint,
+                method='POST',
+                auth=(self._client_id, self._client_secret),
+                data={'token': token.access_token,
+                      'token_type_hint': 'access_token'})
+        except Exception as err:
+            # trusts the token until the next check rather than blocking
+            # every request on the introspection endpoint
+            logger.warning(
+                'Could not introspect the token of client id: %s, '
+                'error: %s', self._client_id, err)
+            token_info = {'active': True}
+
+        self._introspected = (token.access_token, time.monotonic())
+        if not token_info.get('active'):
+            logger.info('Token for client id: %s is no longer active',
+                        self._client_id)
+            await self.reset_token(token.access_token)
+
+    def _store_key(self):
+        key = f'{self._token_endpoint}:{self._client_id}'
+        if self._scope is not None:
+            key = f'{key}:{self._scope}'
+        if self._audience is not None:
+            key = f'{key}@{self._audience}'
+        return key
+
+    def _is_renewed(self, token):
+        return (token is not None and token.is_valid() and
+                (self._token is None or
+                 token.access_token != self._token.access_token))
+
+    def _refresh_done(self, future):
+        self._refreshing = None
+        if future.cancelled():
+            return
+
+        # marks the exception as retrieved when every waiter is gone
+        error = future.exception()
+        if error is not None and self._observer is not None:
+            self._observer.token_refresh_failed(error)
+
+    def close(self):
+        """Stops the background token renewal and cancels the token
+        requests in flight."""
+        self._cancel()
+
+    async def aclose(self):
+        """Like ``close``, waiting for the cancelled work to finish."""
+        tasks = self._cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _cancel(self):
+        tasks = []
+        while self._scoped_managers:
+            tasks.extend(self._scoped_managers.popitem()[1]._cancel())
+
+        self._closed = True
+        self._cancel_scheduled_refresh()
+        for task in (self._background_refresh, self._refreshing,
+                     self._introspecting):
+            if task is not None and not task.done():
+                task.cancel()
+                tasks.append(task)
+        self._background_refresh = None
+        return tasks
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        elif self._loop is not loop:
+            raise RuntimeError(
+                'TokenManager is bound to another event loop, '
+                'create one per loop')
+
+    def _refresh_delay(self, expires_in, elapsed=0):
+        delay = expires_in * self._refresh_ratio
+        delay -= delay * random.uniform(0, self._refresh_jitter)
+        return max(0, min(delay, expires_in - self._refresh_skew) - elapsed)
+
+    def _schedule_refresh(self, delay):
+        self._cancel_scheduled_refresh()
+        if self._closed:
+            return
+
+        self._io_loop = IOLoop.current()
+        self._refresh_timeout = self._io_loop.call_later(
+            delay, self._start_background_refresh)
+
+    def _cancel_scheduled_refresh(self):
+        if self._refresh_timeout is not None:
+            self._io_loop.remove_timeout(self._refresh_timeout)
+            self._refresh_timeout = None
+
+    def _start_background_refresh(self):
+        self._refresh_timeout = None
+        if self._last_used < self._renewed_at:
+            # not requested since the last renewal, e.g. its clients are gone
+            return
+
+        self._background_refresh = asyncio.ensure_future(
+            self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await self._update_token()
+            self._renewed_at = time.monotonic()
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            if not self._has_token():
+                # the next get_token will request it on demand
+                logger.warning(
+                    'Background token refresh for client id: %s failed '
+                    'and the token has expired, error: %s',
+                    self._client_id, err)
+                return
+
+            delay = min(
+                self._refresh_retry_delay * 2 ** self._refresh_failures,
+                MAX_REFRESH_RETRY_DELAY)
+            self._refresh_failures += 1
+            logger.warning(
+                'Background token refresh for client id: %s failed, '
+                'retrying in %ss, error: %s', self._client_id, delay, err)
+            self._schedule_refresh(delay)
+        finally:
+            self._background_refresh = None
+
+    async def _guarded_token_data(self, token=None):
+        breaker = self._circuit_breaker
+        if breaker is None and self._observer is None:
+            return await self._get_token_data(token)
+
+        if breaker is not None and not breaker.allow():
+            raise TokenCircuitOpenError(
+                'Token endpoint circuit is open', None)
+
+        started = time.monotonic()
+        try:
+            token_data = await self._get_token_data(token)
+        except Exception as err:
+            if breaker is not None:
+                breaker.record_failure()
+            if self._observer is not None:
+                self._observer.token_requested(
+                    time.monotonic() - started, err)
+            raise
+
+        if breaker is not None:
+            breaker.record_success()
+        if self._observer is not None:
+            self._observer.token_requested(time.monotonic() - started)
         return token_data
 
-    async def _request_token(self):
+    async def _get_token_data(self, token=None):
+        """Requests a token renewing ``token``, with its refresh token
+        when it has one."""
+        refresh_token = getattr(token, 'refresh_token', None)
+        if refresh_token is not None and self._use_refresh_token:
+            try:
+                token_data = parse_token_data(
+                    await self._request_token(refresh_token),
+                    self._default_expires_in)
+            except TokenError as err:
+                logger.warning(
+                    'Could not refresh the token of client id: %s, '
+                    'requesting a new one, error: %s', self._client_id, err)
+            else:
+                # the refresh token stays valid unless a new one is issued
+                if token_data['refresh_token'] is None:
+                    token_data['refresh_token'] = refresh_token
+                return token_data
+
+        token_data = await self._request_token()
+        return parse_token_data(token_data, self._default_expires_in)
+
+    async def _request_token(self, refresh_token=None):
         if not self._token_endpoint:
-            raise TokenError('Missing token endpoint')
+            raise TokenError('Missing token endpoint', None)
 
         logger.info('Requesting token for client id: %s', self._client_id)
 
+        if refresh_token is not None:
+            data = {'grant_type': 'refresh_token',
+                    'refresh_token': refresh_token}
+        else:
+            data = self._grant.data()
+        if self._scope is not None:
+            data['scope'] = self._scope
+        if self._audience is not None:
+            data['audience'] = self._audience
+
+        if self._endpoint_pool is not None:
+            return await self._endpoint_pool.fetch(
+                lambda url: self._fetch(
+                    url=url, method='POST',
+                    auth=(self._client_id, self._client_secret), data=data))
+
         token_data = await self._fetch(
             url=self._token_endpoint,
             method="POST",
             auth=(self._client_id, self._client_secret),
-            data={'grant_type': 'client_credentials'}
+            data=data
         )
 
         return token_data
@@ -73,25 +632,27 @@ class TokenManager:
             body=data
         )
 
-        if auth is not None:
-            try:
-                passhash = b64encode(':'.join(auth).encode('ascii'))
-            except TypeError as e:
-                raise TokenError(
-                    'Missing credentials (client_id:client_secret)', str(e)
-                ) from TypeError
-
-            request_data['headers']['Authorization'] = f"Basic {passhash.decode('utf-8')}"
+        if auth == (self._client_id, self._client_secret):
+            # encoded once, when created
+            request_data['headers']['Authorization'] = (
+                self._basic_authorization)
+        elif auth is not None:
+            request_data['headers']['Authorization'] = basic_authorization(
+                *auth)
 
         request_data.update(self._http_options)
         request = HTTPRequest(**request_data)
 
-        logger.debug('Request: %s %s', request.method, request.url)
-        for header in request.headers:
-            logger.debug('Header %s: %s', header, request.headers[header])
+        request_logger.log(request)
 
+        http_client = self._http_client or AsyncHTTPClient()
         try:
-            response = await self._http_client.fetch(request)
+            if self._retry_policy is None:
+                response = await http_client.fetch(request)
+            else:
+                # token requests are safe to retry whatever their method
+                response = await self._retry_policy.execute(
+                    lambda: http_client.fetch(request))
         except HTTPError as http_err:
             err = TokenHTTPError('Failed to request token', http_err.response)
             logger.error(
@@ -99,4 +660,42 @@ class TokenManager:
                 self._client_id, err)
             raise err from HTTPError
 
-        return json.loads(response.body.decode("utf-8"))
+        try:
+            return json.loads(response.body)
+        except ValueError:
+            err = TokenHTTPError('Invalid JSON response', response)
+            logger.error(
+                'Could not request a token for client id: %s, error: %s',
+                self._client_id, err)
+            raise err from None
+
+
+def basic_authorization(client_id, client_secret):
+    """Returns the ``Authorization`` header of the client credentials."""
+    if not (isinstance(client_id, str) and isinstance(client_secret, str)):
+        raise TokenError(
+            'Missing credentials (client_id:client_secret)', None)
+    try:
+        credentials = b64encode(
+            f'{client_id}:{client_secret}'.encode('ascii'))
+    except UnicodeEncodeError as err:
+        raise TokenError(
+            'Invalid credentials (client_id:client_secret)', str(err)
+        ) from None
+
+    return f"Basic {credentials.decode('ascii')}"
+
+
+def _is_timestamp(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def normalize_scope(scope):
+    """Returns ``scope`` (a space separated string or an iterable) as a
+    string with its sorted, unique values, or ``None`` when empty."""
+    if scope is None:
+        return None
+    if isinstance(scope, str):
+        scope = scope.split()
+
+    return ' '.join(sorted(set(scope))) or None
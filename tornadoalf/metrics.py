@@ -0,0 +1,195 @@
+#
+# encoding: utf-8
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+
+
+class Observer:
+    """Receives the events of a ``Client`` and its ``TokenManager``.
+
+    Every method does nothing; subclasses override the events they need.
+    Durations are in seconds. Without an observer (the default) the events
+    aren't even timed.
+    """
+
+    def token_acquired(self, hit, duration):
+        """``get_token`` returned, from the cache (``hit``) or after
+        waiting for a new token."""
+
+    def token_requested(self, duration, error=None):
+        """A round-trip to the token endpoint finished."""
+
+    def token_refresh_failed(self, error):
+        """A token could not be renewed."""
+
+    def request_started(self, request):
+        """A request is about to be sent (each attempt)."""
+
+    def request_finished(self, request, response, duration, error=None):
+        """A request attempt finished; ``response`` is ``None`` when it
+        raised ``error``."""
+
+    def request_replayed(self, request):
+        """A request got a 401 and is replayed with a new token."""
+
+
+class Counter:
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = (
+                self._values.get(labelvalues, 0) + amount)
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        for labelvalues, value in sorted(self._values.items()):
+            yield self.name, self._labels(labelvalues), value
+
+    def _labels(self, labelvalues, **extra):
+        return list(zip(self.labelnames, labelvalues)) + list(extra.items())
+
+
+class Gauge(Counter):
+
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(Counter):
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            if labelvalues not in self._values:
+                # a count per bucket, the sum and the total count
+                self._values[labelvalues] = [
+                    [0] * len(self.buckets), 0.0, 0]
+            counts, _, _ = histogram = self._values[labelvalues]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def count(self, *labelvalues):
+        return self._values.get(labelvalues, (None, 0, 0))[2]
+
+    def sum(self, *labelvalues):
+        return self._values.get(labelvalues, (None, 0, 0))[1]
+
+    def samples(self):
+        for labelvalues, (counts, total, count) in sorted(
+                self._values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield (self.name + '_bucket',
+                       self._labels(labelvalues, le=repr(float(bound))),
+                       bucket_count)
+            yield (self.name + '_bucket',
+                   self._labels(labelvalues, le='+Inf'), count)
+            yield self.name + '_sum', self._labels(labelvalues), total
+            yield self.name + '_count', self._labels(labelvalues), count
+
+
+class MetricsObserver(Observer):
+    """Keeps Prometheus-style metrics of the events in the process.
+
+    ``render()`` returns them in the Prometheus text exposition format, to
+    be served by a handler of the application.
+    """
+
+    def __init__(self, prefix='alf', buckets=DEFAULT_BUCKETS):
+        self.token_cache = Counter(
+            f'{prefix}_token_cache_total',
+            'get_token calls by cache result', ['result'])
+        self.get_token_seconds = Histogram(
+            f'{prefix}_get_token_seconds',
+            'Time waiting for a token on cache misses', buckets=buckets)
+        self.token_request_seconds = Histogram(
+            f'{prefix}_token_request_seconds',
+            'Token endpoint round-trips', ['outcome'], buckets=buckets)
+        self.token_refresh_failures = Counter(
+            f'{prefix}_token_refresh_failures_total',
+            'Token renewals that failed')
+        self.request_seconds = Histogram(
+            f'{prefix}_request_seconds',
+            'Request attempts by status code', ['code'], buckets=buckets)
+        self.request_queue_seconds = Histogram(
+            f'{prefix}_request_queue_seconds',
+            'Time requests waited for a connection', buckets=buckets)
+        self.requests_in_flight = Gauge(
+            f'{prefix}_requests_in_flight', 'Requests being sent')
+        self.request_replays = Counter(
+            f'{prefix}_request_replays_total',
+            'Requests replayed after a 401')
+
+    @property
+    def metrics(self):
+        return [self.token_cache, self.get_token_seconds,
+                self.token_request_seconds, self.token_refresh_failures,
+                self.request_seconds, self.request_queue_seconds,
+                self.requests_in_flight, self.request_replays]
+
+    def token_acquired(self, hit, duration):
+        self.token_cache.inc('hit' if hit else 'miss')
+        if not hit:
+            self.get_token_seconds.observe(duration)
+
+    def token_requested(self, duration, error=None):
+        outcome = 'success' if error is None else 'error'
+        self.token_request_seconds.observe(duration, outcome)
+
+    def token_refresh_failed(self, error):
+        self.token_refresh_failures.inc()
+
+    def request_started(self, request):
+        self.requests_in_flight.inc()
+
+    def request_finished(self, request, response, duration, error=None):
+        self.requests_in_flight.dec()
+        if response is None:
+            response = getattr(error, 'response', None)
+
+        code = getattr(response, 'code', None) or getattr(error, 'code', 0)
+        self.request_seconds.observe(duration, str(code))
+
+        time_info = getattr(response, 'time_info', None) or {}
+        if 'queue' in time_info:
+            self.request_queue_seconds.observe(time_info['queue'])
+
+    def request_replayed(self, request):
+        self.request_replays.inc()
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    rendered = ','.join(
+                        f'{label}="{label_value}"'
+                        for label, label_value in labels)
+                    name = f'{name}{{{rendered}}}'
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
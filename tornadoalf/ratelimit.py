@@ -0,0 +1,162 @@
+#
+# encoding: utf-8
+import logging
+import time
+
+from tornado import gen
+from tornadoalf.retry import retry_after
+
+
+logger = logging.getLogger(__name__)
+
+TOO_MANY_REQUESTS = 429
+QUOTA_HEADERS = (('X-RateLimit-Remaining', 'X-RateLimit-Reset'),
+                 ('RateLimit-Remaining', 'RateLimit-Reset'))
+# larger resets are epoch timestamps (e.g. GitHub), smaller ones seconds
+EPOCH_RESET = 10 ** 9
+
+
+class RateLimitError(Exception):
+    """Raised instead of sending a request that would wait for its rate
+    limiter longer than allowed."""
+
+
+class RateLimiter:
+    """A token bucket admitting ``rate`` requests per second on average,
+    in bursts of up to ``burst`` requests.
+
+    Callers ``await acquire()`` before each request: it returns at once
+    while the bucket has tokens, and otherwise waits for its turn, first
+    come first served. A call that would wait more than ``max_wait``
+    seconds raises ``RateLimitError`` right away instead, so latency stays
+    bounded when the demand exceeds the rate.
+
+    ``update(response)`` adapts it to the quota the server tells: a 429
+    pauses it for its ``Retry-After`` (``backoff`` seconds without one),
+    and ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` (or the
+    ``RateLimit-*`` headers) spread the remaining requests until the quota
+    resets, pausing it when none are left.
+    """
+
+    def __init__(self, rate, burst=None, max_wait=None, backoff=1, name=''):
+        self.rate = rate
+        self.burst = max(1, rate) if burst is None else burst
+        self.max_wait = max_wait
+        self.backoff = backoff
+        self.name = name
+        # negative while requests are waiting for their turn
+        self._tokens = self.burst
+        # tokens are refilled from this monotonic time, later when paused
+        self._refilled_at = time.monotonic()
+        # the rate told by the server, until its quota resets
+        self._quota_rate = None
+        self._quota_until = 0
+
+    async def acquire(self, max_wait=None):
+        """Waits for the turn of a request. ``max_wait`` overrides the one
+        of the limiter (e.g. with the time left to a deadline)."""
+        await acquire_all([self], max_wait)
+
+    def update(self, response):
+        """Adapts the limiter to the rate limit headers of ``response``."""
+        headers = getattr(response, 'headers', None)
+        if headers is None:
+            return
+
+        if response.code == TOO_MANY_REQUESTS:
+            delay = retry_after(response)
+            self.pause(self.backoff if delay is None else delay)
+            return
+
+        for remaining_header, reset_header in QUOTA_HEADERS:
+            if remaining_header in headers:
+                self._update_quota(headers.get(remaining_header),
+                                   headers.get(reset_header))
+                return
+
+    def pause(self, seconds):
+        """Admits no request for ``seconds``."""
+        logger.warning('Rate limit %s paused for %.3fs', self.name, seconds)
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, 0)
+        self._refilled_at = max(self._refilled_at, now + seconds)
+
+    def _max_wait(self, max_wait):
+        if max_wait is None or (
+                self.max_wait is not None and self.max_wait < max_wait):
+            return self.max_wait
+        return max_wait
+
+    def _reserve(self, max_wait):
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0, self._refilled_at - now) + max(
+            0, (1 - self._tokens) / self._rate(now))
+        if max_wait is not None and wait > max_wait:
+            raise RateLimitError(
+                f'Rate limit {self.name} exceeded, a request would wait '
+                f'{wait:.3f}s')
+
+        self._tokens -= 1
+        return wait
+
+    def _refill(self, now):
+        if now > self._refilled_at:
+            self._tokens = min(self.burst, self._tokens + (
+                now - self._refilled_at) * self._rate(now))
+            self._refilled_at = now
+
+    def _rate(self, now):
+        if self._quota_rate is not None and now < self._quota_until:
+            return self._quota_rate
+        return self.rate
+
+    def _update_quota(self, remaining, reset):
+        try:
+            remaining = int(remaining)
+            reset = float(reset)
+        except (TypeError, ValueError):
+            return
+
+        if reset > EPOCH_RESET:
+            reset -= time.time()
+        if reset <= 0:
+            return
+
+        if remaining <= 0:
+            self.pause(reset)
+            return
+
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens = min(self._tokens, remaining)
+        self._quota_rate = min(self.rate, remaining / reset)
+        self._quota_until = now + reset
+
+
+async def acquire_all(limiters, max_wait=None):
+    """Waits for the turn of a request in each of ``limiters``, taking it
+    from all of them or none: when one raises ``RateLimitError`` the turns
+    already reserved in the others are given back. ``max_wait`` is as in
+    ``RateLimiter.acquire``."""
+    reserved = []
+    try:
+        wait = 0
+        for limiter in limiters:
+            wait = max(wait, limiter._reserve(limiter._max_wait(max_wait)))
+            reserved.append(limiter)
+        if wait <= 0:
+            return
+
+        await gen.sleep(wait)
+        # paused meanwhile, e.g. by a 429
+        paused = max(limiter._refilled_at for limiter in limiters)
+        while paused > time.monotonic():
+            await gen.sleep(paused - time.monotonic())
+            paused = max(limiter._refilled_at for limiter in limiters)
+    except BaseException:
+        # gives the turns back, e.g. cancelled
+        for limiter in reserved:
+            limiter._tokens += 1
+        raise
@@ -0,0 +1,150 @@
+#
+# encoding: utf-8
+import hashlib
+import logging
+import time
+
+from collections import OrderedDict
+
+from tornadoalf.client import Client
+from tornadoalf.httpclient import make_http_client
+from tornadoalf.manager import TokenManager, normalize_scope
+
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """Creates clients for many credentials, sharing what they can.
+
+    Clients of the same token endpoint, client id, secret and scope share a
+    single ``TokenManager`` (so a single token), and every client and token
+    manager shares one HTTP connection pool, created from
+    ``http_client_options`` (see ``make_http_client``; the IOLoop
+    ``AsyncHTTPClient`` when omitted). Creating a client is cheap enough to
+    be done on every request. Like its clients, a registry serves a single
+    event loop.
+
+    At most ``max_managers`` token managers are kept, evicting the least
+    recently used ones, and a token manager unused for ``idle_ttl``
+    seconds is evicted; the tokens requested by the clients already
+    created count as uses. An evicted manager isn't closed, its clients
+    keep working, but the next clients of its credentials get a new one.
+    ``token_options`` and ``client_options`` are passed to every token
+    manager and client.
+
+    ``close()`` (or ``aclose()``, or leaving an ``async with`` block) closes
+    the token managers and the connection pool.
+    """
+
+    client_class = Client
+    token_manager_class = TokenManager
+
+    def __init__(self, http_client_options=None, max_managers=1000,
+                 idle_ttl=600, token_options=None, client_options=None):
+        # None: the AsyncHTTPClient of the running IOLoop
+        self._http_client = None
+        if http_client_options is not None:
+            self._http_client = make_http_client(http_client_options)
+
+        self._max_managers = max_managers
+        self._idle_ttl = idle_ttl
+        self._token_options = token_options or {}
+        self._client_options = client_options or {}
+        # key -> (token manager, last use), least recently used first
+        self._managers = OrderedDict()
+
+    def __len__(self):
+        return len(self._managers)
+
+    def client(self, token_endpoint, client_id, client_secret, scope=None):
+        """Returns a ``Client`` sharing the token manager of these
+        credentials."""
+        manager = self.token_manager(token_endpoint, client_id,
+                                     client_secret, scope)
+        return self.client_class(
+            client_id=client_id,
+            client_secret=client_secret,
+            token_endpoint=token_endpoint,
+            http_client=self._http_client,
+            token_manager=manager,
+            **self._client_options)
+
+    def token_manager(self, token_endpoint, client_id, client_secret,
+                      scope=None):
+        scope = normalize_scope(scope)
+        key = _registry_key(token_endpoint, client_id, client_secret, scope)
+        now = time.monotonic()
+
+        self._evict_idle(now)
+        entry = self._managers.pop(key, None)
+        if entry is None:
+            manager = self.token_manager_class(
+                token_endpoint=token_endpoint,
+                client_id=client_id,
+                client_secret=client_secret,
+                http_client=self._http_client,
+                scope=scope,
+                **self._token_options)
+        else:
+            manager = entry[0]
+
+        self._managers[key] = (manager, now)
+        while len(self._managers) > self._max_managers:
+            key, _, _ = self._least_recently_used()
+            del self._managers[key]
+
+        return manager
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def close(self):
+        """Closes every token manager and the connection pool."""
+        while self._managers:
+            _, (manager, _) = self._managers.popitem()
+            manager.close()
+        self._close_http_client()
+
+    async def aclose(self):
+        """Like ``close``, waiting for the cancelled work to finish."""
+        while self._managers:
+            _, (manager, _) = self._managers.popitem()
+            await manager.aclose()
+        self._close_http_client()
+
+    def _close_http_client(self):
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+    def _evict_idle(self, now):
+        while self._managers:
+            key, manager, last_use = self._least_recently_used()
+            if now - last_use < self._idle_ttl:
+                return
+
+            logger.debug('Evicting idle token manager of %s', key[1])
+            del self._managers[key]
+
+    def _least_recently_used(self):
+        while True:
+            key, (manager, last_use) = next(iter(self._managers.items()))
+            if manager.last_used <= last_use:
+                return key, manager, last_use
+
+            # used by its clients since it was handed out
+            self._managers[key] = (manager, manager.last_used)
+            self._managers.move_to_end(key)
+
+
+def _registry_key(token_endpoint, client_id, client_secret, scope):
+    # the secret is part of the key, but is not kept in memory by it
+    secret = hashlib.sha256(
+        (client_secret or '').encode('utf-8')).hexdigest()
+    if isinstance(token_endpoint, list):
+        token_endpoint = tuple(token_endpoint)
+    return (token_endpoint, client_id, scope, secret)
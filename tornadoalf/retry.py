@@ -0,0 +1,214 @@
+#
+# encoding: utf-8
+import logging
+import random
+import time
+
+from email.utils import parsedate_to_datetime
+
+from tornado import gen
+from tornado.httpclient import HTTPError
+from tornado.iostream import StreamClosedError
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+RETRY_STATUS_CODES = frozenset([502, 503, 504])
+RETRY_EXCEPTIONS = (OSError, StreamClosedError)
+PREFLIGHTS = (None, 'expect', 'head')
+
+# tornado reports timeouts and connection failures as HTTP 599
+CONNECTION_ERROR = 599
+
+
+class RetryBudget:
+    """Bounds the retries to a ``ratio`` of the requests made in the last
+    ``window`` seconds, so retries can't multiply the load of an upstream
+    that is already failing. ``min_retries`` per window are always allowed,
+    so a low traffic client can still retry.
+    """
+
+    def __init__(self, ratio=0.1, window=10, min_retries=10):
+        self._ratio = ratio
+        self._window = int(window)
+        self._min_retries = min_retries
+        # one bucket of [second, requests, retries] per second of the window
+        self._buckets = [[None, 0, 0] for _ in range(self._window)]
+
+    def record_request(self):
+        self._bucket()[1] += 1
+
+    def try_retry(self):
+        """Records a retry if the budget allows it."""
+        requests = retries = 0
+        now = int(time.monotonic())
+        for second, bucket_requests, bucket_retries in self._buckets:
+            if second is not None and now - second < self._window:
+                requests += bucket_requests
+                retries += bucket_retries
+
+        if retries >= max(self._min_retries, requests * self._ratio):
+            return False
+
+        self._bucket()[2] += 1
+        return True
+
+    def _bucket(self):
+        now = int(time.monotonic())
+        bucket = self._buckets[now % self._window]
+        if bucket[0] != now:
+            bucket[:] = [now, 0, 0]
+        return bucket
+
+
+class RetryPolicy:
+    """Retries requests that failed with a transient error.
+
+    A request is retried, up to ``max_attempts`` attempts in total, when it
+    got one of the ``status_codes``, a connection error or timeout, or
+    raised one of the ``exceptions``; only ``methods`` are retried, as
+    the others may not be idempotent. Attempts are spaced by an exponential
+    backoff from ``backoff`` up to ``max_backoff`` seconds, with full jitter
+    unless ``jitter=False``; a ``Retry-After`` header is honored, and the
+    request is not retried if it asks for more than ``max_backoff``.
+
+    Every retry must fit the ``budget`` (a ``RetryBudget``, shared by all
+    the requests using this policy); ``budget=False`` disables it.
+    """
+
+    def __init__(self, max_attempts=3, status_codes=RETRY_STATUS_CODES,
+                 exceptions=RETRY_EXCEPTIONS, methods=IDEMPOTENT_METHODS,
+                 backoff=0.1, max_backoff=10, jitter=True, budget=None):
+        self.max_attempts = max_attempts
+        self.status_codes = frozenset(status_codes)
+        self.exceptions = tuple(exceptions)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.budget = RetryBudget() if budget is None else budget
+
+    async def execute(self, fetch, method=None, replay=False,
+                      can_retry=None):
+        """Calls ``fetch`` until it succeeds or can't be retried.
+
+        ``fetch`` is a coroutine function returning a response; both
+        responses and exceptions are checked. ``method=None`` means the
+        request is safe to retry regardless of its method (e.g. a token
+        request). A ``replay`` of a request (e.g. after a 401) is not
+        counted as a new request by the budget. ``can_retry`` is called
+        before each retry and may veto it.
+        """
+        if self.budget and not replay:
+            self.budget.record_request()
+
+        attempt = 1
+        while True:
+            try:
+                response, error = await fetch(), None
+            except Exception as err:
+                response, error = getattr(err, 'response', None), err
+
+            delay = self._retry_delay(attempt, method, response, error)
+            if delay is None or (can_retry and not can_retry()) or (
+                    self.budget and not self.budget.try_retry()):
+                if error is not None:
+                    raise error
+                return response
+
+            logger.info('Retrying request (attempt %d) in %.3fs after %s',
+                        attempt + 1, delay,
+                        error if error is not None else response.code)
+            await gen.sleep(delay)
+            attempt += 1
+
+    def _retry_delay(self, attempt, method, response, error):
+        if attempt >= self.max_attempts:
+            return None
+        if method is not None and method.upper() not in self.methods:
+            return None
+        if not self._is_retryable(response, error):
+            return None
+
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+
+        requested = retry_after(response)
+        if requested is not None:
+            if requested > self.max_backoff:
+                return None
+            delay = max(delay, requested)
+
+        return delay
+
+    def _is_retryable(self, response, error):
+        if error is None:
+            code = getattr(response, 'code', None)
+        elif isinstance(error, HTTPError):
+            code = error.code
+        else:
+            return isinstance(error, self.exceptions)
+
+        return code in self.status_codes or code == CONNECTION_ERROR
+
+
+class ReplayPolicy:
+    """Decides whether a request rejected with a 401 is replayed with a new
+    token (by default every request is).
+
+    Only ``methods`` are replayed, all of them when ``None``. With a
+    ``max_body_size`` (bytes), requests with a larger body or with a
+    ``body_producer`` (of unknown size) are not replayed either, so large
+    uploads are never sent twice. A request that isn't replayed gets the
+    401 response, and the token is still renewed for the next requests.
+
+    The token of a request that can't be replayed is validated according
+    to ``preflight``:
+
+    - ``'expect'``: the request is sent with ``Expect: 100-continue``, so a
+      server honoring it rejects the token before the body is uploaded.
+      A ``body_producer`` that wasn't called yet is replayed anyway.
+    - ``'head'``: a ``HEAD`` of the same URL is sent first, unless the
+      token was already accepted by another request.
+    """
+
+    def __init__(self, methods=None, max_body_size=None, preflight=None):
+        if preflight not in PREFLIGHTS:
+            raise ValueError(f'Unknown preflight {preflight!r}')
+
+        self.methods = None if methods is None else frozenset(
+            method.upper() for method in methods)
+        self.max_body_size = max_body_size
+        self.preflight = preflight
+
+    def can_replay(self, request):
+        if self.methods is not None and (
+                request.method.upper() not in self.methods):
+            return False
+        if self.max_body_size is None:
+            return True
+        if request.body_producer is not None:
+            return False
+        return len(request.body or b'') <= self.max_body_size
+
+
+def retry_after(response):
+    """The seconds to wait asked by the ``Retry-After`` header of
+    ``response``, or ``None``."""
+    headers = getattr(response, 'headers', None)
+    value = headers.get('Retry-After') if headers is not None else None
+    if not value:
+        return None
+
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_on = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0, retry_on.timestamp() - time.time())
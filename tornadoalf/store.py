@@ -0,0 +1,195 @@
+#
+# encoding: utf-8
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from contextlib import asynccontextmanager
+
+from tornado import gen
+from tornadoalf.token import Token
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenStore:
+    """Where a ``TokenManager`` keeps its tokens.
+
+    Tokens are stored by key (see ``TokenManager._store_key``). ``lock``
+    guards a refresh of a key, so only one of the managers sharing the store
+    requests a new token while the others wait and load it with ``get``.
+    """
+
+    async def get(self, key):
+        """Returns the stored ``Token`` or ``None``."""
+        raise NotImplementedError
+
+    async def set(self, key, token):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    def lock(self, key):
+        """Returns an async context manager holding the refresh lock of
+        ``key``."""
+        raise NotImplementedError
+
+
+class MemoryTokenStore(TokenStore):
+    """Keeps the tokens in the process memory (the default store)."""
+
+    def __init__(self):
+        self._tokens = {}
+        # key -> [lock, coroutines holding or waiting for it]
+        self._locks = {}
+
+    async def get(self, key):
+        return self._tokens.get(key)
+
+    async def set(self, key, token):
+        self._tokens[key] = token
+
+    async def delete(self, key):
+        self._tokens.pop(key, None)
+        self._discard_lock(key)
+
+    @asynccontextmanager
+    async def lock(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if key not in self._tokens:
+                # deleted meanwhile, or never stored
+                self._discard_lock(key)
+
+    def _discard_lock(self, key):
+        # another lock for the key would let two refreshes run at once
+        entry = self._locks.get(key)
+        if entry is not None and entry[1] == 0:
+            del self._locks[key]
+
+
+class FileTokenStore(TokenStore):
+    """Shares the tokens between processes of a host through a JSON file.
+
+    Useful with ``tornado.process.fork_processes``: the workers load the
+    token refreshed by any of them instead of requesting their own. The
+    refresh lock is an ``flock`` on a file next to ``path``, polled every
+    ``lock_poll_interval`` seconds so the IOLoop is never blocked; after
+    ``lock_timeout`` seconds the refresh proceeds without it.
+    """
+
+    def __init__(self, path, lock_poll_interval=0.05, lock_timeout=10):
+        if fcntl is None:  # pragma: no cover
+            raise RuntimeError('FileTokenStore requires fcntl (POSIX)')
+
+        self._path = path
+        self._lock_poll_interval = lock_poll_interval
+        self._lock_timeout = lock_timeout
+
+    async def get(self, key):
+        data = self._read().get(key)
+        if data is None:
+            return None
+        try:
+            return Token.from_dict(data)
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning('Ignoring invalid stored token %s: %s', key, e)
+            return None
+
+    async def set(self, key, token):
+        with _FileLock(self._path + '.lock'):
+            tokens = self._read()
+            tokens[key] = token.to_dict()
+            self._write(tokens)
+
+    async def delete(self, key):
+        with _FileLock(self._path + '.lock'):
+            tokens = self._read()
+            if tokens.pop(key, None) is not None:
+                self._write(tokens)
+
+    @asynccontextmanager
+    async def lock(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+        fd = os.open(f'{self._path}.{digest}.lock', os.O_RDWR | os.O_CREAT)
+        try:
+            locked = await self._acquire(fd)
+            if not locked:
+                logger.warning(
+                    'Timed out waiting the token lock of %s, '
+                    'refreshing without it', key)
+            yield
+        finally:
+            # closing the descriptor also releases the lock
+            os.close(fd)
+
+    async def _acquire(self, fd):
+        deadline = time.monotonic() + self._lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    return False
+                await gen.sleep(self._lock_poll_interval)
+
+    def _read(self):
+        try:
+            with open(self._path, 'rb') as f:
+                tokens = json.loads(f.read())
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning('Could not read token store %s: %s', self._path, e)
+            return {}
+
+        return tokens if isinstance(tokens, dict) else {}
+
+    def _write(self, tokens):
+        # written aside and renamed, readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(tokens, f)
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class _FileLock:
+    """Short blocking ``flock`` around a read-modify-write of the store."""
+
+    def __init__(self, path):
+        self._path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self._path, os.O_RDWR | os.O_CREAT)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        os.close(self._fd)
+        self._fd = None
@@ -0,0 +1,121 @@
+#
+# encoding: utf-8
+import asyncio
+import threading
+
+from tornadoalf.client import Client
+
+
+class SyncClient:
+    """A blocking ``Client`` for code without an IOLoop (e.g. threaded WSGI
+    applications), safe to share between threads.
+
+    The client runs on an event loop in a background thread; ``fetch``
+    submits the requests to it from any thread and waits for them. All the
+    threads share one token manager, so one token is requested for all of
+    them, and one connection pool.
+
+    The arguments are those of ``Client``; ``client_class`` may be a
+    subclass of it. Any option creating http clients or token managers is
+    resolved on the background loop.
+    """
+
+    client_class = Client
+
+    def __init__(self, *args, **kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run, name='tornadoalf-sync', daemon=True)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread.start()
+
+        try:
+            self._client = self._call(self._make_client(args, kwargs))
+        except BaseException:
+            self._stop()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def client(self):
+        """The ``Client`` running on the background loop."""
+        return self._client
+
+    def fetch(self, request, **kwargs):
+        """Sends ``request`` (an URL or an ``HTTPRequest``) blocking until
+        its response. The arguments are those of ``Client.fetch``; use
+        ``total_timeout`` to bound the wait."""
+        return self._call(self._client.fetch(request, **kwargs))
+
+    def fetch_many(self, requests, concurrency=10, return_exceptions=False,
+                   **kwargs):
+        """Sends ``requests`` concurrently on the background loop, blocking
+        until all their responses (see ``Client.fetch_many``)."""
+        return self._call(self._client.fetch_many(
+            requests, concurrency, return_exceptions, **kwargs))
+
+    def get_token(self, **kwargs):
+        """The access token of the client (see ``TokenManager.get_token``)."""
+        return self._call(self._client._token_manager.get_token(**kwargs))
+
+    def close(self):
+        """Closes the client, waiting for its cancelled work, and stops the
+        background thread. Pending calls of other threads are cancelled."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        try:
+            self._call(self._client.aclose(), check=False)
+        finally:
+            self._stop()
+
+    async def _make_client(self, args, kwargs):
+        return self.client_class(*args, **kwargs)
+
+    def _call(self, coroutine, check=True):
+        if check and self._closed:
+            coroutine.close()
+            raise RuntimeError('Client is closed')
+        if threading.current_thread() is self._thread:
+            coroutine.close()
+            raise RuntimeError(
+                'SyncClient would block its own loop, use the client '
+                'attribute from the loop')
+
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        try:
+            return future.result()
+        except BaseException:
+            # e.g. KeyboardInterrupt while waiting
+            future.cancel()
+            raise
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._cancel_pending()
+            self._loop.close()
+
+    def _cancel_pending(self):
+        # includes the calls submitted while stopping
+        pending = asyncio.all_tasks(self._loop)
+        while pending:
+            for task in pending:
+                task.cancel()
+            self._loop.run_until_complete(
+                asyncio.gather(*pending, return_exceptions=True))
+            pending = asyncio.all_tasks(self._loop)
+
+    def _stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
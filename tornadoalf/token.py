@@ -1,7 +1,17 @@
 #
 # encoding: utf-8
+import base64
+import json
+import math
+import time
+
 from datetime import datetime, timedelta
 
+from tornadoalf.breaker import CircuitOpenError
+
+EPOCH = datetime(1970, 1, 1)
+BEARER_PREFIX = 'Bearer '
+
 
 class TokenError(Exception):
 
@@ -22,14 +32,134 @@ class TokenHTTPError(TokenError):
         return err
 
 
+class TokenCircuitOpenError(TokenError, CircuitOpenError):
+    """The token endpoint circuit is open, no token was requested."""
+
+
 class Token(object):
+    """An access token and its expiration.
+
+    Validity is checked against the monotonic clock, so wall clock jumps
+    don't change it; a token is considered expired ``skew`` seconds before
+    it actually expires. The wall clock expiration (``expires_on``) is only
+    kept to persist the token. ``authorization`` is the ``Authorization``
+    header sending the token, formatted once rather than per request.
+    """
 
-    def __init__(self, access_token='', expires_in=0):
+    __slots__ = ('access_token', 'authorization', 'token_type',
+                 'refresh_token', '_expires_in', '_expires_at', '_skew',
+                 '_valid_until', '_expires_on_timestamp')
+
+    def __init__(self, access_token='', expires_in=0, skew=0,
+                 token_type='Bearer', refresh_token=None):
         self.access_token = access_token
+        self.authorization = BEARER_PREFIX + access_token
+        self.token_type = token_type
+        self.refresh_token = refresh_token
         self._expires_in = expires_in
+        self._expires_at = time.monotonic() + expires_in
+        self._expires_on_timestamp = time.time() + expires_in
+        self.skew = skew
+
+    @property
+    def skew(self):
+        return self._skew
+
+    @skew.setter
+    def skew(self, skew):
+        self._skew = skew
+        self._valid_until = self._expires_at - skew
 
-        self.expires_on = datetime.utcnow() + timedelta(
-            seconds=self._expires_in)
+    @property
+    def expires_on(self):
+        """The expiration as a naive UTC ``datetime``."""
+        return EPOCH + timedelta(seconds=self._expires_on_timestamp)
 
     def is_valid(self):
-        return self.expires_on > datetime.utcnow()
+        return time.monotonic() < self._valid_until
+
+    def ttl(self):
+        """Seconds until the token expires (negative when expired)."""
+        return self._expires_at - time.monotonic()
+
+    def to_dict(self):
+        data = {
+            'access_token': self.access_token,
+            'token_type': self.token_type,
+            'expires_in': self._expires_in,
+            'expires_on': self._expires_on_timestamp,
+        }
+        if self.refresh_token is not None:
+            data['refresh_token'] = self.refresh_token
+        return data
+
+    @classmethod
+    def from_dict(cls, data, skew=0):
+        """Restores a token serialized by ``to_dict``, keeping its
+        original expiration."""
+        token = cls(data['access_token'], data.get('expires_in', 0), skew,
+                    data.get('token_type', 'Bearer'),
+                    data.get('refresh_token'))
+        token._expires_on_timestamp = float(data['expires_on'])
+        token._expires_at = time.monotonic() + (
+            token._expires_on_timestamp - time.time())
+        token.skew = skew
+        return token
+
+
+def parse_token_data(token_data, default_expires_in):
+    """Validates a token response (RFC 6749, section 5.1) and returns its
+    ``access_token``, ``expires_in``, ``token_type`` and ``refresh_token``.
+
+    ``expires_in`` defaults to ``default_expires_in`` and negative values
+    are clamped to 0. Raises ``TokenError`` for an invalid response.
+    """
+    if not isinstance(token_data, dict):
+        raise TokenError('Invalid token response, expected an object', None)
+
+    access_token = token_data.get('access_token')
+    if not access_token or not isinstance(access_token, str):
+        raise TokenError('Token response without an access_token', None)
+
+    token_type = token_data.get('token_type') or 'Bearer'
+    if not isinstance(token_type, str) or token_type.lower() != 'bearer':
+        raise TokenError(f'Unsupported token_type {token_type!r}', None)
+
+    expires_in = token_data.get('expires_in')
+    if expires_in is None:
+        expires_in = default_expires_in
+    else:
+        try:
+            expires_in = float(expires_in)
+        except (TypeError, ValueError):
+            expires_in = math.nan
+        if not math.isfinite(expires_in):
+            raise TokenError(
+                f'Invalid expires_in {token_data["expires_in"]!r}', None)
+
+    refresh_token = token_data.get('refresh_token')
+    if not isinstance(refresh_token, str):
+        refresh_token = None
+
+    return {
+        'access_token': access_token,
+        'expires_in': max(0, expires_in),
+        'token_type': token_type,
+        'refresh_token': refresh_token,
+    }
+
+
+def jwt_claims(access_token):
+    """Returns the claims of a JWT ``access_token``, or ``None`` when it
+    isn't a JWT. The signature is not verified: the claims are only used
+    by the client to know when its own token expires."""
+    parts = access_token.split('.')
+    if len(parts) != 3:
+        return None
+
+    payload = parts[1] + '=' * (-len(parts[1]) % 4)
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except ValueError:
+        return None
+    return claims if isinstance(claims, dict) else None